@@ -0,0 +1,472 @@
+# -*- coding: utf-8 -*-
+"""
+Model Context Protocol (MCP) server that connects an Emby media server to an AI client such as Claude Desktop.
+See emby_mcp_server.py for details.
+
+Copyright (C) 2025 Dominic Search <code@angeltek.co.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+#==================================================
+# Benchmark Suite for the MCP Tools and Emby Functions
+#==================================================
+
+# Runs every MCP tool end to end (through an in-memory MCP client session) and every function in
+# lib_emby_functions.py against the local Emby stand-in in lib_emby_standin.py, for synthetic
+# libraries of each requested size. For every step it records the wall time, the peak RSS of the
+# process, the bytes and requests sent by the stand-in, and the size of the JSON returned.
+# Results are written as JSON, and can be compared with an earlier run to catch regressions:
+#
+#   uv run emby_mcp_benchmark.py --sizes 1000,100000 --output benchmark_results.json
+#   uv run emby_mcp_benchmark.py --sizes 1000,100000 --baseline benchmark_results.json
+#
+# Each library size is benchmarked in a fresh process, with the stand-in in a process of its own,
+# so that the peak RSS figures belong to Emby.MCP alone.
+
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+try:
+    import resource # not available on Windows, where peak RSS is not recorded
+except ImportError:
+    resource = None
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCHMARK_SIZES = [1000, 100000, 1000000]
+BENCHMARK_NOISE_SECONDS = 0.005 # timing differences smaller than this are never reported as regressions
+
+# The MCP tools to run, in order, as (tool name, arguments, repeatable, maximum library size or None).
+# Steps that change the library only run once, as do full lyrics scans, which download the whole library
+# and so by default are skipped for the largest libraries.
+BENCHMARK_TOOL_STEPS = [
+    ('retrieve_user_list', {}, True, None),
+    ('retrieve_library_list', {}, True, None),
+    ('select_library', {'library_name': 'Music'}, True, None),
+    ('retrieve_current_library', {}, True, None),
+    ('retrieve_genre_list', {}, True, None),
+    ('search_for_item', {'genre_name': 'Jazz'}, True, None),
+    ('retrieve_next_search_chunk', {}, False, None),
+    ('search_for_item', {'genre_name': 'Jazz', 'fields': 'minimal'}, True, None),
+    ('search_for_item', {'title_or_album': 'river'}, True, None),
+    ('search_for_item', {'artist_name': 'Artist 3'}, True, None),
+    ('search_for_item', {'broadcast_release_years': '1990,1991'}, True, None),
+    ('search_for_item', {'lyrics_or_description': 'love night'}, False, 100000),
+    ('summarise_items', {'genre_name': 'Jazz'}, True, None),
+    ('summarise_items', {'group_by': 'artist'}, True, None),
+    ('summarise_items', {'broadcast_release_years': '1990,1991', 'group_by': 'album', 'sort_groups_by': 'run_time'}, True, None),
+    ('retrieve_playlist_list', {}, True, None),
+    ('retrieve_playlist_list', {'include_user_access': False}, True, None),
+    ('retrieve_playlist_items', {'playlist_id': 'playlist-1'}, True, None),
+    ('create_playlist', {'playlist_name': 'Benchmark', 'item_ids': '1,2,3'}, False, None),
+    ('modify_playlist_name', {'playlist_id': 'playlist-1', 'new_name': 'Benchmark renamed'}, False, None),
+    ('add_items_to_playlist', {'playlist_id': 'playlist-1', 'item_ids': '4,5,6'}, False, None),
+    ('add_items_to_playlist', {'playlist_id': 'playlist-1', 'item_ids': ','.join(str(item_id) for item_id in range(1000))}, False, None),
+    ('reorder_items_on_playlist', {'playlist_id': 'playlist-1', 'playlist_item_number': 'entry-1-0', 'playlist_item_index': '2'}, False, None),
+    ('remove_items_from_playlist', {'playlist_id': 'playlist-1', 'playlist_item_numbers': 'entry-1-1'}, False, None),
+    ('sync_items_on_playlist', {'playlist_id': 'playlist-1', 'item_ids': ','.join(str(item_id) for item_id in range(999, -1, -1))}, False, None),
+    ('share_playlist_public', {'playlist_id': 'playlist-1'}, False, None),
+    ('share_playlist_user_access', {'playlist_id': 'playlist-1', 'user_ids': 'standin-user-1', 'access_level': 'Read'}, False, None),
+    ('stop_sharing_playlist', {'playlist_id': 'playlist-1'}, False, None),
+    ('retrieve_player_list', {}, True, None),
+    ('retrieve_player_queue', {'session_id': 'session-0'}, True, None),
+    ('control_media_player', {'session_id': 'session-0', 'command': 'Pause'}, False, None),
+    ('control_media_players', {'media_type': 'Audio', 'command': 'Pause'}, False, None),
+    ('retrieve_diagnostics', {}, True, None)
+]
+
+#--------------------------------------------------
+# Measurement Functions
+#-------------------------
+
+def get_standin_stats(server_url: str) ->dict:
+    """
+    Read the stand-in's traffic counters (which do not count this request).
+    """
+
+    with urllib.request.urlopen(f"{server_url}/emby/Standin/Stats") as response:
+        return json.loads(response.read())
+
+#--------------------------------------------------
+
+def get_peak_rss_kb() ->Optional[int]:
+    """
+    Return the peak resident set size of this process so far in KB, or None where it cannot be measured.
+    """
+
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak # macOS reports bytes, Linux KB
+
+#--------------------------------------------------
+
+async def measure_step(server_url: str, kind: str, name: str, arguments: dict, run: Callable, repeatable: bool, repeat: int) ->dict:
+    """
+    Run one benchmark step and measure it.
+
+    Args:
+        server_url (str): The stand-in's URL, for its traffic counters.
+        kind (str): 'tool' or 'function'.
+        name (str): The tool or function name.
+        arguments (dict): The arguments, recorded to tell steps apart.
+        run (func): An async function that runs the step once and returns (success, output size in bytes).
+        repeatable (bool): True if the step may be run more than once.
+        repeat (int): How many times to run a repeatable step.
+
+    Returns:
+        dict: The measurements, with keys:
+        kind, name, arguments: as supplied
+        success (bool): True if the first run succeeded
+        wall_seconds (float): the time taken by the first run
+        best_seconds (float): the fastest run
+        median_seconds (float): the median run
+        runs (int): the number of runs
+        wire_bytes (int): the bytes of response bodies sent by the stand-in during the first run
+        requests (int): the number of requests answered by the stand-in during the first run
+        output_bytes (int): the size of the JSON returned by the first run
+        peak_rss_kb (int): the peak RSS of the process after the step, or None if not measurable
+    """
+
+    timings = []
+    before = get_standin_stats(server_url)
+    start = time.perf_counter()
+    success, output_bytes = await run()
+    timings.append(time.perf_counter() - start)
+    after = get_standin_stats(server_url)
+    if repeatable:
+        for counter in range(1, repeat):
+            start = time.perf_counter()
+            await run()
+            timings.append(time.perf_counter() - start)
+
+    return {
+        'kind': kind,
+        'name': name,
+        'arguments': arguments,
+        'success': success,
+        'wall_seconds': round(timings[0], 6),
+        'best_seconds': round(min(timings), 6),
+        'median_seconds': round(statistics.median(timings), 6),
+        'runs': len(timings),
+        'wire_bytes': after['bytes_sent'] - before['bytes_sent'],
+        'requests': after['request_count'] - before['request_count'],
+        'output_bytes': output_bytes,
+        'peak_rss_kb': get_peak_rss_kb()
+    }
+
+#--------------------------------------------------
+
+def output_size(result: Any) ->int:
+    """
+    Return the size of a function result as JSON, turning anything JSON cannot hold (e.g. the API client) into a string.
+    """
+
+    return len(json.dumps(result, default=str))
+
+#--------------------------------------------------
+# Benchmark Steps
+#-------------------------
+
+async def benchmark_tools(server_url: str, item_count: int, repeat: int, full: bool) ->list:
+    """
+    Run BENCHMARK_TOOL_STEPS through an in-memory MCP client session connected to emby_mcp_server.
+    The current directory must hold the .env file for the stand-in.
+    """
+
+    from mcp.shared.memory import create_connected_server_and_client_session
+    import emby_mcp_server
+
+    results = []
+    async with create_connected_server_and_client_session(emby_mcp_server.mcp._mcp_server) as session:
+        for tool_name, arguments, repeatable, max_items in BENCHMARK_TOOL_STEPS:
+            if max_items is not None and item_count > max_items and not full:
+                results.append({'kind': 'tool', 'name': tool_name, 'arguments': arguments, 'skipped': f"library larger than {max_items} items, use --full to run"})
+                continue
+
+            async def run(tool_name=tool_name, arguments=arguments):
+                result = await session.call_tool(tool_name, arguments)
+                text = ''.join(content.text for content in result.content if hasattr(content, 'text'))
+                failed = result.isError or text.lstrip().startswith(('ERROR', '{"error"'))
+                return not failed, len(text.encode('utf-8'))
+
+            results.append(await measure_step(server_url, 'tool', tool_name, arguments, run, repeatable, repeat))
+            print(f"  tool {tool_name} {arguments}: {results[-1]['wall_seconds']:.3f}s", file=sys.stderr)
+    return results
+
+#--------------------------------------------------
+
+async def benchmark_functions(server_url: str, item_count: int, repeat: int, full: bool) ->list:
+    """
+    Run every function in lib_emby_functions.py directly against the stand-in.
+    Any public function that has no step here is reported as a failed step, so that new functions are not forgotten.
+    """
+
+    import lib_emby_functions as emby
+
+    login = emby.authenticate_with_emby(server_url, 'alice', 'benchmark', 'Emby.MCP Benchmark', '1.0', 'Benchmark')
+    if not login['success']:
+        return [{'kind': 'function', 'name': 'authenticate_with_emby', 'arguments': {}, 'success': False, 'error': login['error']}]
+    api_client = login['api_client']
+    user_id = login['user_id']
+    libraries = emby.get_library_list(api_client)['items']
+    music_id = [library['id'] for library in libraries if library['name'] == 'Music'][0]
+    token_path = os.path.join(os.getcwd(), 'benchmark_token.json')
+    created = {}
+
+    def new_playlist_step():
+        result = emby.new_playlist(api_client, user_id, libraries, 'Benchmark function', overview='Created by the benchmark')
+        created['playlist_id'] = result.get('playlist_id')
+        return result
+
+    # (function name, arguments to record, call, repeatable, maximum library size or None)
+    steps = [
+        ('authenticate_with_emby', {}, lambda: emby.authenticate_with_emby(server_url, 'alice', 'benchmark', 'Emby.MCP Benchmark', '1.0', 'Benchmark', emby.stable_device_id('Emby.MCP Benchmark', 'Benchmark', 'alice')), False, None),
+        ('create_authenticated_client', {}, lambda: {'success': emby.create_authenticated_client(server_url, login['access_token']) is not None}, True, None),
+        ('stable_device_id', {}, lambda: {'success': True, 'device_id': emby.stable_device_id('Emby.MCP Benchmark', 'Benchmark', 'alice')}, True, None),
+        ('save_emby_session', {}, lambda: emby.save_emby_session(token_path, 'alice', login), True, None),
+        ('resume_emby_session', {}, lambda: emby.resume_emby_session(server_url, 'alice', token_path), True, None),
+        ('forget_emby_session', {}, lambda: {'success': emby.forget_emby_session(token_path) is None}, False, None),
+        ('get_library_list', {}, lambda: emby.get_library_list(api_client), True, None),
+        ('set_current_library', {'name': 'Music'}, lambda: emby.set_current_library(libraries, 'Music'), True, None),
+        ('get_genre_list', {'library_id': music_id}, lambda: emby.get_genre_list(api_client, music_id), True, None),
+        ('resolve_item_fields', {'fields': 'standard'}, lambda: emby.resolve_item_fields('standard'), True, None),
+        ('item_emby_fields', {'fields': 'standard'}, lambda: {'success': True, 'fields': emby.item_emby_fields(emby.ITEM_FIELD_PROFILES['standard'], 'Genres,MediaSources,DateCreated,Overview,ProductionYear,PremiereDate,Path')}, True, None),
+        ('item_output_keys', {'fields': 'standard'}, lambda: {'success': True, 'keys': emby.item_output_keys(emby.ITEM_FIELD_PROFILES['standard'], emby.PLAYLIST_ITEM_KEYS, emby.PLAYLIST_ENTRY_KEYS)}, True, None),
+        ('get_items', {'genre': 'Jazz', 'limit': 100}, lambda: emby.get_items(api_client, user_id, library_id=music_id, genre='Jazz', start_index=0, limit=100), True, None),
+        ('get_items', {'genre': 'Jazz'}, lambda: emby.get_items(api_client, user_id, library_id=music_id, genre='Jazz'), True, 100000),
+        ('get_items', {'search_term': 'river'}, lambda: emby.get_items(api_client, user_id, library_id=music_id, search_term='river'), True, 100000),
+        ('get_items', {'years': '1990,1991', 'fields': 'minimal'}, lambda: emby.get_items(api_client, user_id, library_id=music_id, years='1990,1991', fields='minimal'), True, 100000),
+        ('get_items', {'lyrics': 'love night'}, lambda: emby.get_items(api_client, user_id, library_id=music_id, lyrics='love night'), False, 100000),
+        ('get_item_columns', {'genre': 'Jazz', 'columns': 'run_time_seconds,artists'}, lambda: {'success': True, 'items': sum(len(columns['artists']) for columns in emby.get_item_columns(api_client, user_id, music_id, ['run_time_seconds', 'artists'], genre='Jazz')['batches'])}, True, None),
+        ('project_items', {'fields': 'minimal'}, lambda: {'success': True, 'items': emby.project_items(emby.get_items(api_client, user_id, library_id=music_id, limit=100)['items'], emby.ITEM_FIELD_PROFILES['minimal'])}, True, None),
+        ('get_playlists', {}, lambda: emby.get_playlists(api_client, user_id, libraries), True, None),
+        ('get_playlists', {'include_access': False}, lambda: emby.get_playlists(api_client, user_id, libraries, include_access=False), True, None),
+        ('get_playlist_names', {}, lambda: emby.get_playlist_names(api_client, user_id, libraries), True, None),
+        ('get_playlist_access', {'playlist_id': 'playlist-2'}, lambda: {'success': True, 'user_access': emby.get_playlist_access(api_client, 'playlist-2')}, True, None),
+        ('get_playlist_items', {'playlist_id': 'playlist-2'}, lambda: emby.get_playlist_items(api_client, user_id, 'playlist-2'), True, None),
+        ('new_playlist', {}, new_playlist_step, False, None),
+        ('set_playlist_meta', {}, lambda: emby.set_playlist_meta(api_client, user_id, libraries, created['playlist_id'], name='Benchmark function renamed'), False, None),
+        ('add_playlist_items', {}, lambda: emby.add_playlist_items(api_client, user_id, created['playlist_id'], '1,2,3'), False, None),
+        ('move_playlist_items', {}, lambda: emby.move_playlist_items(api_client, 'playlist-2', 'entry-2-0', '1'), False, None),
+        ('delete_playlist_items', {}, lambda: emby.delete_playlist_items(api_client, 'playlist-2', 'entry-2-1'), False, None),
+        ('playlist_id_batches', {'ids': 5000}, lambda: {'success': True, 'batches': emby.playlist_id_batches([str(item_id) for item_id in range(5000)])}, True, None),
+        ('sync_playlist_items', {'playlist_id': 'playlist-2'}, lambda: emby.sync_playlist_items(api_client, user_id, 'playlist-2', ','.join(str(item_id) for item_id in range(50, 0, -1))), False, None),
+        ('set_playlist_sharing', {'share_type': 'public'}, lambda: emby.set_playlist_sharing(api_client, 'playlist-2', 'public'), False, None),
+        ('get_users', {}, lambda: emby.get_users(api_client), True, None),
+        ('get_player_sessions', {}, lambda: emby.get_player_sessions(api_client), True, None),
+        ('player_sessions_from_json', {'media_type': 'Audio'}, lambda: {'success': True, 'sessions': emby.player_sessions_from_json(emby.get_raw_json(emby.emby_client.SessionsServiceApi(api_client).get_sessions), 'Audio')}, True, None),
+        ('full_player_sessions', {}, lambda: emby.full_player_sessions(api_client), True, None),
+        ('get_playqueue_items', {'session_id': 'session-0'}, lambda: emby.get_playqueue_items(api_client, 'session-0'), True, None),
+        ('send_player_command', {'command': 'Pause'}, lambda: emby.send_player_command(api_client, 'session-0', 'Pause', user_id=user_id), False, None),
+        ('select_player_sessions', {'device_name': 'speaker*'}, lambda: {'success': True, 'sessions': emby.select_player_sessions(emby.get_player_sessions(api_client)['sessions'], device_name='speaker*')}, True, None),
+        ('broadcast_player_command', {'command': 'Unpause'}, lambda: emby.broadcast_player_command(api_client, ['session-0', 'session-1', 'session-2', 'session-3'], 'Unpause', user_id=user_id), False, None),
+        ('logout_from_emby', {}, lambda: emby.logout_from_emby(api_client), False, None)
+    ]
+
+    results = []
+    for function_name, arguments, call, repeatable, max_items in steps:
+        if max_items is not None and item_count > max_items and not full:
+            results.append({'kind': 'function', 'name': function_name, 'arguments': arguments, 'skipped': f"library larger than {max_items} items, use --full to run"})
+            continue
+
+        async def run(call=call, function_name=function_name):
+            try:
+                result = await asyncio.to_thread(call)
+            except Exception as e: # a crash is a failed step, not the end of the benchmark
+                print(f"ERROR: {function_name} raised {e!r}", file=sys.stderr)
+                return False, 0
+            return (result.get('success', True) if isinstance(result, dict) else True), output_size(result)
+
+        results.append(await measure_step(server_url, 'function', function_name, arguments, run, repeatable, repeat))
+        print(f"  function {function_name} {arguments}: {results[-1]['wall_seconds']:.3f}s", file=sys.stderr)
+
+    covered = set(step[0] for step in steps)
+    for function_name, function in inspect.getmembers(emby, inspect.isfunction):
+        if function.__module__ == emby.__name__ and not function_name.startswith('_') and function_name not in covered:
+            results.append({'kind': 'function', 'name': function_name, 'arguments': {}, 'success': False, 'error': "no benchmark step for this function"})
+    return results
+
+#--------------------------------------------------
+# Running the Benchmarks
+#-------------------------
+
+def run_one_size(item_count: int, result_file: str, repeat: int, latency: float, full: bool, settings: list) ->None:
+    """
+    Benchmark one library size: start the stand-in in its own process, write a .env file for it in a
+    temporary directory, run the tool and function steps, and write the results to result_file.
+    Runs in a process of its own, started by run_benchmarks().
+    """
+
+    standin = subprocess.Popen([sys.executable, os.path.join(BENCHMARK_DIR, 'lib_emby_standin.py'), '--items', str(item_count), '--port', '0', '--latency', str(latency)],
+                               stdout=subprocess.PIPE, text=True)
+    try:
+        server_url = standin.stdout.readline().strip()
+        work_dir = tempfile.mkdtemp(prefix='emby_mcp_benchmark_')
+        with open(os.path.join(work_dir, '.env'), 'w', encoding='utf-8') as env_file:
+            env_file.write(f'EMBY_SERVER_URL = "{server_url}"\nEMBY_USERNAME = "alice"\nEMBY_PASSWORD = "benchmark"\nLLM_MAX_ITEMS = 100\n')
+            for setting in settings:
+                env_file.write(f"{setting}\n")
+        os.chdir(work_dir)
+        sys.path.insert(0, BENCHMARK_DIR)
+
+        start_rss = get_peak_rss_kb()
+        results = asyncio.run(benchmark_tools(server_url, item_count, repeat, full))
+        results += asyncio.run(benchmark_functions(server_url, item_count, repeat, full))
+        for result in results:
+            result['size'] = item_count
+        with open(result_file, 'w', encoding='utf-8') as output:
+            json.dump({'size': item_count, 'start_rss_kb': start_rss, 'results': results}, output)
+    finally:
+        standin.terminate()
+        standin.wait()
+
+#--------------------------------------------------
+
+def run_benchmarks(sizes: list, repeat: int, latency: float, full: bool, settings: list) ->dict:
+    """
+    Benchmark each library size in a fresh process and gather the results.
+
+    Returns:
+        dict: The benchmark report, with keys:
+        created (str, ISO format): when the benchmarks were run
+        python (str), platform (str): where they were run
+        parameters (dict): the options used
+        sizes (dict): the RSS of each benchmark process after start-up, by library size
+        results (list of dict): one entry per step, as returned by measure_step() plus 'size'
+    """
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': {'sizes': sizes, 'repeat': repeat, 'latency': latency, 'full': full, 'settings': settings},
+        'sizes': {},
+        'results': []
+    }
+    for item_count in sizes:
+        print(f"Benchmarking a library of {item_count} items...", file=sys.stderr)
+        result_file = os.path.join(tempfile.mkdtemp(prefix='emby_mcp_benchmark_'), 'results.json')
+        command = [sys.executable, os.path.abspath(__file__), '--one-size', str(item_count), '--result-file', result_file,
+                   '--repeat', str(repeat), '--latency', str(latency)] + (['--full'] if full else [])
+        for setting in settings:
+            command += ['--setting', setting]
+        completed = subprocess.run(command, stderr=subprocess.PIPE, text=True, encoding='utf-8')
+        if completed.returncode != 0 or not os.path.exists(result_file):
+            print(completed.stderr, file=sys.stderr)
+            report['results'].append({'size': item_count, 'kind': 'run', 'name': 'benchmark process', 'arguments': {}, 'success': False, 'error': f"exit code {completed.returncode}"})
+            continue
+        with open(result_file, encoding='utf-8') as result_json:
+            size_report = json.load(result_json)
+        report['sizes'][str(item_count)] = {'start_rss_kb': size_report['start_rss_kb']}
+        report['results'] += size_report['results']
+    return report
+
+#--------------------------------------------------
+
+def compare_with_baseline(report: dict, baseline: dict, tolerance: float) ->list:
+    """
+    Compare a benchmark report with an earlier one, step by step.
+    A step regresses if it now fails, or if its best time, wire bytes, requests or output bytes have grown by more than
+    the tolerance factor (ignoring timing differences below BENCHMARK_NOISE_SECONDS).
+
+    Returns:
+        list of str: a description of each regression found.
+    """
+
+    def step_key(result):
+        return (result['size'], result['kind'], result['name'], json.dumps(result['arguments'], sort_keys=True))
+
+    earlier = {step_key(result): result for result in baseline.get('results', [])}
+    regressions = []
+    for result in report['results']:
+        old = earlier.get(step_key(result))
+        if old is None or 'skipped' in result or 'skipped' in old:
+            continue
+        label = f"{result['kind']} {result['name']} {result['arguments']} at {result['size']} items"
+        if old.get('success') and not result.get('success'):
+            regressions.append(f"{label}: now fails")
+            continue
+        if 'best_seconds' not in result or 'best_seconds' not in old:
+            continue
+        if result['best_seconds'] > old['best_seconds'] * tolerance and result['best_seconds'] - old['best_seconds'] > BENCHMARK_NOISE_SECONDS:
+            regressions.append(f"{label}: best time {old['best_seconds']:.4f}s -> {result['best_seconds']:.4f}s")
+        for measure in ('wire_bytes', 'requests', 'output_bytes'):
+            if result[measure] > old[measure] * tolerance and result[measure] > old[measure] + 1:
+                regressions.append(f"{label}: {measure} {old[measure]} -> {result[measure]}")
+    return regressions
+
+#--------------------------------------------------
+
+def print_summary(report: dict) ->None:
+    """
+    Print a table of the results to standard error.
+    """
+
+    print(f"\n{'size':>8} {'kind':<8} {'step':<60} {'first s':>9} {'best s':>9} {'wire B':>11} {'reqs':>5} {'out B':>10} {'RSS KB':>9}", file=sys.stderr)
+    for result in report['results']:
+        step = f"{result['name']} {json.dumps(result['arguments'])}" if result['arguments'] else result['name']
+        if 'skipped' in result:
+            print(f"{result['size']:>8} {result['kind']:<8} {step[:60]:<60} skipped: {result['skipped']}", file=sys.stderr)
+        elif 'wall_seconds' not in result:
+            print(f"{result['size']:>8} {result['kind']:<8} {step[:60]:<60} ERROR: {result.get('error')}", file=sys.stderr)
+        else:
+            flag = '' if result['success'] else '  FAILED'
+            print(f"{result['size']:>8} {result['kind']:<8} {step[:60]:<60} {result['wall_seconds']:>9.4f} {result['best_seconds']:>9.4f} {result['wire_bytes']:>11} {result['requests']:>5} {result['output_bytes']:>10} {str(result['peak_rss_kb']):>9}{flag}", file=sys.stderr)
+
+#==================================================
+# Main
+#==================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Emby.MCP tools and Emby functions against a local Emby stand-in.")
+    parser.add_argument('--sizes', default=','.join(str(size) for size in BENCHMARK_SIZES), help="comma separated library sizes, in items")
+    parser.add_argument('--output', default='benchmark_results.json', help="file to write the results to")
+    parser.add_argument('--baseline', default=None, help="results of an earlier run to compare with; exits with status 1 on regressions")
+    parser.add_argument('--tolerance', type=float, default=1.5, help="factor by which a measure may grow before it counts as a regression")
+    parser.add_argument('--repeat', type=int, default=3, help="runs of each repeatable step")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds that the stand-in delays every response")
+    parser.add_argument('--full', action='store_true', help="also run the steps that download the whole of a large library")
+    parser.add_argument('--setting', action='append', default=[], help="extra .env line for Emby.MCP, e.g. 'EMBY_LIBRARY_MIRROR=mirror.db'; may be repeated")
+    parser.add_argument('--one-size', type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.one_size is not None:
+        run_one_size(args.one_size, args.result_file, args.repeat, args.latency, args.full, args.setting)
+        sys.exit(0)
+
+    report = run_benchmarks([int(size) for size in args.sizes.split(',') if size.strip() != ""], args.repeat, args.latency, args.full, args.setting)
+    print_summary(report)
+    exit_code = 0
+    if args.baseline is not None:
+        with open(args.baseline, encoding='utf-8') as baseline_json:
+            regressions = compare_with_baseline(report, json.load(baseline_json), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}", file=sys.stderr)
+        print(f"{len(regressions)} regressions against {args.baseline}", file=sys.stderr)
+        exit_code = 1 if regressions else 0
+    with open(args.output, 'w', encoding='utf-8') as output:
+        json.dump(report, output, indent=1)
+    print(f"Results written to {args.output}", file=sys.stderr)
+    sys.exit(exit_code)
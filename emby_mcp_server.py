@@ -35,18 +35,33 @@ MY_DEBUG = False
 from platform import system as get_platform_system
 from platform import node as get_platform_hostname
 from dotenv import dotenv_values, load_dotenv, find_dotenv
-from typing import Optional, TypedDict, NotRequired, Any, Unpack
+from typing import Optional, TypedDict, NotRequired, Any, Unpack, Callable
 from dataclasses import dataclass
 from unidecode import unidecode
 import json
 import os
 import io
 import sys
-import uuid
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
+from collections import ChainMap
 from collections.abc import AsyncIterator
 from mcp.server.fastmcp import FastMCP, Context
+from mcp.server.fastmcp.exceptions import ToolError
 from lib_emby_functions import *
+from lib_emby_search import *
+from lib_emby_aggregate import *
+from lib_emby_lyrics_index import open_lyrics_index, refresh_lyrics_index
+from lib_emby_mirror import *
+from lib_emby_cache import *
+from lib_emby_metrics import *
+from lib_emby_sessions import *
+from lib_emby_users import *
+from lib_emby_transport import *
+from lib_emby_resilience import *
+from lib_emby_events import *
 if MY_DEBUG:
     from lib_emby_debugging import test_emby_functions
 
@@ -84,33 +99,94 @@ mcp = FastMCP(name=MY_NAME, instructions=MY_PURPOSE)
 # Server Startup & Lifespan
 #-------------------------
 
+# The Emby login and everything that goes with it is shared by every MCP session. With the stdio transport there
+# is a single session, but the streamable-http and sse transports enter the lifespan once per client session,
+# so the first session starts the shared context and later sessions reuse it. It is stopped when the last
+# session ends, unless keep_warm is set, in which case it is kept for the next client until Emby.MCP exits.
+shared_context = {'auth_context': None, 'sessions': 0, 'keep_warm': False}
+
 @asynccontextmanager
 async def app_lifespan(server: FastMCP) ->AsyncIterator[dict]:
     """
-    Manage application lifecycle with type-safe context
+    Manage application lifecycle with type-safe context, sharing one Emby context between all MCP sessions.
+
+    Args:
+        None
+    
+    Returns:
+        dict: Yields the shared context returned by start_emby_context()
+    """
+
+    if shared_context['auth_context'] is None:
+        shared_context['auth_context'] = await start_emby_context()
+    shared_context['sessions'] += 1
+    try:
+        yield shared_context['auth_context']
+
+    finally:
+        shared_context['sessions'] -= 1
+        if shared_context['sessions'] == 0 and not shared_context['keep_warm']:
+            stop_emby_context(shared_context['auth_context'])
+            shared_context['auth_context'] = None
+
+#--------------------------------------------------
+
+async def start_emby_context() ->dict:
+    """
+    Log in to Emby and create the context shared by all MCP sessions, starting its background tasks.
+    Called from within the event loop, so that the background tasks run on it.
 
     Args:
         None
     
     Returns:
-        dict: Yields a dictionary with keys:
+        dict: A dictionary with keys:
         api_client (obj): The authenticated API client.
+        transport (dict): The settings of the API client's HTTP transport, from new_transport_settings()
+        resilience (dict): The retry, hedging and circuit breaker policy applied to every request to Emby, from new_resilience_policy()
+        token_cache_path (str): The file holding the access token for reuse by the next run, or None if not configured
+        executor (obj): The bounded thread pool on which blocking calls to the Emby server are run, see run_emby_function()
+        max_workers (int): The size of the thread pool, also used to bound the playlist user access lookups made at once
+        playlist_access_cache (dict): Cache of per-user playlist access by playlist ID, from new_cache()
+        list_cache (dict): Cache of the library, genre, user and playlist name lists, keyed ('libraries', user_id), ('genres', library_id), ('users',) and ('playlist_names', user_id)
+        metrics (dict): Tool and Emby call metrics from new_metrics(), or None if not enabled
+        metrics_file (str): The file to which metrics are written in Prometheus text format, or None if not configured
         available_libraries (list of dict): A list of dictionaries containing library information:
             name (str): library name
             id (str): library unique identifier
             type (str): library media type              
-        current_library (dict): The currently selected library:
-            name (str): library name
-            id (str): library unique identifier
-            type (str): library media type   
         max_chunk_size (str): The maximum number of items that search tools should return per chunk via MCP
-        search_item_chunking (dict): Chunking information for the current search:
-            search_id (str): The unique ID of the current search
-            total_number_of_items (int): Total number of items in the current search
-            chunk_size (int): the number of items in the current chunk (the smaller of max_chunk_size and number of remaining items)
-            chunk_number (int): the current chunk number (one-based)
-            more_chunks_available (bool): False if this is the last chunk, otherwise True.
-            items (list of dict): all of the actual search items
+        max_chunk_bytes (int): The maximum length of the JSON that search tools should return per chunk via MCP, or 0 for no limit
+        lyrics_index (dict): The lyrics index returned by open_lyrics_index(), or None if not configured
+        library_mirror (dict): The library mirror returned by open_library_mirror(), or None if not configured
+        emby_events (dict): The state of the listener to Emby's WebSocket feed from new_event_state(), or None if not enabled
+        refresh_now (dict): An asyncio.Event per local copy kept up to date by keep_fresh(), set to refresh it early when the library changes
+        background_tasks (list of obj): The tasks keeping the lyrics index, library mirror, metrics file and WebSocket feed up to date
+        user_pool (dict): The clients of the Emby users that MCP clients act as, from new_user_pool(), or None if not configured. See user_context()
+        session_store (dict): The state of each MCP session from new_session_store(), see session_state(). Each session has keys:
+            current_library (dict): The currently selected library:
+                name (str): library name
+                id (str): library unique identifier
+                type (str): library media type   
+            search_store (dict): The cursors of the session's recent searches by search_id, from new_search_store(). Each cursor is as returned by start_item_search():
+                search_id (str): The unique ID of the search
+                library_id (str): The ID of the library being searched
+                query (dict): The search query terms
+                mirror (dict): The library mirror answering the search, or None if Emby is answering it
+                paged (bool): True if chunks are fetched from Emby on demand using StartIndex/Limit
+                items (list of dict): all of the search items if not paged (lyrics searches) until the last chunk is returned, otherwise None
+                pending (list of dict): items fetched for a paged search but left out of the last chunk by the byte limit
+                total_number_of_items (int): Total number of items in the search
+                chunk_size (int): the maximum number of items per chunk
+                chunk_bytes (int): the maximum length of each chunk's JSON
+                chunk_number (int): the number of chunks returned so far
+                chunk_offsets (list of int): the index of the first item of each chunk returned so far
+                chunks (list of list): the items of each chunk returned so far
+                next_index (int): the index of the first item of the next chunk
+                more_chunks_available (bool): False if the last chunk has been returned, otherwise True.
+                held_bytes (int): the approximate JSON size of the items held by the cursor
+                last_used (float): when the cursor was last used
+                lock (obj): serialises use of the cursor by concurrent tool calls
     """
    
     # Load Emby login environment variables from .env file
@@ -121,6 +197,47 @@ async def app_lifespan(server: FastMCP) ->AsyncIterator[dict]:
         username = os.getenv("EMBY_USERNAME")
         password = os.getenv("EMBY_PASSWORD")
         max_chunk_size = os.getenv("LLM_MAX_ITEMS")
+        max_chunk_bytes = int(os.getenv("LLM_MAX_CHUNK_BYTES", "0"))
+        max_searches = int(os.getenv("LLM_MAX_SEARCHES", "16"))
+        search_idle_seconds = float(os.getenv("LLM_SEARCH_IDLE_SECONDS", "1800"))
+        search_max_bytes = int(os.getenv("LLM_SEARCH_MAX_BYTES", "50000000"))
+        session_idle_seconds = float(os.getenv("EMBY_MCP_SESSION_IDLE_SECONDS", "3600"))
+        max_sessions = int(os.getenv("EMBY_MCP_MAX_SESSIONS", "64"))
+        users_path = os.getenv("EMBY_MCP_USERS")
+        if users_path is not None and users_path != "":
+            users_path = os.path.join(os.path.dirname(env_file), users_path) # relative paths are relative to .env
+        max_users = int(os.getenv("EMBY_MCP_MAX_USERS", "32"))
+        user_idle_seconds = float(os.getenv("EMBY_MCP_USER_IDLE_SECONDS", "1800"))
+        lyrics_index_path = os.getenv("EMBY_LYRICS_INDEX")
+        if lyrics_index_path is not None and lyrics_index_path != "":
+            lyrics_index_path = os.path.join(os.path.dirname(env_file), lyrics_index_path) # relative paths are relative to .env
+        lyrics_index_refresh = int(os.getenv("EMBY_LYRICS_INDEX_REFRESH", "3600"))
+        mirror_path = os.getenv("EMBY_LIBRARY_MIRROR")
+        if mirror_path is not None and mirror_path != "":
+            mirror_path = os.path.join(os.path.dirname(env_file), mirror_path) # relative paths are relative to .env
+        mirror_refresh = int(os.getenv("EMBY_LIBRARY_MIRROR_REFRESH", "900"))
+        max_workers = int(os.getenv("EMBY_MAX_WORKERS", "8"))
+        http_pool_size = int(os.getenv("EMBY_HTTP_POOL_SIZE", str(max_workers * 2)))
+        http_connect_timeout = float(os.getenv("EMBY_HTTP_CONNECT_TIMEOUT", "10"))
+        http_read_timeout = float(os.getenv("EMBY_HTTP_READ_TIMEOUT", "300"))
+        http_gzip = os.getenv("EMBY_HTTP_GZIP", "true").lower() in ("true", "yes", "1")
+        http_keepalive = os.getenv("EMBY_HTTP_KEEPALIVE", "true").lower() in ("true", "yes", "1")
+        retries = int(os.getenv("EMBY_RETRIES", "2"))
+        retry_backoff = float(os.getenv("EMBY_RETRY_BACKOFF", "0.2"))
+        hedge_after = float(os.getenv("EMBY_HEDGE_AFTER", "0"))
+        breaker_failures = int(os.getenv("EMBY_BREAKER_FAILURES", "5"))
+        breaker_cooldown = float(os.getenv("EMBY_BREAKER_COOLDOWN", "30"))
+        token_cache_path = os.getenv("EMBY_TOKEN_CACHE")
+        if token_cache_path is not None and token_cache_path != "":
+            token_cache_path = os.path.join(os.path.dirname(env_file), token_cache_path) # relative paths are relative to .env
+        playlist_access_ttl = float(os.getenv("EMBY_PLAYLIST_ACCESS_TTL", "60"))
+        list_cache_ttl = float(os.getenv("EMBY_LIST_CACHE_TTL", "300"))
+        metrics_file = os.getenv("EMBY_METRICS_FILE")
+        if metrics_file is not None and metrics_file != "":
+            metrics_file = os.path.join(os.path.dirname(env_file), metrics_file) # relative paths are relative to .env
+        metrics_enabled = os.getenv("EMBY_METRICS", "false").lower() in ("true", "yes", "1") or (metrics_file is not None and metrics_file != "")
+        metrics_interval = float(os.getenv("EMBY_METRICS_INTERVAL", "60"))
+        websocket_enabled = os.getenv("EMBY_WEBSOCKET", "false").lower() in ("true", "yes", "1")
         if server_url == None or username == None or password == None:
             print("Fatal error, missing required variables. Ensure the .env file contains EMBY_SERVER_URL, EMBY_USERNAME, EMBY_PASSWORD", file=sys.stderr)
             sys.exit(1)
@@ -128,27 +245,123 @@ async def app_lifespan(server: FastMCP) ->AsyncIterator[dict]:
         print("Fatal error, cannot find the .env file. Ensure that it exists in the same directory as script.", file=sys.stderr)
         sys.exit(1)
 
+    # Start measuring Emby calls first, so that the login is measured too
+    metrics = None
+    if metrics_enabled:
+        metrics = new_metrics()
+        install_emby_call_metrics(metrics)
+
     # Login to Emby server
     device_name = MY_HOSTNAME + " (" + MY_PLATFORM + ")"  # shown in Emby server logs & devices page
     client_name = f"{MY_NAME} for AI"  # shown in Emby server logs & devices page
-    auth_context = authenticate_with_emby(server_url, username, password, client_name, MY_VERSION, device_name)
+    device_id = stable_device_id(client_name, device_name, username)  # so that Emby sees the same device each time
+    auth_context = {'success': False}
+    if token_cache_path is not None and token_cache_path != "":
+        # Reuse the access token from the last run if Emby still accepts it, saving a password login
+        auth_context = resume_emby_session(server_url, username, token_cache_path)
+    if not auth_context['success']:
+        auth_context = authenticate_with_emby(server_url, username, password, client_name, MY_VERSION, device_name, device_id)
+        if auth_context['success'] and token_cache_path is not None and token_cache_path != "":
+            result = save_emby_session(token_cache_path, username, auth_context)
+            if not result['success']:
+                print(f"ERROR: cannot save access token to {token_cache_path}: {result['error']}", file=sys.stderr)
     if auth_context['success']:
+        auth_context['token_cache_path'] = token_cache_path
         # Store the authenticated API client and other default context data
         e_api_client = auth_context['api_client']
+        auth_context['transport'] = new_transport_settings(http_pool_size, http_connect_timeout, http_read_timeout, http_gzip, http_keepalive)
+        configure_emby_transport(e_api_client, auth_context['transport'])
+        auth_context['resilience'] = new_resilience_policy(retries, retry_backoff, hedge_after=hedge_after, breaker_failures=breaker_failures, breaker_cooldown=breaker_cooldown)
+        install_emby_resilience(e_api_client, auth_context['resilience'])
+        auth_context['executor'] = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="emby")
+        auth_context['max_workers'] = max_workers
+        auth_context['playlist_access_cache'] = new_cache(playlist_access_ttl)
+        auth_context['list_cache'] = new_cache(list_cache_ttl, max_entries=256)
+        auth_context['metrics'] = metrics
+        auth_context['metrics_file'] = metrics_file if metrics_file != "" else None
         auth_context['available_libraries'] = []
-        auth_context['current_library'] = {}
         auth_context['max_chunk_size'] = max_chunk_size
-        auth_context['search_item_chunking'] = {}
+        auth_context['max_chunk_bytes'] = max_chunk_bytes
+        auth_context['session_store'] = new_session_store(session_idle_seconds, max_sessions, max_searches, search_idle_seconds, search_max_bytes)
+        auth_context['user_pool'] = None
+        auth_context['lyrics_index'] = None
+        auth_context['library_mirror'] = None
+        auth_context['emby_events'] = None
+        auth_context['refresh_now'] = {}
         print(f"Logon to media server was successful. \n\n{MY_LICENSE}", file=sys.stderr)
     else:
         print(f"Fatal ERROR: login to media server failed: {auth_context['error']}", file=sys.stderr)
         sys.exit(1)
 
-    try:
-        yield auth_context
- 
-    finally:
-        # Cleanup and logout of Emby on shutdown
+    # Let each MCP client act as its own Emby user, if a credentials file is configured
+    if users_path is not None and users_path != "":
+        result = load_user_credentials(users_path)
+        if result['success']:
+            auth_context['user_pool'] = new_user_pool(server_url, result['credentials'], auth_context['api_client'], client_name, MY_VERSION, device_name, max_users, user_idle_seconds)
+        else:
+            print(f"Fatal ERROR: cannot read the client keys and credentials in {users_path}: {result['error']}", file=sys.stderr)
+            sys.exit(1)
+
+    # Open the optional lyrics index and library mirror, and keep them up to date in the background
+    background_tasks = []
+    if lyrics_index_path is not None and lyrics_index_path != "":
+        result = open_lyrics_index(lyrics_index_path, refresh_seconds=lyrics_index_refresh)
+        if result['success']:
+            auth_context['lyrics_index'] = result['index']
+            background_tasks.append(asyncio.create_task(keep_fresh(auth_context, 'lyrics_index', refresh_lyrics_index)))
+        else:
+            print(f"ERROR: cannot open lyrics index {lyrics_index_path}, lyrics searches will scan the library: {result['error']}", file=sys.stderr)
+    if mirror_path is not None and mirror_path != "":
+        result = open_library_mirror(mirror_path, auth_context['user_id'], refresh_seconds=mirror_refresh)
+        if result['success']:
+            auth_context['library_mirror'] = result['mirror']
+            background_tasks.append(asyncio.create_task(keep_fresh(auth_context, 'library_mirror', refresh_library_mirror)))
+        else:
+            print(f"ERROR: cannot open library mirror {mirror_path}, all requests will go to the media server: {result['error']}", file=sys.stderr)
+    if metrics is not None and auth_context['metrics_file'] is not None:
+        background_tasks.append(asyncio.create_task(keep_metrics_file(auth_context, metrics_interval)))
+
+    # Follow Emby's WebSocket feed, if enabled, to answer player lists from memory and hear about library changes at once
+    if websocket_enabled:
+        if events_available():
+            auth_context['emby_events'] = new_event_state(server_url, auth_context['access_token'], device_id)
+            on_library_changed = lambda data: emby_library_changed(auth_context, data)
+            background_tasks.append(asyncio.create_task(listen_for_emby_events(auth_context['emby_events'], on_library_changed)))
+        else:
+            print("ERROR: EMBY_WEBSOCKET needs the websockets package (uv pip install websockets), player lists will be read from the media server", file=sys.stderr)
+    auth_context['background_tasks'] = background_tasks
+
+    return auth_context
+
+#--------------------------------------------------
+
+def stop_emby_context(auth_context: dict) ->None:
+    """
+    Stop the background tasks of the shared context and log out of Emby, unless the access token has been saved for reuse next time.
+    Does not need the event loop to be running, so it can also be called once the transport has exited.
+
+    Args:
+        auth_context (dict): The shared context returned by start_emby_context().
+
+    Returns:
+        None
+    """
+
+    for task in auth_context['background_tasks']:
+        task.cancel() # does nothing if the event loop has already cancelled the task
+    auth_context['executor'].shutdown(wait=False, cancel_futures=True)
+    if auth_context['user_pool'] is not None:
+        result = logout_pooled_users(auth_context['user_pool'])
+        if not result['success']:
+            print(f"ERROR: logout of pooled users from media server failed: {result['error']}", file=sys.stderr)
+    metrics = auth_context['metrics']
+    if metrics is not None:
+        if auth_context['metrics_file'] is not None:
+            write_metrics_file(metrics, auth_context['metrics_file'])
+        uninstall_emby_call_metrics(metrics)
+    uninstall_emby_resilience(auth_context['api_client'], auth_context['resilience'])
+    # Cleanup and logout of Emby on shutdown, unless the access token has been saved for reuse next time
+    if auth_context['token_cache_path'] is None or auth_context['token_cache_path'] == "":
         e_api_client = auth_context['api_client']  
         logout_result = logout_from_emby(e_api_client)
         if logout_result['success']:
@@ -156,15 +369,256 @@ async def app_lifespan(server: FastMCP) ->AsyncIterator[dict]:
         else:
             print(f"ERROR: logout from media server failed: {logout_result['error']}", file=sys.stderr)
 
+#--------------------------------------------------
+
+async def run_emby_function(auth_context: dict, emby_function: Callable, *args, **kwargs) ->Any:
+    """
+    Run a blocking function that talks to the Emby server (or the local index and mirror) on the bounded
+    thread pool, so that the MCP event loop can serve other tool calls while this one waits. At most
+    EMBY_MAX_WORKERS such calls run at once; any more wait their turn in the pool's queue.
+
+    Args:
+        auth_context (dict): The lifespan context holding 'executor'.
+        emby_function (func): The blocking function to run, e.g. get_items.
+        *args, **kwargs: The arguments to call it with.
+
+    Returns:
+        Whatever emby_function returns.
+    """
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(auth_context['executor'], functools.partial(emby_function, *args, **kwargs))
+
+#--------------------------------------------------
+
+def progress_reporter(ctx: Context) ->Callable:
+    """
+    Return a function that a blocking function run by run_emby_function() can call as progress(done, total) to send
+    an MCP progress notification to the client of ctx. It does nothing if the client did not ask for progress.
+    """
+
+    loop = asyncio.get_running_loop()
+
+    def progress(done: float, total: Optional[float] = None) ->None:
+        asyncio.run_coroutine_threadsafe(ctx.report_progress(done, total), loop)
+
+    return progress
+
+#--------------------------------------------------
+
+async def keep_fresh(auth_context: dict, context_key: str, refresh_function: Callable) ->None:
+    """
+    Background task that builds a local copy of Emby data (the lyrics index or the library mirror) and then
+    refreshes it periodically. Until the first build completes, requests go to the Emby server as usual.
+
+    Args:
+        auth_context (dict): The lifespan context holding 'api_client', 'user_id' and the local copy.
+        context_key (str): The key of the local copy in auth_context, e.g. 'lyrics_index'.
+        refresh_function (func): The blocking function that refreshes it, called as refresh_function(api_client, user_id, local_copy).
+
+    Returns:
+        None
+    """
+
+    local_copy = auth_context[context_key]
+    refresh_now = auth_context['refresh_now'].setdefault(context_key, asyncio.Event())
+    while True:
+        refresh_now.clear()
+        result = await run_emby_function(auth_context, refresh_function, auth_context['api_client'], auth_context['user_id'], local_copy)
+        if not result['success']:
+            print(f"ERROR: failed to refresh the {context_key.replace('_', ' ')} because: {result['error']}", file=sys.stderr)
+        elif result.get('item_count', 0) > 0:
+            library_changed(auth_context) # the refresh found changed items, so cached lists may be out of date
+        try:
+            await asyncio.wait_for(refresh_now.wait(), local_copy['refresh_seconds'])
+            await asyncio.sleep(LIBRARY_SETTLE_SECONDS) # Emby reports a scan as many changes, so let them settle before refreshing
+        except asyncio.TimeoutError:
+            pass
+
+#--------------------------------------------------
+
+async def keep_metrics_file(auth_context: dict, interval: float) ->None:
+    """
+    Background task that rewrites the metrics file every interval seconds, e.g. for Prometheus' node_exporter textfile collector.
+    Runs until cancelled at shutdown, when the file is written one last time.
+
+    Args:
+        auth_context (dict): The lifespan context holding 'metrics' and 'metrics_file'.
+        interval (float): How often to write the file, in seconds.
+    """
+
+    while True:
+        result = await run_emby_function(auth_context, write_metrics_file, auth_context['metrics'], auth_context['metrics_file'])
+        if not result['success']:
+            print(f"ERROR: cannot write metrics to {auth_context['metrics_file']}: {result['error']}", file=sys.stderr)
+        await asyncio.sleep(interval)
+
+#--------------------------------------------------
+
+async def load_available_libraries(auth_context: dict) ->dict:
+    """
+    Get the list of libraries (from the list cache if possible) and save it in the context as 'available_libraries'.
+
+    Args:
+        auth_context (dict): The lifespan context.
+
+    Returns:
+        dict: The result of get_library_list()
+    """
+
+    library_list = await run_emby_function(auth_context, cached_call, auth_context['list_cache'], ('libraries', auth_context['user_id']), get_library_list, auth_context['api_client'])
+    if library_list['success']:
+        auth_context['available_libraries'] = library_list['items'] # Save list in context
+    else:
+        auth_context['available_libraries'] = [] # Clear saved context
+    return library_list
+
+#--------------------------------------------------
+
+async def user_context(ctx: Context) ->ChainMap:
+    """
+    Get the context for the Emby user that the MCP client making the current request acts as.
+
+    Without a user pool (EMBY_MCP_USERS), and for the stdio transport, every request acts as the user in the .env file
+    and this is simply the lifespan context. Otherwise the client's key, sent as "Authorization: Bearer <client key>",
+    chooses a pooled user (see get_pooled_user()), whose 'api_client', 'user_id', 'available_libraries' and 'library_mirror'
+    are used in place of those of the lifespan context. Everything else is shared with the lifespan context.
+
+    Args:
+        ctx (obj): The MCP context of the current request, from mcp.get_context().
+
+    Returns:
+        dict: The lifespan context, or a ChainMap of the pooled user and the lifespan context
+
+    Raises:
+        ToolError: if the client key is missing or unknown, or the user cannot log in
+    """
+
+    auth_context = ctx.request_context.lifespan_context
+    user_pool = auth_context['user_pool']
+    request = ctx.request_context.request
+    if user_pool is None or request is None:
+        return auth_context
+
+    authorization = request.headers.get('authorization', '')
+    client_key = authorization[7:].strip() if authorization[:7].lower() == 'bearer ' else None
+    result = await run_emby_function(auth_context, get_pooled_user, user_pool, client_key)
+    if not result['success']:
+        raise ToolError(f"ERROR: {result['error']}")
+    return ChainMap(result['user'], auth_context)
+
+#--------------------------------------------------
+
+def session_state(ctx: Context) ->dict:
+    """
+    Get the state of the MCP session making the current request: its selected library and recent searches.
+    Each client connected over the streamable-http or sse transports has its own, see new_session_store().
+
+    Args:
+        ctx (obj): The MCP context of the current request, from mcp.get_context().
+
+    Returns:
+        dict: The session state returned by get_session_state()
+    """
+
+    return get_session_state(ctx.request_context.lifespan_context['session_store'], ctx.session)
+
+#--------------------------------------------------
+
+def library_changed(auth_context: dict) ->None:
+    """
+    Forget cached lists that depend on the contents of the libraries, after something has changed on the Emby server.
+
+    Args:
+        auth_context (dict): The lifespan context.
+
+    Returns:
+        None
+    """
+
+    cache_invalidate_prefix(auth_context['list_cache'], ('genres',))
+
+#--------------------------------------------------
+
+def emby_library_changed(auth_context: dict, data: dict) ->None:
+    """
+    Called by the WebSocket feed when Emby reports a library change made by anyone: forget cached lists and
+    playlist names and sharing that may be out of date, and refresh the lyrics index and library mirror early.
+
+    Args:
+        auth_context (dict): The lifespan context.
+        data (dict): The Data of Emby's LibraryChanged message.
+
+    Returns:
+        None
+    """
+
+    library_changed(auth_context)
+    cache_invalidate_prefix(auth_context['list_cache'], ('playlist_names',))
+    cache_invalidate(auth_context['playlist_access_cache'])
+    for refresh_now in auth_context['refresh_now'].values():
+        refresh_now.set()
+
+#--------------------------------------------------
+
+async def playlist_changed(auth_context: dict, playlist_id: str, sharing: bool = False) ->None:
+    """
+    Forget cached information about a playlist and update it in the library mirror (if there is one), after a tool has changed it.
+
+    Args:
+        auth_context (dict): The lifespan context.
+        playlist_id (str): The ID of the playlist that has changed.
+        sharing (bool, optional): True if the sharing of the playlist has changed.
+
+    Returns:
+        None
+    """
+
+    available_libraries = auth_context['available_libraries']
+    if available_libraries is None or len(available_libraries) == 0:
+        await load_available_libraries(auth_context)
+        available_libraries = auth_context['available_libraries']
+    for library in available_libraries:
+        if library['type'] == 'playlists':
+            # The genres of a playlist library are the genres of the items on its playlists
+            cache_invalidate(auth_context['list_cache'], ('genres', library['id']))
+    if sharing:
+        cache_invalidate(auth_context['playlist_access_cache'], playlist_id)
+
+    mirror = auth_context['library_mirror']
+    if mirror is not None:
+        result = await run_emby_function(auth_context, refresh_mirror_playlist, auth_context['api_client'], auth_context['user_id'], available_libraries, mirror, playlist_id)
+        if not result['success']:
+            print(f"ERROR: failed to update playlist ID {playlist_id} in the library mirror because: {result['error']}", file=sys.stderr)
+
 # Pass lifespan to server
 mcp = FastMCP(name=MY_NAME, lifespan=app_lifespan)
 
+#--------------------------------------------------
+
+def metered_tool() ->Callable:
+    """
+    Register an MCP tool, as @mcp.tool() does, measuring each call when metrics are enabled (EMBY_METRICS).
+    When metrics are not enabled the only cost is one dictionary lookup per tool call.
+    """
+
+    def register(tool_function: Callable) ->Callable:
+        @functools.wraps(tool_function)
+        async def metered(*args, **kwargs):
+            metrics = mcp.get_context().request_context.lifespan_context.get('metrics')
+            if metrics is None:
+                return await tool_function(*args, **kwargs)
+            return await metered_tool_call(metrics, tool_function.__name__, tool_function, *args, **kwargs)
+        mcp.tool()(metered)
+        return tool_function
+    return register
+
 #--------------------------------------------------
 # Userlist Tools
 #-------------------------
 
-@mcp.tool()
-def retrieve_user_list() -> str:
+@metered_tool()
+async def retrieve_user_list() -> str:
     """
     Retrieves a list of user names and their user IDs from the Emby server in JSON format.
 
@@ -178,10 +632,10 @@ def retrieve_user_list() -> str:
     """
 
     ctx = mcp.get_context()
-    auth_context = ctx.request_context.lifespan_context
+    auth_context = await user_context(ctx)
     e_api_client = auth_context['api_client']
 
-    result = get_users(e_api_client)
+    result = await run_emby_function(auth_context, cached_call, auth_context['list_cache'], ('users',), get_users, e_api_client)
     if result['success']:
         return json.dumps(result['users'])
     else:
@@ -193,8 +647,8 @@ def retrieve_user_list() -> str:
 # Library Tools
 #-------------------------
 
-@mcp.tool()
-def retrieve_library_list() -> str:
+@metered_tool()
+async def retrieve_library_list() -> str:
     """
     Retrieve a list of libraries from the Emby media server in JSON format.
 
@@ -209,24 +663,20 @@ def retrieve_library_list() -> str:
     """
 
     ctx = mcp.get_context()
-    auth_context = ctx.request_context.lifespan_context
-    e_api_client = auth_context['api_client']
+    auth_context = await user_context(ctx)
 
-    library_list = get_library_list(e_api_client)
+    library_list = await load_available_libraries(auth_context)
     if library_list['success']:
-        available_libraries = library_list['items']
-        auth_context['available_libraries'] = available_libraries # Save list in context  
-        return json.dumps(available_libraries)
+        return json.dumps(library_list['items'])
     else:
-        auth_context['available_libraries'] = [] # Clear saved context
         error_str = f"ERROR: failed to retrieve library list because: {library_list['error']}"
         print(error_str, file=sys.stderr)
         return error_str
 
 #--------------------------------------------------
 
-@mcp.tool()
-def select_library(library_name: str = "") -> str:
+@metered_tool()
+async def select_library(library_name: str = "") -> str:
     """
     Select a library on the Emby media server by supplying the library's name.
 
@@ -239,19 +689,19 @@ def select_library(library_name: str = "") -> str:
 
     if library_name is not None or library_name != "":
         ctx = mcp.get_context()
-        auth_context = ctx.request_context.lifespan_context
+        auth_context = await user_context(ctx)
         available_libraries = auth_context['available_libraries']
 
         if available_libraries is None or len(available_libraries) == 0:
             # No saved library data, so retrieve the list from the server
-            result = retrieve_library_list() # returns json, not useful here
-            available_libraries = auth_context['available_libraries'] # however this has been updated
+            await load_available_libraries(auth_context)
+            available_libraries = auth_context['available_libraries']
 
         if available_libraries is not None and len(available_libraries) > 0:
             result = set_current_library(available_libraries, library_name)
             if result['success']:
-                # save the selection to the app context
-                auth_context['current_library'] = result['library']
+                # save the selection to the session's state
+                session_state(ctx)['current_library'] = result['library']
                 return 'Success'
             else:
                 return f"ERROR: {result['error']}"
@@ -262,8 +712,8 @@ def select_library(library_name: str = "") -> str:
 
 #--------------------------------------------------
 
-@mcp.tool()
-def retrieve_current_library() -> str:
+@metered_tool()
+async def retrieve_current_library() -> str:
     """
     Retrieve the name of the currently selected library on the Emby media server in JSON format.
 
@@ -277,10 +727,9 @@ def retrieve_current_library() -> str:
         type (str): library media type
     """
     ctx = mcp.get_context()
-    auth_context = ctx.request_context.lifespan_context
-    current_library = auth_context['current_library']    
+    current_library = session_state(ctx)['current_library']    
 
-    if current_library is not None:
+    if current_library:
         return json.dumps(current_library)
     else:
         return "ERROR: no library is currently selected. Select library using tool select_library"
@@ -289,8 +738,8 @@ def retrieve_current_library() -> str:
 # Genre Tools
 #-------------------------
 
-@mcp.tool()
-def retrieve_genre_list() -> str:
+@metered_tool()
+async def retrieve_genre_list() -> str:
     """
     Retrieve a list of item genres available in the current library on the Emby media server in JSON format.
 
@@ -302,12 +751,17 @@ def retrieve_genre_list() -> str:
     """
 
     ctx = mcp.get_context()
-    auth_context = ctx.request_context.lifespan_context
-    current_library = auth_context['current_library']
+    auth_context = await user_context(ctx)
+    current_library = session_state(ctx)['current_library']
 
-    if current_library is not None:
+    if current_library:
         e_api_client = auth_context['api_client']
-        genre_list = get_genre_list(e_api_client, library_id=current_library['id'])
+        mirror = auth_context['library_mirror']
+        genre_list = {'success': False}
+        if mirror is not None and mirror['ready']:
+            genre_list = await run_emby_function(auth_context, get_mirror_genres, mirror, current_library['id'])
+        if not genre_list['success']:
+            genre_list = await run_emby_function(auth_context, cached_call, auth_context['list_cache'], ('genres', current_library['id']), get_genre_list, e_api_client, library_id=current_library['id'])
         if genre_list['success']:
             return json.dumps(genre_list['genres'])
         else:
@@ -321,12 +775,13 @@ def retrieve_genre_list() -> str:
 # Item Tools
 #-------------------------
 
-@mcp.tool()
-def search_for_item(title_or_album: Optional[str] = "", 
+@metered_tool()
+async def search_for_item(title_or_album: Optional[str] = "", 
                     artist_name: Optional[str] = "", 
                     genre_name: Optional[str] = "", 
                     broadcast_release_years: Optional[str] = "",
-                    lyrics_or_description: Optional[str] = ""
+                    lyrics_or_description: Optional[str] = "",
+                    fields: Optional[str] = "full"
                     ) -> str:
     """
     Search for media items on the Emby server by item title or album name, artist name, genre name and release / broadcast years. 
@@ -341,6 +796,10 @@ def search_for_item(title_or_album: Optional[str] = "",
         genre_name (str, optional): genre that items are tagged with
         broadcast_release_years (str, optional): The item release year(s). Allows multiple years, comma separated.
         lyrics_or_description (str, optional): a phrase to find in the lyrics or long description for the item 
+        fields (str, optional): how much detail to return for each item, applied to every chunk of the search. One of 'minimal' 
+            (title, artists, album, item_id), 'standard' (adds album, track, year, genre, type and run time details) or 'full' 
+            (every key, the default), or a comma separated list of the item keys below. Use 'minimal' when you only need titles and IDs,
+            as it returns much less data and is faster.
     
     Returns:
         Dict: as JSON with keys:
@@ -371,10 +830,10 @@ def search_for_item(title_or_album: Optional[str] = "",
     """
 
     ctx = mcp.get_context()
-    auth_context = ctx.request_context.lifespan_context
-    current_library = auth_context['current_library']
+    auth_context = await user_context(ctx)
+    current_library = session_state(ctx)['current_library']
 
-    if current_library is not None:
+    if current_library:
         e_api_client = auth_context['api_client']
         user_id = auth_context['user_id']
         max_chunk_size = int(auth_context['max_chunk_size'])
@@ -390,35 +849,17 @@ def search_for_item(title_or_album: Optional[str] = "",
             kwargs['years'] = broadcast_release_years
         if  lyrics_or_description is not None and lyrics_or_description != "":
             kwargs['lyrics'] = lyrics_or_description
+        if  fields is not None and fields != "":
+            kwargs['fields'] = fields
 
-        item_list = get_items(e_api_client, user_id, library_id=current_library['id'], **kwargs)
-        if item_list['success']:
-            # Build the return dictionary
-            total_items = len(item_list['items'])
-            auth_context['search_item_chunking'] = {} # Clear any previously saved results
-            search_results = {}
-            search_id = str(uuid.uuid4())
-            search_results['search_id'] = search_id
-            search_results['total_number_of_items'] = total_items
-            search_results['chunk_size'] = max_chunk_size if max_chunk_size < total_items else total_items
-            search_results['chunk_number'] = 0
-            search_results['items'] = item_list['items']
-
-            if max_chunk_size is not None and max_chunk_size > 0 and max_chunk_size < total_items:
-                # more items than can be returned in one go, so save to context and retrieve first chunk
-                search_results['more_chunks_available'] = True # False means this is the last chunk
-                auth_context['search_item_chunking'] = search_results
-                # retrieve and return the first chunk
-                search_results = retrieve_next_search_chunk() 
-            else:
-                # acceptable number of items, so mark as last chunk 
-                search_results['chunk_number'] = 1
-                search_results['more_chunks_available'] = False # False means this is the last chunk
-
-            return json.dumps(search_results)
+        result = await run_emby_function(auth_context, start_item_search, e_api_client, user_id, current_library['id'], max_chunk_size, lyrics_index=auth_context['lyrics_index'], mirror=auth_context['library_mirror'], max_chunk_bytes=auth_context['max_chunk_bytes'], **kwargs)
+        if result['success']:
+            # save the cursor so that retrieve_next_search_chunk can return further chunks, or this one again
+            store_search(session_state(ctx)['search_store'], result['cursor'])
+            return json.dumps(result['chunk'])
 
         else:
-            error_str = f"ERROR: failed to retrieve item list because: {item_list['error']}"
+            error_str = f"ERROR: failed to retrieve item list because: {result['error']}"
             print(error_str, file=sys.stderr)
             return  json.dumps({'error' : error_str})
     else:
@@ -427,17 +868,21 @@ def search_for_item(title_or_album: Optional[str] = "",
 
 #--------------------------------------------------
 
-@mcp.tool()
-def retrieve_next_search_chunk() -> str:
+@metered_tool()
+async def retrieve_next_search_chunk(search_id: Optional[str] = "", chunk_number: Optional[int] = 0) -> str:
     """
     Retrieve the next chunk of search results that were found by tool search_for_item. Use retrieve_next_search_chunk when you are
     ready to process more media items, and repeat until 'more_chunks_available' is no longer true or no data is returned.
+    Several searches can be read at once by giving the 'search_id' that search_for_item returned, and any chunk can be
+    retrieved again (or skipped to) by giving its 'chunk_number'. Recent searches are remembered for a while, after which
+    search_for_item must be used again.
     Returns search results as a JSON format, including control data 'total_number_of_items', 'chunk_size' and 'more_chunks_available' 
     which indicate whether further search results are available via tool retrieve_next_search_chunk.
     A human may use any returned JSON field to identify an item. You must only supply the corresponding 'item_id' field when using other tools.
 
     Args:
-        None
+        search_id (str, optional): The 'search_id' returned by search_for_item. Defaults to the most recent search.
+        chunk_number (int, optional): The chunk to retrieve (one-based). Defaults to the chunk after the last one retrieved.
 
     Returns:
         Dict: as JSON with keys:
@@ -446,7 +891,7 @@ def retrieve_next_search_chunk() -> str:
         chunk_size (int): the number of items in the current chunk
         chunk_number (int): the current chunk number (one-based)
         more_chunks_available (bool): False if this is the last chunk, otherwise True.
-        items (list of dict): the actual items with keys:
+        items (list of dict): the actual items, with the keys chosen by the 'fields' of the search from:
             title (str): the title of the item.
             artists (list): the artists of the item, as a list of strings.
             album (str): the album of the item.
@@ -467,99 +912,112 @@ def retrieve_next_search_chunk() -> str:
     """
     
     ctx = mcp.get_context()
-    auth_context = ctx.request_context.lifespan_context
-    search_results = auth_context['search_item_chunking']
-
-    # Safely extract control data 
-    if search_results is not None and len(search_results) > 0:
-        items = []
-        total_items = None
-        chunk_size = None
-        chunk_number = None
-        search_id = None
-        total_number_of_items = None
-
-        for key in search_results:
-            match key:
-                case "search_id":
-                    search_id = search_results[key]
-                case "total_number_of_items":
-                    total_items = int(search_results[key])
-                case "chunk_size":
-                    chunk_size = int(search_results[key])
-                case "chunk_number":
-                    chunk_number = int(search_results[key])
-                case "items":
-                    items = search_results[key]
-
-        # Handle missing or bad control data by returning zeroed control data 
-        if total_items is None or chunk_size is None or chunk_number is None:
-            auth_context['search_item_chunking'] = {} # Clear any previously saved results
-            return json.dumps({})
-        if total_items <= 0 or len(items) <= 0 or chunk_size <= 0 or chunk_number < 0:
-            auth_context['search_item_chunking'] = {} # Clear any previously saved results
-            return json.dumps({
-                'search_id' : search_id if search_id is not None else "",
-                'total_number_of_items' : 0,
-                'chunk_size' : 0,
-                'chunk_number' : 0,
-                'more_chunks_available' : False,
-                'items' : []
-            })
-
-        # Calculate the range of items to return in this chunk
-        # chunk_start is zero-based for use as list index
-        # chunk_end, chunk_size, chunk_number, total_items, remaining_items are one-based.
-        chunk_start = chunk_number * chunk_size
-        remaining_items = total_items - chunk_start
-        if remaining_items > 0:
-            if remaining_items > chunk_size:
-                chunk_end = chunk_start + chunk_size
-                more_chunks = True # False means this is the last chunk
-            else:
-                chunk_end = chunk_start + remaining_items
-                more_chunks = False # False means this is the last chunk
-                chunk_size = remaining_items
-        else:
-            # Discovering zero remaining items is a soft error, so return what we know 
-            auth_context['search_item_chunking'] = {} # Clear any previously saved results
-            return json.dumps({
-                'search_id' : search_id if search_id is not None else "",
-                'total_number_of_items' : total_items,
-                'chunk_size' : 0,
-                'chunk_number' : chunk_number,
-                'more_chunks_available' : False,
-                'items' : []
-            })
-
-        # Extract, save and return items in this chunck
-        chunk_number += 1 # increment for next chunk
-        chunk_items = []
-        for counter in range(chunk_start, chunk_end, 1):
-            chunk_items.append(items[counter])
-        if more_chunks:         
-            auth_context['search_item_chunking']['more_chunks_available'] = True
-            auth_context['search_item_chunking']['chunk_number'] = chunk_number
+    auth_context = await user_context(ctx)
+    search_store = session_state(ctx)['search_store']
+    cursor = find_search(search_store, search_id)
+
+    if cursor is not None:
+        e_api_client = auth_context['api_client']
+        user_id = auth_context['user_id']
+
+        result = await run_emby_function(auth_context, next_search_chunk, e_api_client, user_id, cursor, chunk_number)
+        prune_searches(search_store) # the search may have grown
+        if result['success']:
+            return json.dumps(result['chunk'])
         else:
-            auth_context['search_item_chunking'] = {} # Clear any previously saved results
-        return json.dumps({
-            'search_id' : search_id if search_id is not None else "",
-            'total_number_of_items' : total_items,
-            'chunk_size' : chunk_size,
-            'chunk_number' : chunk_number,
-            'more_chunks_available' : more_chunks,
-            'items' : chunk_items
-        })
-
-    # The context storage was empty so return an empty dictionary
+            error_str = f"ERROR: failed to retrieve the next search chunk because: {result['error']}"
+            print(error_str, file=sys.stderr)
+            return json.dumps({'error' : error_str})
+
+    if search_id is not None and search_id != "":
+        return json.dumps({'error' : f"ERROR: search ID {search_id} is unknown or has expired. Use tool search_for_item to search again."})
+
+    # There is no search to continue so return an empty dictionary
     return json.dumps({})
 
+#--------------------------------------------------
+
+@metered_tool()
+async def summarise_items(title_or_album: Optional[str] = "", 
+                    artist_name: Optional[str] = "", 
+                    genre_name: Optional[str] = "", 
+                    broadcast_release_years: Optional[str] = "",
+                    lyrics_or_description: Optional[str] = "",
+                    group_by: Optional[str] = "",
+                    sort_groups_by: Optional[str] = "item_count",
+                    top_groups: Optional[int] = 20
+                    ) -> str:
+    """
+    Count the media items on the Emby server that match a search, and their total run time, optionally grouped by artist, album,
+    genre or release year. The search parameters are the same as for tool search_for_item. Use summarise_items rather than
+    search_for_item to answer questions such as "how many hours of jazz from the 1960s do I have" or "my top 20 artists by track count",
+    as only the totals are returned rather than every item.
+
+    Args:
+        title_or_album (str, optional): name of item, track, episode or album. 
+        artist_name (str, optional): name of artist
+        genre_name (str, optional): genre that items are tagged with
+        broadcast_release_years (str, optional): The item release year(s). Allows multiple years, comma separated.
+        lyrics_or_description (str, optional): a phrase to find in the lyrics or long description for the item 
+        group_by (str, optional): one of 'artist', 'album', 'genre' or 'year', or empty for the totals only. An item with several
+            artists or genres is counted in the group of each.
+        sort_groups_by (str, optional): one of 'item_count' (most items first, the default), 'run_time' (longest first) or 'name'.
+        top_groups (int, optional): the most groups to return (default 20), or 0 for every group.
+
+    Returns:
+        Dict: as JSON with keys:
+        total_number_of_items (int): the number of items matching the search
+        total_run_time (str): their total run time as hh:mm:ss
+        total_run_time_hours (float): their total run time in hours
+        group_by (str): as supplied, or null if not grouped
+        number_of_groups (int): the number of groups, including any not returned because of top_groups
+        groups (list of dict): the groups, with keys:
+            name (str or int): the artist, album, genre or year, or "" for items that have none
+            item_count (int): the number of matching items in the group
+            run_time (str): their total run time as hh:mm:ss
+            run_time_hours (float): their total run time in hours
+            album_id (str): the unique identifier of the album, for album groups only
+            album_artist (str): the designated album artist, for album groups only
+    """
+
+    ctx = mcp.get_context()
+    auth_context = await user_context(ctx)
+    current_library = session_state(ctx)['current_library']
+
+    if current_library:
+        e_api_client = auth_context['api_client']
+        user_id = auth_context['user_id']
+
+        kwargs = {}
+        if title_or_album is not None and title_or_album != "":
+            kwargs['search_term'] = title_or_album
+        if  artist_name is not None and artist_name != "":
+            kwargs['artist'] = artist_name
+        if  genre_name is not None and genre_name != "":
+            kwargs['genre'] = genre_name
+        if  broadcast_release_years is not None and broadcast_release_years != "":
+            kwargs['years'] = broadcast_release_years
+        if  lyrics_or_description is not None and lyrics_or_description != "":
+            kwargs['lyrics'] = lyrics_or_description
+
+        result = await run_emby_function(auth_context, aggregate_items, e_api_client, user_id, current_library['id'], group_by=group_by, sort_by=sort_groups_by,
+                                         top_groups=top_groups if top_groups is not None else 20, lyrics_index=auth_context['lyrics_index'], mirror=auth_context['library_mirror'], **kwargs)
+        if result['success']:
+            return json.dumps({key: value for key, value in result.items() if key != 'success'})
+
+        else:
+            error_str = f"ERROR: failed to summarise items because: {result['error']}"
+            print(error_str, file=sys.stderr)
+            return json.dumps({'error' : error_str})
+    else:
+        return json.dumps({'error' : "ERROR: no library is currently selected. Select library using tool select_library"})
+
 #--------------------------------------------------
 # Playlist Tools
 #-------------------------
 
-@mcp.tool()
-def create_playlist(playlist_name: str, media_type: str = "Audio", description: Optional[str] = "", item_ids: Optional[str] = "") -> str:
+@metered_tool()
+async def create_playlist(playlist_name: str, media_type: str = "Audio", description: Optional[str] = "", item_ids: Optional[str] = "") -> str:
     """
     Create a new playlist on the Emby server with the supplied name, optional description and optional items to add.
 
@@ -567,24 +1025,27 @@ def create_playlist(playlist_name: str, media_type: str = "Audio", description:
         playlist_name (str): The name of the playlist to create
         media_type (str): The type of media the playlist will accept. One of 'Audio', 'Video'.
         description (str, optional): A short description of the playlist, or an empty string.
-        item_ids (str, optional): The ID of one or more items obtained from tool search_for_item to add to the playlist as a comma separated list
+        item_ids (str, optional): The ID of one or more items obtained from tool search_for_item to add to the playlist as a comma separated list.
+            Thousands of items can be given at once.
 
     Returns:
         Dict: as JSON with keys:
         playlist_id (str): the unique identifier of the playlist within this Emby server.
+        item_count (int): the number of items added to the playlist, if item_ids were given.
+        failed_item_ids (str): the comma separated IDs of any items that could not be added, which may be given to tool add_items_to_playlist to try again.
         success (bool): True if the request was successful, False if an error occured.
         error (str): An error message if the request failed, otherwise None.
     """
 
     ctx = mcp.get_context()
-    auth_context = ctx.request_context.lifespan_context
+    auth_context = await user_context(ctx)
     e_api_client = auth_context['api_client']
     user_id = auth_context['user_id']
     available_libraries = auth_context['available_libraries']
 
     if available_libraries is None or len(available_libraries) == 0:
         # No saved library data, so retrieve the list from the server
-        result = retrieve_library_list() # returns json, not useful here
+        await load_available_libraries(auth_context)
         available_libraries = auth_context['available_libraries']
 
     if available_libraries is not None and len(available_libraries) > 0:
@@ -594,14 +1055,19 @@ def create_playlist(playlist_name: str, media_type: str = "Audio", description:
         if  description is not None and description != "":
             kwargs['overview'] = description
 
-        result = new_playlist(e_api_client, user_id, available_libraries, playlist_name, **kwargs)
+        result = await run_emby_function(auth_context, new_playlist, e_api_client, user_id, available_libraries, playlist_name, name_cache=auth_context['list_cache'], **kwargs)
         if result['success']:
             if item_ids is not None and item_ids != "":
-                add_items_result = add_playlist_items(e_api_client, user_id, result['playlist_id'], item_ids)
+                add_items_result = await run_emby_function(auth_context, add_playlist_items, e_api_client, user_id, result['playlist_id'], item_ids, progress=progress_reporter(ctx))
                 if not add_items_result['success']:
-                    error_str = f"ERROR: successfully created the playlist but failed to add items to it because: {add_items_result['error']}"
+                    error_str = f"ERROR: successfully created the playlist but added only {add_items_result.get('item_count', 0)} items to it because: {add_items_result['error']}"
                     print(error_str, file=sys.stderr)
+                    await playlist_changed(auth_context, result['playlist_id'])
+                    result['item_count'] = add_items_result.get('item_count', 0)
+                    result['failed_item_ids'] = ",".join(batch['item_ids'] for batch in add_items_result.get('failed_batches', []))
                     return f"{json.dumps(result)}\n{error_str}"
+                result['item_count'] = add_items_result['item_count']
+            await playlist_changed(auth_context, result['playlist_id'])
             return json.dumps(result)
         else:
             error_str = f"ERROR: failed to create playlist because: {result['error']}"
@@ -614,8 +1080,8 @@ def create_playlist(playlist_name: str, media_type: str = "Audio", description:
 
 #--------------------------------------------------
 
-@mcp.tool()
-def modify_playlist_name(playlist_id: str, new_name: Optional[str] = "", new_description: Optional[str] = "") -> str:
+@metered_tool()
+async def modify_playlist_name(playlist_id: str, new_name: Optional[str] = "", new_description: Optional[str] = "") -> str:
     """
     Modifies an existing playlist on the Emby server with the supplied new name and/or new description.
 
@@ -629,14 +1095,14 @@ def modify_playlist_name(playlist_id: str, new_name: Optional[str] = "", new_des
     """
 
     ctx = mcp.get_context()
-    auth_context = ctx.request_context.lifespan_context
+    auth_context = await user_context(ctx)
     e_api_client = auth_context['api_client']
     user_id = auth_context['user_id']
     available_libraries = auth_context['available_libraries']
 
     if available_libraries is None or len(available_libraries) == 0:
         # No saved library data, so retrieve the list from the server
-        result = retrieve_library_list() # returns json, not useful here
+        await load_available_libraries(auth_context)
         available_libraries = auth_context['available_libraries']
 
     if available_libraries is not None and len(available_libraries) > 0:
@@ -646,8 +1112,9 @@ def modify_playlist_name(playlist_id: str, new_name: Optional[str] = "", new_des
         if  new_description is not None and new_description != "":
             kwargs['overview'] = new_description
 
-        result = set_playlist_meta(e_api_client, user_id, available_libraries, playlist_id, **kwargs)
+        result = await run_emby_function(auth_context, set_playlist_meta, e_api_client, user_id, available_libraries, playlist_id, name_cache=auth_context['list_cache'], **kwargs)
         if result['success']:
+            await playlist_changed(auth_context, playlist_id)
             return "Playlist successfully modified"
         else:
             error_str = f"ERROR: failed to modify playlist because: {result['error']}"
@@ -660,14 +1127,16 @@ def modify_playlist_name(playlist_id: str, new_name: Optional[str] = "", new_des
 
 #--------------------------------------------------
 
-@mcp.tool()
-def retrieve_playlist_list(playlist_id: Optional[str] = "") -> str:
+@metered_tool()
+async def retrieve_playlist_list(playlist_id: Optional[str] = "", include_user_access: Optional[bool] = True) -> str:
     """
     Retrieve a list of playlists available to us on the Emby media server in JSON format.
     If you supply an optional playlist_id then only information about this playlist will be returned.
+    If you only need playlist names and IDs, set include_user_access to False as this is much quicker when there are many playlists.
 
     Args:
         playlist_id (str, optional): The ID of the playlist to list, obtained from tool retrieve_playlist_list, or an empty string to list all playlists.
+        include_user_access (bool, optional): True to include can_share and user_access for each playlist, or False to leave them out (empty).
 
     Returns:
         List  of dicts as JSON with keys:
@@ -686,22 +1155,33 @@ def retrieve_playlist_list(playlist_id: Optional[str] = "") -> str:
     """
 
     ctx = mcp.get_context()
-    auth_context = ctx.request_context.lifespan_context
+    auth_context = await user_context(ctx)
     e_api_client = auth_context['api_client']
     user_id = auth_context['user_id']
     available_libraries = auth_context['available_libraries']
 
     if available_libraries is None or len(available_libraries) == 0:
         # No saved library data, so retrieve the list from the server
-        library_list = retrieve_library_list() # returns json which is not useful here
+        await load_available_libraries(auth_context)
         available_libraries = auth_context['available_libraries']
 
     if available_libraries is not None and len(available_libraries) > 0:
-        result = get_playlists(e_api_client, user_id, available_libraries, playlist_id)
+        mirror = auth_context['library_mirror']
+        result = {'success': False}
+        if mirror is not None and mirror['ready']:
+            result = await run_emby_function(auth_context, get_mirror_playlists, mirror, playlist_id)
+            if result['success'] and playlist_id is not None and playlist_id != "" and len(result['playlists']) == 0:
+                result = {'success': False} # may be a playlist made since the mirror was refreshed, so ask Emby
+        if not result['success']:
+            result = await run_emby_function(auth_context, get_playlists, e_api_client, user_id, available_libraries, playlist_id, include_access=include_user_access,
+                                             max_workers=auth_context['max_workers'], access_cache=auth_context['playlist_access_cache'])
         if result['success']:
             # Substitute friendly name instead of Emby's share name 
             playlist_list = result['playlists']
             for playlist in playlist_list:
+                if not include_user_access:
+                    playlist['user_access'] = []
+                    playlist['can_share'] = False
                 for user in playlist['user_access']:
                     if user['access_level'] == 'ManageDelete':
                         user['access_level'] = 'Full Control'
@@ -717,16 +1197,18 @@ def retrieve_playlist_list(playlist_id: Optional[str] = "") -> str:
 
 #--------------------------------------------------
 
-@mcp.tool()
-def retrieve_playlist_items(playlist_id: str) -> str:
+@metered_tool()
+async def retrieve_playlist_items(playlist_id: str, fields: Optional[str] = "full") -> str:
     """
     Retrieve the list of media items that are on a playlist from the Emby server in JSON format.
 
     Args:
         playlist_id (str): The ID of the playlist to list, obtained from tool retrieve_playlist_list.
+        fields (str, optional): how much detail to return for each item, as for tool search_for_item: 'minimal', 'standard', 'full' 
+            (the default) or a comma separated list of the keys below. playlist_item_number and playlist_item_index are always returned.
 
     Returns:
-        List  of dicts as JSON with keys:
+        List  of dicts as JSON, with the keys chosen by 'fields' from:
         title (str): the title of the item.
         artists (list): the artists of the item, as a list of strings.
         album (str): the album of the item.
@@ -741,19 +1223,24 @@ def retrieve_playlist_items(playlist_id: str) -> str:
         overview (str): the short description of the item.
         lyrics (str): the lyrics for, or long description of, the item
         media_type (str): the item type, either 'Audio' or 'Video'.
-        run_time_ticks (int): the run time of the item in ticks (100 nanoseconds).
         bitrate (int): the bitrate of the item in bits per second.
+        run_time (str): the run time of the item as hh:mm:ss.
         item_id (str): the unique identifier of the item within this Emby server.
         playlist_item_number (str): the unique identifier of the item within this playlist.
         playlist_item_index (str): the position of the item within this playlist.
     """
 
     ctx = mcp.get_context()
-    auth_context = ctx.request_context.lifespan_context
+    auth_context = await user_context(ctx)
     e_api_client = auth_context['api_client']
     user_id = auth_context['user_id']
 
-    result = get_playlist_items(e_api_client, user_id, playlist_id)
+    mirror = auth_context['library_mirror']
+    result = {'success': False}
+    if mirror is not None and mirror['ready']:
+        result = await run_emby_function(auth_context, get_mirror_playlist_items, mirror, playlist_id, fields=fields)
+    if not result['success']:
+        result = await run_emby_function(auth_context, get_playlist_items, e_api_client, user_id, playlist_id, fields=fields)
     if result['success']:
         return json.dumps(result['items'])
     else:
@@ -763,27 +1250,35 @@ def retrieve_playlist_items(playlist_id: str) -> str:
 
 #--------------------------------------------------
 
-@mcp.tool()
-def add_items_to_playlist(playlist_id: str, item_ids: str) -> str:
+@metered_tool()
+async def add_items_to_playlist(playlist_id: str, item_ids: str) -> str:
     """
     Adds one or more items to the end of an existing playlist on the Emby server.
 
     Args:
         playlist_id (str): The ID of the playlist to list, obtained from tool retrieve_playlist_list.
         item_ids (str): The ID of one or more items obtained from tool search_for_item as a comma separated list to add to the playlist.
+            Thousands of items can be given at once.
  
     Returns:
-        Str: success messsage or error message.
+        Str: success messsage or error message. If only some items were added, the message lists the IDs of those that were not.
     """
 
     ctx = mcp.get_context()
-    auth_context = ctx.request_context.lifespan_context
+    auth_context = await user_context(ctx)
     e_api_client = auth_context['api_client']
     user_id = auth_context['user_id']
 
-    result = add_playlist_items(e_api_client, user_id, playlist_id, item_ids)
+    result = await run_emby_function(auth_context, add_playlist_items, e_api_client, user_id, playlist_id, item_ids, progress=progress_reporter(ctx))
     if result['success']:
+        await playlist_changed(auth_context, playlist_id)
         return f"Successfully added {result['item_count']} items to playlist."
+    elif result.get('item_count', 0) > 0:
+        await playlist_changed(auth_context, playlist_id)
+        failed_item_ids = ",".join(batch['item_ids'] for batch in result['failed_batches'])
+        error_str = f"ERROR: added only {result['item_count']} items to playlist ID {playlist_id} because: {result['error']}. These item IDs were not added: {failed_item_ids}"
+        print(error_str, file=sys.stderr)
+        return error_str
     else:
         error_str = f"ERROR: failed to add items to playlist ID {playlist_id} because: {result['error']}"
         print(error_str, file=sys.stderr)
@@ -791,8 +1286,8 @@ def add_items_to_playlist(playlist_id: str, item_ids: str) -> str:
 
 #--------------------------------------------------
 
-@mcp.tool()
-def remove_items_from_playlist(playlist_id: str, playlist_item_numbers: str) -> str:
+@metered_tool()
+async def remove_items_from_playlist(playlist_id: str, playlist_item_numbers: str) -> str:
     """
     Removes one or more items from an existing playlist on the Emby server.
 
@@ -805,22 +1300,26 @@ def remove_items_from_playlist(playlist_id: str, playlist_item_numbers: str) ->
     """
 
     ctx = mcp.get_context()
-    auth_context = ctx.request_context.lifespan_context
+    auth_context = await user_context(ctx)
     e_api_client = auth_context['api_client']
     user_id = auth_context['user_id']
 
-    result = delete_playlist_items(e_api_client, playlist_id, playlist_item_numbers)
+    result = await run_emby_function(auth_context, delete_playlist_items, e_api_client, playlist_id, playlist_item_numbers)
     if result['success']:
+        await playlist_changed(auth_context, playlist_id)
         return f"Successfully removed items from playlist."
     else:
         error_str = f"ERROR: failed to remove items from playlist ID {playlist_id} because: {result['error']}"
+        if result.get('item_count', 0) > 0:
+            await playlist_changed(auth_context, playlist_id)
+            error_str = f"ERROR: removed only {result['item_count']} items from playlist ID {playlist_id} because: {result['error']}"
         print(error_str, file=sys.stderr)
         return error_str
 
 #--------------------------------------------------
 
-@mcp.tool()
-def reorder_items_on_playlist(playlist_id: str, playlist_item_number: str, playlist_item_index: str) -> str:
+@metered_tool()
+async def reorder_items_on_playlist(playlist_id: str, playlist_item_number: str, playlist_item_index: str) -> str:
     """
     Moves one items to a new position on an existing playlist on the Emby server.
 
@@ -837,22 +1336,69 @@ def reorder_items_on_playlist(playlist_id: str, playlist_item_number: str, playl
     """
 
     ctx = mcp.get_context()
-    auth_context = ctx.request_context.lifespan_context
+    auth_context = await user_context(ctx)
     e_api_client = auth_context['api_client']
     user_id = auth_context['user_id']
 
-    result = move_playlist_items(e_api_client, playlist_id, playlist_item_number, playlist_item_index)
+    result = await run_emby_function(auth_context, move_playlist_items, e_api_client, playlist_id, playlist_item_number, playlist_item_index)
     if result['success']:
+        await playlist_changed(auth_context, playlist_id)
         return f"Successfully reordered items on playlist."
     else:
         error_str = f"ERROR: failed to remove items from playlist ID {playlist_id} because: {result['error']}"
+        if result.get('item_count', 0) > 0:
+            await playlist_changed(auth_context, playlist_id)
+            error_str = f"ERROR: removed only {result['item_count']} items from playlist ID {playlist_id} because: {result['error']}"
         print(error_str, file=sys.stderr)
         return error_str
 
 #--------------------------------------------------
 
-@mcp.tool()
-def share_playlist_public(playlist_id: str) -> str:
+@metered_tool()
+async def sync_items_on_playlist(playlist_id: str, item_ids: str) -> str:
+    """
+    Makes an existing playlist on the Emby server hold exactly the given items in the given order, adding, removing and
+    reordering items as needed. Use this rather than many calls to add_items_to_playlist, remove_items_from_playlist and
+    reorder_items_on_playlist when reshaping a playlist, e.g. sorting, shuffling or replacing much of it, as it works out
+    the fewest changes needed and makes them in a handful of requests however long the playlist is.
+
+    Args:
+        playlist_id (str): The ID of the playlist to change, obtained from tool retrieve_playlist_list.
+        item_ids (str): The item_id of every item the playlist should hold, in order, as a comma separated list. Obtain item IDs
+            from tools retrieve_playlist_items or search_for_item. An item may be listed more than once.
+
+    Returns:
+        Dict: as JSON with keys:
+        item_count (int): the number of items on the playlist.
+        unchanged (int): the number of items that were left where they were.
+        removed (int): the number of items removed.
+        added (int): the number of items added.
+        moved (int): the number of added items moved into place.
+        emby_requests (int): the number of requests made to the Emby server.
+        error (str): An error message if the playlist could not be put in the wanted order, otherwise not present.
+    """
+
+    ctx = mcp.get_context()
+    auth_context = await user_context(ctx)
+    e_api_client = auth_context['api_client']
+    user_id = auth_context['user_id']
+
+    result = await run_emby_function(auth_context, sync_playlist_items, e_api_client, user_id, playlist_id, item_ids)
+    if result['success']:
+        await playlist_changed(auth_context, playlist_id)
+        return json.dumps({key: value for key, value in result.items() if key != 'success'})
+    else:
+        error_str = f"ERROR: failed to sync items on playlist ID {playlist_id} because: {result['error']}"
+        print(error_str, file=sys.stderr)
+        if result.get('emby_requests', 1) > 1:
+            # A write was attempted, and even a failed one may have changed the playlist
+            await playlist_changed(auth_context, playlist_id)
+        return json.dumps(dict({key: value for key, value in result.items() if key != 'success'}, error=error_str))
+
+#--------------------------------------------------
+
+@metered_tool()
+async def share_playlist_public(playlist_id: str) -> str:
     """
     Shares an existing playlist with all other users of the Emby server as Read access.
 
@@ -864,11 +1410,12 @@ def share_playlist_public(playlist_id: str) -> str:
     """
 
     ctx = mcp.get_context()
-    auth_context = ctx.request_context.lifespan_context
+    auth_context = await user_context(ctx)
     e_api_client = auth_context['api_client']
 
-    result = set_playlist_sharing(e_api_client, playlist_id, 'Public')
+    result = await run_emby_function(auth_context, set_playlist_sharing, e_api_client, playlist_id, 'Public')
     if result['success']:
+        await playlist_changed(auth_context, playlist_id, sharing=True)
         return f"Successfully shared playlist with other users."
     else:
         error_str = f"ERROR: failed to share playlist ID {playlist_id} because: {result['error']}"
@@ -877,8 +1424,8 @@ def share_playlist_public(playlist_id: str) -> str:
 
 #--------------------------------------------------
 
-@mcp.tool()
-def share_playlist_user_access(playlist_id: str, user_ids: str, access_level:str) -> str:
+@metered_tool()
+async def share_playlist_user_access(playlist_id: str, user_ids: str, access_level:str) -> str:
     """
     Shares an existing playlist with specific users of the Emby server and specifi access rights.
     
@@ -898,12 +1445,13 @@ def share_playlist_user_access(playlist_id: str, user_ids: str, access_level:str
         access_level = 'ManageDelete' # the actual Emby access name
 
     ctx = mcp.get_context()
-    auth_context = ctx.request_context.lifespan_context
+    auth_context = await user_context(ctx)
     e_api_client = auth_context['api_client']
 
     user_id_list = user_ids.split(",")
-    result = set_playlist_sharing(e_api_client, playlist_id, 'Shared', user_ids=user_id_list, item_access=access_level)
+    result = await run_emby_function(auth_context, set_playlist_sharing, e_api_client, playlist_id, 'Shared', user_ids=user_id_list, item_access=access_level)
     if result['success']:
+        await playlist_changed(auth_context, playlist_id, sharing=True)
         return f"Successfully shared playlist with other users."
     else:
         error_str = f"ERROR: failed to share playlist ID {playlist_id} because: {result['error']}"
@@ -912,8 +1460,8 @@ def share_playlist_user_access(playlist_id: str, user_ids: str, access_level:str
 
 #--------------------------------------------------
 
-@mcp.tool()
-def stop_sharing_playlist(playlist_id: str) -> str:
+@metered_tool()
+async def stop_sharing_playlist(playlist_id: str) -> str:
     """
     Stop the public sharing of an existing playlist with other users of the Emby server.
     If a user was granted specific access then they will still retain that access after you stop public sharing - use tool 
@@ -928,11 +1476,12 @@ def stop_sharing_playlist(playlist_id: str) -> str:
     """
 
     ctx = mcp.get_context()
-    auth_context = ctx.request_context.lifespan_context
+    auth_context = await user_context(ctx)
     e_api_client = auth_context['api_client']
 
-    result = set_playlist_sharing(e_api_client, playlist_id, 'Private')
+    result = await run_emby_function(auth_context, set_playlist_sharing, e_api_client, playlist_id, 'Private')
     if result['success']:
+        await playlist_changed(auth_context, playlist_id, sharing=True)
         return f"Successfully stopped sharing playlist with other users."
     else:
         error_str = f"ERROR: failed to stop sharing playlist ID {playlist_id} because: {result['error']}"
@@ -943,8 +1492,8 @@ def stop_sharing_playlist(playlist_id: str) -> str:
 # Player Tools
 #-------------------------
 
-@mcp.tool()
-def retrieve_player_list(media_type: Optional[str] = "") -> str:
+@metered_tool()
+async def retrieve_player_list(media_type: Optional[str] = "") -> str:
     """
     Retrieve a list of media players that we can use with the supplied media type in JSON format.
     A human may use any JSON field to identify a player, but do not display the 'device_id' or 'session_id'
@@ -976,11 +1525,13 @@ def retrieve_player_list(media_type: Optional[str] = "") -> str:
     """
 
     ctx = mcp.get_context()
-    auth_context = ctx.request_context.lifespan_context
+    auth_context = await user_context(ctx)
     e_api_client = auth_context['api_client']
     user_id = auth_context['user_id']
 
-    result = get_player_sessions(e_api_client, user_id=user_id, media_type=media_type)
+    result = get_event_player_sessions(auth_context['emby_events'], user_id, media_type) # answered from memory while the WebSocket feed is connected
+    if not result['success']:
+        result = await run_emby_function(auth_context, get_player_sessions, e_api_client, user_id=user_id, media_type=media_type)
     if result['success']:
         return json.dumps(result['sessions'])
     else:
@@ -990,16 +1541,18 @@ def retrieve_player_list(media_type: Optional[str] = "") -> str:
 
 #--------------------------------------------------
 
-@mcp.tool()
-def retrieve_player_queue(session_id: str) -> str:
+@metered_tool()
+async def retrieve_player_queue(session_id: str, fields: Optional[str] = "full") -> str:
     """
     Retrieve a list of items in the play queue of a media player in JSON format.
 
     Args:
         session_id (str): The ID of the player session to query, obtained from tool retrieve_player_list
+        fields (str, optional): how much detail to return for each item, as for tool search_for_item: 'minimal', 'standard', 'full' 
+            (the default) or a comma separated list of item keys. playlist_item_id is always returned.
 
     Returns:
-        List  of dicts as JSON with keys:
+        List  of dicts as JSON, with the keys chosen by 'fields' from:
         title (str): item name
         artists (list of str): name of the item's atists  
         album (str): name of the album that the item is from
@@ -1020,11 +1573,11 @@ def retrieve_player_queue(session_id: str) -> str:
     """
 
     ctx = mcp.get_context()
-    auth_context = ctx.request_context.lifespan_context
+    auth_context = await user_context(ctx)
     e_api_client = auth_context['api_client']
     user_id = auth_context['user_id']
 
-    result = get_playqueue_items(e_api_client, session_id)
+    result = await run_emby_function(auth_context, get_playqueue_items, e_api_client, session_id, fields=fields)
     if result['success']:
         return json.dumps(result['items'])
     else:
@@ -1034,8 +1587,8 @@ def retrieve_player_queue(session_id: str) -> str:
 
 #--------------------------------------------------
 
-@mcp.tool()
-def control_media_player(session_id: str, command: str, item_ids: Optional[str] = None, time_milliseconds: Optional[int] = None) -> str:
+@metered_tool()
+async def control_media_player(session_id: str, command: str, item_ids: Optional[str] = None, time_milliseconds: Optional[int] = None) -> str:
     """
     Control the media player identified as 'session_id' by sending it a 'command'. 
     Valid commands are: 'PlayNow', 'Stop', 'Pause', 'Unpause', 'NextTrack', 'PreviousTrack', 'Seek', 'Rewind', 'FastForward'.
@@ -1053,7 +1606,7 @@ def control_media_player(session_id: str, command: str, item_ids: Optional[str]
     """
 
     ctx = mcp.get_context()
-    auth_context = ctx.request_context.lifespan_context
+    auth_context = await user_context(ctx)
     e_api_client = auth_context['api_client']
     user_id = auth_context['user_id']
 
@@ -1064,7 +1617,7 @@ def control_media_player(session_id: str, command: str, item_ids: Optional[str]
             item_ids = ""
         if time_milliseconds is None:
             time_milliseconds = 0
-        player_result = send_player_command(e_api_client, session_id, command, item_ids=item_ids, user_id=user_id, time_ms=time_milliseconds)
+        player_result = await run_emby_function(auth_context, send_player_command, e_api_client, session_id, command, item_ids=item_ids, user_id=user_id, time_ms=time_milliseconds)
         if player_result['success']:
             return "Success"
         else:
@@ -1076,6 +1629,158 @@ def control_media_player(session_id: str, command: str, item_ids: Optional[str]
     else:
         return "ERROR: no command was supplied. Valid commands are: 'PlayNow', 'Stop', 'Pause', 'Unpause', 'NextTrack', 'PreviousTrack', 'Seek', 'Rewind', 'FastForward'."
 
+#--------------------------------------------------
+
+@metered_tool()
+async def control_media_players(command: str, session_ids: Optional[str] = "", media_type: Optional[str] = "", device_name: Optional[str] = "", item_ids: Optional[str] = None, time_milliseconds: Optional[int] = None) -> str:
+    """
+    Control several media players at once by sending them all the same 'command', e.g. to pause every player or play music on all speakers.
+    Use this rather than calling control_media_player once per player. Choose the players by 'session_ids' obtained from the
+    retrieve_player_list tool, or by 'media_type' and/or a 'device_name' pattern; with none of these, every player is controlled.
+    Valid commands are: 'PlayNow', 'Stop', 'Pause', 'Unpause', 'NextTrack', 'PreviousTrack', 'Seek', 'Rewind', 'FastForward'.
+    The PlayNow command requires 'item_ids' contain one or more comma separated 'item_id' obtained from the search_for_item tool.
+
+    Args:
+        command (str): One of 'PlayNow', 'Stop', 'Pause', 'Unpause', 'NextTrack', 'PreviousTrack', 'Seek', 'Rewind', 'FastForward'.
+        session_ids (str, optional): Comma separated IDs of the player sessions to control, obtained from tool retrieve_player_list.
+        media_type (str, optional): Control only players of this media type (one of: 'Audio', 'Video', 'Photo').
+        device_name (str, optional): Control only players whose device name matches this pattern, with * and ? wildcards and ignoring case (e.g. '*speaker*').
+        item_ids (str, optional): The ID of one or more items obtained from tool search_for_item to add to the play queues as a comma separated list. Required for command 'PlayNow'.
+        time_milliseconds (int, optional): The time in milliseconds for commands 'Seek', 'Rewind', 'FastForward'. If 0 or None then defaults will be used.
+
+    Returns:
+        Dict: as JSON with keys:
+        results (list of dict): one per player controlled, with keys:
+            session_id (str): The ID of the player session
+            device_name (str): The name of the device running the session
+            success (bool): True if the player accepted the command
+            error (str): why the player did not accept the command, otherwise None
+            seconds (float): how long the command took
+        succeeded (int): the number of players that accepted the command
+        failed (int): the number of players that did not
+        seconds (float): how long it took to control all of the players
+        Or Str: error message if no players could be chosen.
+    """
+
+    ctx = mcp.get_context()
+    auth_context = await user_context(ctx)
+    e_api_client = auth_context['api_client']
+    user_id = auth_context['user_id']
+
+    if command == "":
+        return "ERROR: no command was supplied. Valid commands are: 'PlayNow', 'Stop', 'Pause', 'Unpause', 'NextTrack', 'PreviousTrack', 'Seek', 'Rewind', 'FastForward'."
+    if command.lower() == "play":
+        command = "PlayNow"
+    if item_ids is None:
+        item_ids = ""
+    if time_milliseconds is None:
+        time_milliseconds = 0
+
+    result = get_event_player_sessions(auth_context['emby_events'], user_id, media_type) # answered from memory while the WebSocket feed is connected
+    if not result['success']:
+        result = await run_emby_function(auth_context, get_player_sessions, e_api_client, user_id=user_id, media_type=media_type)
+    if not result['success']:
+        error_str = f"ERROR: failed to retrieve player list because: {result['error']}"
+        print(error_str, file=sys.stderr)
+        return error_str
+    sessions = select_player_sessions(result['sessions'], session_ids, device_name)
+    if len(sessions) == 0:
+        return "ERROR: no players match. Obtain session_id from tool retrieve_player_list, or choose players by media_type or device_name"
+
+    result = await run_emby_function(auth_context, broadcast_player_command, e_api_client, [session['session_id'] for session in sessions], command,
+                                     max_workers=auth_context['max_workers'], item_ids=item_ids, user_id=user_id, time_ms=time_milliseconds)
+    if 'results' not in result:
+        error_str = f"ERROR: failed to control the players because: {result['error']}"
+        print(error_str, file=sys.stderr)
+        return error_str
+    if not result['success']:
+        print(f"ERROR: failed to control some players because: {result['error']}", file=sys.stderr)
+    for session, session_result in zip(sessions, result['results']):
+        session_result['device_name'] = session['device_name']
+    return json.dumps({'results': result['results'], 'succeeded': result['succeeded'], 'failed': result['failed'], 'seconds': result['seconds']})
+
+#--------------------------------------------------
+# Diagnostics Tools
+#-------------------------
+
+@metered_tool()
+async def retrieve_diagnostics() -> str:
+    """
+    Retrieve how Emby.MCP is performing in JSON format: its connections to the Emby server, the MCP sessions and Emby users
+    it is serving, and, when metrics are enabled in the .env file (EMBY_METRICS=true), how long each tool and each Emby
+    server call has taken since Emby.MCP started, slowest first.
+
+    Args:
+        None
+
+    Returns:
+        Dict: as JSON with keys:
+        uptime_seconds (float): how long the metrics have been collected, or None if metrics are not enabled
+        series (list of dict): one entry per tool or Emby call, empty if metrics are not enabled, with keys:
+            kind (str): 'tool' for a tool, 'emby_call' for an Emby server call, 'emby_http' for just its HTTP transfer
+            name (str): the tool name, or the Emby call's method and path
+            count (int): the number of calls
+            errors (int): the number of failed calls
+            total_seconds (float): the total time taken
+            mean_seconds (float): the average time taken
+            p50_seconds (float): the median time taken
+            p95_seconds (float): the 95th percentile time taken
+            max_seconds (float): the longest time taken
+            mean_bytes (int): the average response size
+            mean_items (float): the average number of items returned, for Emby calls
+        metrics_note (str): how to enable metrics, only present if they are not enabled
+        transport (dict): the connections to the Emby server, with keys:
+            settings (dict): the EMBY_HTTP_ settings in use: pool_size, connect_timeout, read_timeout, gzip and keepalive
+            hosts (list of dict): one entry per Emby server, with keys:
+                host (str): the server's scheme, host and port
+                connections_opened (int): the number of connections opened so far
+                requests (int): the number of requests sent so far
+                requests_per_connection (float): how many requests each connection has carried on average
+                idle_connections (int): the number of open connections waiting for the next request
+        resilience (dict): how failed and slow requests to the Emby server are handled, with keys:
+            retries, backoff_seconds, hedge_after, breaker_failures, breaker_cooldown: the EMBY_ retry, hedge and breaker settings in use
+            breaker_state (str): 'closed' if requests go through, 'open' if they fail at once because Emby is not responding, 'half-open' while a trial request is in flight
+            consecutive_failures (int): the number of failed requests since the last success
+            counts (dict): the number of requests, retries, hedges, hedge_wins (hedges answered first), fast_failures (requests failed by the open breaker) and breaker_opened so far
+        events (dict): Emby's WebSocket feed, or None if EMBY_WEBSOCKET is not enabled, with keys:
+            connected (bool): True while the feed is connected
+            ready (bool): True if player lists are being answered from memory rather than by the media server
+            sessions (int): the number of Emby sessions held in memory
+            seconds_since_sessions_updated (float): how long ago Emby last reported a change to its sessions
+            counts (dict): the number of connects, messages, session_lists, playback_events and library_changes received so far
+        sessions (dict): the MCP sessions sharing this process, with keys:
+            sessions (int): the number of sessions that have state (a selected library or searches)
+            searches (int): the number of searches held by those sessions
+            evicted (int): the number of sessions whose state has been dropped for being idle or least recently used
+            idle_seconds (float): how long a session's state is kept after it was last used
+            max_sessions (int): the maximum number of sessions to keep state for
+        users (dict): the Emby users that MCP clients act as, or None if EMBY_MCP_USERS is not set, with keys:
+            clients (int): the number of users with a logged in client
+            tokens (int): the number of users with an access token, including those whose client has been dropped
+            logins (int): the number of password logins made so far
+            evicted (int): the number of clients dropped for being idle or least recently used
+            max_clients (int): the maximum number of users to keep a logged in client for
+            idle_seconds (float): how long a user's client is kept after it was last used
+    """
+
+    ctx = mcp.get_context()
+    auth_context = ctx.request_context.lifespan_context
+    metrics = auth_context['metrics']
+
+    if metrics is None:
+        diagnostics = {'uptime_seconds': None, 'series': [], 'metrics_note': "Metrics are not enabled. Set EMBY_METRICS=true in the .env file and restart Emby.MCP to collect them."}
+    else:
+        result = get_metrics_summary(metrics)
+        diagnostics = {'uptime_seconds': result['uptime_seconds'], 'series': result['series']}
+    diagnostics['transport'] = get_transport_summary(auth_context['api_client'], auth_context['transport'])
+    diagnostics['resilience'] = get_resilience_summary(auth_context['resilience'])
+    emby_events = auth_context['emby_events']
+    diagnostics['events'] = get_event_summary(emby_events) if emby_events is not None else None
+    diagnostics['sessions'] = get_session_summary(auth_context['session_store'])
+    user_pool = auth_context['user_pool']
+    diagnostics['users'] = get_user_pool_summary(user_pool) if user_pool is not None else None
+    return json.dumps(diagnostics)
+
 #==================================================
 # Main Entry Point and Script Execution
 # Only used if script run directly for startup checks or debugging.
@@ -1099,17 +1804,35 @@ if __name__ == "__main__":
             username = os.getenv("EMBY_USERNAME")
             password = os.getenv("EMBY_PASSWORD")
             max_chunk_size = os.getenv("LLM_MAX_ITEMS")
+            transport = os.getenv("EMBY_MCP_TRANSPORT", "stdio").lower()
+            host = os.getenv("EMBY_MCP_HOST", "127.0.0.1")
+            port = int(os.getenv("EMBY_MCP_PORT", "8000"))
+            token_cache_path = os.getenv("EMBY_TOKEN_CACHE")
+            if token_cache_path is not None and token_cache_path != "":
+                token_cache_path = os.path.join(os.path.dirname(env_file), token_cache_path) # relative paths are relative to .env
             if server_url == None or username == None or password == None:
                 print("Fatal error, missing required variables. Ensure the .env file contains EMBY_SERVER_URL, EMBY_USERNAME, EMBY_PASSWORD", file=sys.stderr)
                 sys.exit(1)
+            if transport not in ("stdio", "streamable-http", "sse"):
+                print(f"Fatal error, unknown EMBY_MCP_TRANSPORT {transport}. Use one of stdio, streamable-http or sse", file=sys.stderr)
+                sys.exit(1)
         else:
             print("Fatal error, cannot find the .env file. Ensure that it exists in the same directory as script.", file=sys.stderr)
             sys.exit(1)
         
-        # Login to Emby server
+        # Login to Emby server as the same device as start_emby_context(), reusing and saving the access token if it is cached
         device_name = MY_HOSTNAME + " (" + MY_PLATFORM + ")"  # shown in Emby server logs & devices page
-        client_name = f"{MY_NAME}"  # shown in Emby server logs & devices page
-        result = authenticate_with_emby(server_url, username, password, client_name, MY_VERSION, device_name)
+        client_name = f"{MY_NAME} for AI"  # shown in Emby server logs & devices page
+        token_cached = token_cache_path is not None and token_cache_path != ""
+        result = {'success': False}
+        if token_cached:
+            result = resume_emby_session(server_url, username, token_cache_path)
+        if not result['success']:
+            result = authenticate_with_emby(server_url, username, password, client_name, MY_VERSION, device_name, stable_device_id(client_name, device_name, username))
+            if result['success'] and token_cached:
+                save_result = save_emby_session(token_cache_path, username, result)
+                if not save_result['success']:
+                    print(f"ERROR: cannot save access token to {token_cache_path}: {save_result['error']}", file=sys.stderr)
         if result['success']:
             e_api_client = result['api_client']
             print(f"Logon to media server was successful.", file=sys.stderr)
@@ -1126,16 +1849,34 @@ if __name__ == "__main__":
             print(f"ERROR: failed to retrieve library list: {result['error']}", file=sys.stderr)
             sys.exit(2)
 
-        # Log out 
-        result = logout_from_emby(e_api_client)
-        if result['success']:
-            print("Logout from media server was successful", file=sys.stderr)
-        else:
-            print(f"ERROR: logout from media server failed: {result['error']}", file=sys.stderr)
-            sys.exit(2)
+        # Log out, unless the access token has been saved for start_emby_context() to reuse
+        if not token_cached:
+            result = logout_from_emby(e_api_client)
+            if result['success']:
+                print("Logout from media server was successful", file=sys.stderr)
+            else:
+                print(f"ERROR: logout from media server failed: {result['error']}", file=sys.stderr)
+                sys.exit(2)
 
         print(f"Startup checks have completed.\n", file=sys.stderr)
-        print(f"Running Emby.MCP in standalone mode, press CTRL-C to exit.\n", file=sys.stderr)
-        mcp.run(transport='stdio')
+        if transport == "stdio":
+            print(f"Running Emby.MCP in standalone mode, press CTRL-C to exit.\n", file=sys.stderr)
+            mcp.run(transport='stdio')
+        else:
+            # Serve many MCP clients from this process, sharing one Emby login between them. The login is
+            # kept while no clients are connected, so that the next client does not have to wait for it.
+            mcp.settings.host = host
+            mcp.settings.port = port
+            shared_context['keep_warm'] = True
+            path = mcp.settings.streamable_http_path if transport == "streamable-http" else mcp.settings.sse_path
+            print(f"Running Emby.MCP for many clients at http://{host}:{port}{path} ({transport}), press CTRL-C to exit.\n", file=sys.stderr)
+            try:
+                mcp.run(transport=transport)
+            except KeyboardInterrupt:
+                pass
+            finally:
+                if shared_context['auth_context'] is not None:
+                    stop_emby_context(shared_context['auth_context'])
+                    shared_context['auth_context'] = None
 
 #--------------------------------------------------
\ No newline at end of file
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Model Context Protocol (MCP) server that connects an Emby media server to an AI client such as Claude Desktop.
+See emby_mcp_server.py for details.
+
+Copyright (C) 2025 Dominic Search <code@angeltek.co.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+#==================================================
+# Functions for Summarising Emby Media Items
+#==================================================
+
+# Questions such as "how many hours of jazz from the 1960s do I have" or "top 20 artists by track count" need
+# every matching item, but only to count it. Rather than page the items through the MCP client, the items are
+# read here a batch of columns at a time (see get_item_columns()), only the columns needed to count them are
+# built, and just the totals and the largest groups are returned.
+
+from typing import Optional, Unpack
+from emby_client.rest import ApiException
+from lib_emby_functions import get_item_columns, getitems_kwargs
+from lib_emby_columns import format_run_time, TICKS_PER_SECOND
+from lib_emby_mirror import mirror_can_search, search_mirror_items
+
+# The item keys that each group_by groups on, as (key of the group name, True if an item can be in several groups,
+# extra keys returned with each group). Albums are grouped by ID, as different artists' albums often share a name.
+AGGREGATE_GROUPS = {
+    'artist': ('artists', True, ()),
+    'album': ('album', False, ('album_id', 'album_artist')),
+    'genre': ('genres', True, ()),
+    'year': ('production_year', False, ())
+}
+AGGREGATE_SORTS = ('item_count', 'run_time', 'name')
+
+#--------------------------------------------------
+# Aggregation Functions
+#-------------------------
+
+def aggregate_items(e_api_client: object, user_id: str, library_id: str = "", group_by: Optional[str] = "", sort_by: Optional[str] = "item_count", top_groups: int = 20,
+                    lyrics_index: Optional[dict] = None, mirror: Optional[dict] = None, **kwargs: Unpack[getitems_kwargs]) ->dict:
+    """
+    Count the media items that match a query and add up their run times, in total and optionally grouped by artist,
+    album, genre or release year. Items are matched exactly as get_items() matches them. An item with several artists
+    or genres is counted in the group of each.
+    If a ready library mirror can answer the query then the items are counted from the mirror instead of Emby.
+
+    Args:
+        e_api_client (obj): The authenticated API client.
+        user_id (str): The ID of the user doing the search.
+        library_id (str, optional): The ID of the library to search, or empty to search all libraries.
+        group_by (str, optional): One of AGGREGATE_GROUPS ('artist', 'album', 'genre', 'year'), or empty for the totals only.
+        sort_by (str, optional): Order of the groups, one of 'item_count' (most first), 'run_time' (longest first) or 'name'.
+        top_groups (int, optional): The most groups to return, or 0 for every group.
+        lyrics_index (dict, optional): The index returned by open_lyrics_index(), used to speed up lyrics searches.
+        mirror (dict, optional): The mirror returned by open_library_mirror(), used instead of Emby where it can answer the query.
+        **kwargs: search query terms as accepted by get_items(), except fields, start_index and limit.
+
+    Returns:
+        dict: A dictionary with keys:
+        total_number_of_items (int): The number of matching items
+        total_run_time (str): Their total run time as hh:mm:ss
+        total_run_time_hours (float): Their total run time in hours
+        group_by (str): as supplied, or None if not grouped
+        number_of_groups (int): The number of groups, including those not returned because of top_groups
+        groups (list of dict): The groups in the order of sort_by, empty if not grouped, with keys:
+            name (str or int): The artist, album, genre or year, or "" for items that have none
+            item_count (int): The number of matching items in the group
+            run_time (str): Their total run time as hh:mm:ss
+            run_time_hours (float): Their total run time in hours
+            album_id (str): The unique identifier of the album, for album groups only
+            album_artist (str): The album's designated artist, for album groups only
+        success (bool): True if the request was successful, False otherwise.
+        error (str): An error message if the request failed, otherwise None.
+    """
+
+    group_by = (group_by or "").strip().lower()
+    sort_by = (sort_by or "item_count").strip().lower()
+    if group_by != "" and group_by not in AGGREGATE_GROUPS:
+        return {
+            'success': False,
+            'error': f"Unknown group_by {group_by}. Use one of {', '.join(AGGREGATE_GROUPS)}, or leave it empty for the totals only"
+        }
+    if sort_by not in AGGREGATE_SORTS:
+        return {
+            'success': False,
+            'error': f"Unknown sort_by {sort_by}. Use one of {', '.join(AGGREGATE_SORTS)}"
+        }
+
+    query = {key: value for key, value in kwargs.items() if key not in ('fields', 'start_index', 'limit') and value is not None and value != ""}
+    group_key, multi_valued, extra_keys = AGGREGATE_GROUPS[group_by] if group_by != "" else (None, False, ())
+    group_keys = [group_key, *extra_keys] if group_key is not None else []
+
+    if mirror_can_search(mirror, library_id, query):
+        # The mirror holds formatted run times, so count them to the second
+        item_list = search_mirror_items(mirror, library_id=library_id, fields=','.join(['run_time'] + group_keys), **query)
+        if not item_list['success']:
+            return item_list
+        columns = {key: [item.get(key) for item in item_list['items']] for key in group_keys}
+        columns['run_time_seconds'] = [_run_time_seconds(item.get('run_time')) for item in item_list['items']]
+        column_batches = {'success': True, 'batches': [columns]}
+    else:
+        column_batches = get_item_columns(e_api_client, user_id, library_id, ['run_time_seconds'] + group_keys, lyrics_index=lyrics_index, **query)
+        if not column_batches['success']:
+            return column_batches
+
+    total_items = 0
+    total_seconds = 0.0
+    groups = {} # group ID -> [name, item count, seconds, extra values]
+    try:
+        for columns in column_batches['batches']:
+            seconds_column = columns['run_time_seconds']
+            total_items += len(seconds_column)
+            total_seconds += sum(seconds_column)
+            if group_key is None:
+                continue
+            extra_columns = [columns[key] for key in extra_keys]
+            for row, (names, seconds) in enumerate(zip(columns[group_key], seconds_column)):
+                if multi_valued:
+                    names = list(dict.fromkeys(names)) if names else [""] # an item listing an artist twice is counted once
+                else:
+                    names = [names if names is not None else ""]
+                extras = [column[row] for column in extra_columns]
+                for name in names:
+                    group_id = (extras[0] or name) if group_by == 'album' else name
+                    group = groups.get(group_id)
+                    if group is None:
+                        group = groups[group_id] = [name, 0, 0.0, extras]
+                    group[1] += 1
+                    group[2] += seconds
+
+    except ApiException as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+    match sort_by:
+        case 'item_count':
+            sort_key = lambda group: (-group[1], str(group[0]).casefold())
+        case 'run_time':
+            sort_key = lambda group: (-group[2], str(group[0]).casefold())
+        case 'name':
+            sort_key = lambda group: str(group[0]).casefold()
+    ordered = sorted(groups.values(), key=sort_key)
+    if top_groups is not None and top_groups > 0:
+        ordered = ordered[:top_groups]
+
+    group_list = []
+    for name, item_count, seconds, extras in ordered:
+        group_entry = {
+            'name': name,
+            'item_count': item_count,
+            'run_time': _format_seconds(seconds),
+            'run_time_hours': round(seconds / 3600, 2)
+        }
+        group_entry.update(zip(extra_keys, extras))
+        group_list.append(group_entry)
+
+    return {
+        'success': True,
+        'total_number_of_items': total_items,
+        'total_run_time': _format_seconds(total_seconds),
+        'total_run_time_hours': round(total_seconds / 3600, 2),
+        'group_by': group_by if group_by != "" else None,
+        'number_of_groups': len(groups),
+        'groups': group_list
+    }
+
+#--------------------------------------------------
+
+def _format_seconds(seconds: float) ->str:
+    """
+    Format a number of seconds as hh:mm:ss, where hh may be more than 24.
+    """
+
+    return format_run_time(round(seconds * TICKS_PER_SECOND)) or "00:00:00"
+
+#--------------------------------------------------
+
+def _run_time_seconds(run_time: Optional[str]) ->int:
+    """
+    Turn a run time formatted as hh:mm:ss back into seconds, or 0 if it is empty or not understood.
+    """
+
+    parts = (run_time or "").split(':')
+    if len(parts) != 3 or not all(part.isdigit() for part in parts):
+        return 0
+    return int(parts[0]) * 3600 + int(parts[1]) * 60 + int(parts[2])
+
+#--------------------------------------------------
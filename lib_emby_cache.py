@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Model Context Protocol (MCP) server that connects an Emby media server to an AI client such as Claude Desktop.
+See emby_mcp_server.py for details.
+
+Copyright (C) 2025 Dominic Search <code@angeltek.co.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+#==================================================
+# Functions for Short-Lived Caches of Emby Responses
+#==================================================
+
+# A cache is a plain dictionary so that it can live in the lifespan context alongside everything else.
+# Entries expire ttl_seconds after they were stored (which may be set per entry), and once max_entries
+# is reached the least recently used entry is dropped. Keys are usually tuples such as ('genres', library_id)
+# so that related entries can be invalidated together. The functions are thread safe, as they are called
+# from the tool thread pool.
+
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+import copy
+import threading
+import time
+
+#--------------------------------------------------
+# Cache Functions
+#-------------------------
+
+def new_cache(ttl_seconds: float, max_entries: int = 1000) ->dict:
+    """
+    Create an empty cache.
+
+    Args:
+        ttl_seconds (float): How long an entry stays valid after it is stored. 0 disables the cache.
+        max_entries (int, optional): The maximum number of entries to hold.
+
+    Returns:
+        dict: The cache, with keys:
+        ttl_seconds (float): as supplied
+        max_entries (int): as supplied
+        entries (OrderedDict): key -> (expiry time, value), least recently used first
+        lock (obj): serialises access to entries
+    """
+
+    return {
+        'ttl_seconds': ttl_seconds,
+        'max_entries': max_entries,
+        'entries': OrderedDict(),
+        'lock': threading.Lock()
+    }
+
+#--------------------------------------------------
+
+def cache_get(cache: Optional[dict], key: Any) ->Any:
+    """
+    Return the cached value for key, or None if there is no cache, no entry, or the entry has expired.
+    """
+
+    if cache is None:
+        return None
+    with cache['lock']:
+        entry = cache['entries'].get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del cache['entries'][key]
+            return None
+        cache['entries'].move_to_end(key)
+        return entry[1]
+
+#--------------------------------------------------
+
+def cache_set(cache: Optional[dict], key: Any, value: Any, ttl_seconds: Optional[float] = None) ->None:
+    """
+    Store value for key, dropping the least recently used entries if the cache is full.
+    ttl_seconds overrides the cache's own ttl_seconds for this entry.
+    """
+
+    if ttl_seconds is None and cache is not None:
+        ttl_seconds = cache['ttl_seconds']
+    if cache is None or ttl_seconds <= 0:
+        return
+    with cache['lock']:
+        cache['entries'][key] = (time.monotonic() + ttl_seconds, value)
+        cache['entries'].move_to_end(key)
+        while len(cache['entries']) > cache['max_entries']:
+            cache['entries'].popitem(last=False)
+
+#--------------------------------------------------
+
+def cache_invalidate(cache: Optional[dict], key: Any = None) ->None:
+    """
+    Drop the entry for key, or every entry if key is None.
+    """
+
+    if cache is None:
+        return
+    with cache['lock']:
+        if key is None:
+            cache['entries'].clear()
+        else:
+            cache['entries'].pop(key, None)
+
+#--------------------------------------------------
+
+def cache_invalidate_prefix(cache: Optional[dict], prefix: tuple) ->None:
+    """
+    Drop every entry whose key is a tuple starting with prefix, e.g. ('genres',) drops the genres of every library.
+    """
+
+    if cache is None:
+        return
+    with cache['lock']:
+        for key in [key for key in cache['entries'] if isinstance(key, tuple) and key[:len(prefix)] == prefix]:
+            del cache['entries'][key]
+
+#--------------------------------------------------
+
+def cached_call(cache: Optional[dict], key: Any, function: Callable, *args, ttl_seconds: Optional[float] = None, **kwargs) ->dict:
+    """
+    Return the cached result for key, or call function(*args, **kwargs) and cache its result if it succeeds.
+    function must return a dictionary with a 'success' key, like the functions in lib_emby_functions.py.
+    Callers get their own copy of the result, so they may modify it freely.
+
+    Args:
+        cache (dict): The cache from new_cache(), or None to always call function.
+        key: The cache key for this call.
+        function (func): The function to call on a cache miss.
+        ttl_seconds (float, optional): Overrides the cache's own ttl_seconds for this entry.
+        *args, **kwargs: The arguments to call function with.
+
+    Returns:
+        dict: The result of function.
+    """
+
+    result = cache_get(cache, key)
+    if result is None:
+        result = function(*args, **kwargs)
+        if result['success']:
+            cache_set(cache, key, copy.deepcopy(result), ttl_seconds)
+        return result
+    return copy.deepcopy(result)
+
+#--------------------------------------------------
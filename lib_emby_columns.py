@@ -0,0 +1,431 @@
+# -*- coding: utf-8 -*-
+"""
+Model Context Protocol (MCP) server that connects an Emby media server to an AI client such as Claude Desktop.
+See emby_mcp_server.py for details.
+
+Copyright (C) 2025 Dominic Search <code@angeltek.co.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+#==================================================
+# Functions for Turning Emby Items into Item Dictionaries
+#==================================================
+
+# get_items(), get_playlist_items() and get_playqueue_items() all return a list of item dictionaries built
+# from a page of Emby items. The items are read straight from Emby's JSON (see get_raw_json()) rather than
+# through the SDK, which would build a BaseItemDto object graph for every item only for it to be thrown away.
+# Rather than building each dictionary field by field, a page is first turned into one list (column) per key
+# that is wanted. Each column is then converted in one go: run times and dates repeat a lot within a library,
+# so each distinct value is formatted only once. Lyrics filtering works on the columns too, and the
+# dictionaries are only built, lazily, for the rows kept.
+
+from datetime import datetime
+from itertools import compress
+from typing import Any, Callable, Iterator, Optional
+import codecs
+import json
+import urllib3
+import emby_client
+from dateutil.parser import parse as parse_date
+from emby_client.rest import ApiException
+from lib_emby_metrics import add_emby_response_size
+try:
+    import orjson # optional, parses large responses several times faster than json
+except ImportError:
+    orjson = None
+
+STREAM_READ_BYTES = 65536 # bytes read from Emby at a time when parsing a response as it arrives
+STREAM_BATCH_ITEMS = 500 # items parsed from a streamed response before they are handed on
+
+TICKS_PER_SECOND = 10000000 # Emby run times are in ticks of 100 nanoseconds
+
+#--------------------------------------------------
+# Column Converters
+#-------------------------
+
+def format_run_time(ticks: Optional[int]) ->str:
+    """
+    Format an Emby run time in ticks as hh:mm:ss, or "" if it is not known.
+    """
+
+    if not ticks or ticks <= 0:
+        return ""
+    hours, remainder = divmod(ticks // TICKS_PER_SECOND, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+#--------------------------------------------------
+
+def format_run_times(ticks_column: list) ->list:
+    """
+    Format a column of Emby run times in ticks as hh:mm:ss, formatting each distinct number of seconds once.
+    """
+
+    formatted = {}
+    run_times = []
+    for ticks in ticks_column:
+        if not ticks or ticks <= 0:
+            run_times.append("")
+            continue
+        seconds = ticks // TICKS_PER_SECOND
+        run_time = formatted.get(seconds)
+        if run_time is None:
+            run_time = formatted[seconds] = format_run_time(ticks)
+        run_times.append(run_time)
+    return run_times
+
+#--------------------------------------------------
+
+def run_times_in_seconds(ticks_column: list) ->list:
+    """
+    Convert a column of Emby run times in ticks to seconds, or 0 where the run time is not known.
+    """
+
+    return [ticks / TICKS_PER_SECOND if ticks and ticks > 0 else 0 for ticks in ticks_column]
+
+#--------------------------------------------------
+
+def format_date(date: Optional[str]) ->str:
+    """
+    Format an Emby date (e.g. '2019-12-30T00:00:00.0000000Z') in ISO format as the SDK would, or "" if there is none.
+    """
+
+    if not date:
+        return ""
+    try:
+        return datetime.fromisoformat(date).isoformat()
+    except ValueError:
+        try:
+            return parse_date(date).isoformat() # as the SDK parses dates, for anything fromisoformat() does not accept
+        except (ValueError, OverflowError):
+            return date
+
+#--------------------------------------------------
+
+def format_dates(date_column: list) ->list:
+    """
+    Format a column of Emby dates in ISO format, or "" where there is none, formatting each distinct date once.
+    """
+
+    formatted = {None: ""}
+    dates = []
+    for date in date_column:
+        text = formatted.get(date)
+        if text is None:
+            text = formatted[date] = format_date(date)
+        dates.append(text)
+    return dates
+
+#--------------------------------------------------
+
+def extract_lyrics(media_sources_column: list) ->list:
+    """
+    Pull the lyrics out of a column of item media sources. Emby holds lyrics as the 'extradata' of a text
+    subtitle stream titled 'lyrics' in the item's first media source. Items without lyrics get "".
+    """
+
+    lyrics_column = []
+    for media_sources in media_sources_column:
+        lyrics = ""
+        if media_sources and media_sources[0].get('MediaStreams'):
+            for stream in media_sources[0]['MediaStreams']:
+                title = stream.get('Title')
+                if stream.get('IsTextSubtitleStream') and title is not None and title.lower() == 'lyrics':
+                    lyrics = stream.get('Extradata') or ""
+                    break
+        lyrics_column.append(lyrics)
+    return lyrics_column
+
+#--------------------------------------------------
+
+# How each item key is filled, as (BaseItemDto attribute, default if the attribute is empty, column converter).
+# The attribute's name in Emby's JSON is taken from the SDK (e.g. 'parent_index_number' is 'ParentIndexNumber').
+# A converter is given the whole column of JSON values and returns the whole column of key values.
+ITEM_COLUMNS = {
+    'title': ('name', "", None),
+    'artists': ('artists', [], None),
+    'album': ('album', "", None),
+    'album_id': ('album_id', "", None),
+    'album_artist': ('album_artist', "", None),
+    'disk_number': ('parent_index_number', "", None),
+    'track_number': ('index_number', "", None),
+    'creation_date': ('date_created', None, format_dates),
+    'premiere_date': ('premiere_date', None, format_dates),
+    'production_year': ('production_year', "", None),
+    'genres': ('genres', [], None),
+    'overview': ('overview', "", None),
+    'lyrics': ('media_sources', None, extract_lyrics),
+    'media_type': ('media_type', "", None),
+    'bitrate': ('bitrate', "", None),
+    'run_time': ('run_time_ticks', None, format_run_times),
+    'run_time_seconds': ('run_time_ticks', None, run_times_in_seconds), # for adding up run times, see lib_emby_aggregate.py
+    'item_id': ('id', "", None),
+    'sort_name': ('sort_name', "", None), # Emby's order for items, see lib_emby_mirror.py
+    'file_path': ('path', "", None),
+    'playlist_item_number': ('playlist_item_id', "", None),
+    'playlist_item_id': ('playlist_item_id', "", None)
+}
+ITEM_JSON_KEYS = {key: emby_client.BaseItemDto.attribute_map[attribute] for key, (attribute, default, converter) in ITEM_COLUMNS.items()}
+
+#--------------------------------------------------
+# Materialising Functions
+#-------------------------
+
+def item_columns(items: list, keys: list) ->dict:
+    """
+    Turn a page of Emby items into columns.
+
+    Args:
+        items (list of dict): The items returned by Emby, as parsed from its JSON by get_raw_json().
+        keys (list of str): The item keys to make columns for, from ITEM_COLUMNS. Other keys are ignored.
+
+    Returns:
+        dict: key -> list of the values of that key, one per item, in the order of items.
+    """
+
+    columns = {}
+    for key in keys:
+        if key not in ITEM_COLUMNS or key in columns:
+            continue
+        attribute, default, converter = ITEM_COLUMNS[key]
+        json_key = ITEM_JSON_KEYS[key]
+        values = [item.get(json_key) for item in items]
+        if converter is not None:
+            columns[key] = converter(values)
+        else:
+            columns[key] = [value if value else default for value in values]
+    return columns
+
+#--------------------------------------------------
+
+def filter_columns(columns: dict, keep: list) ->dict:
+    """
+    Return the columns with only the rows where keep (a list of bool, one per row) is True.
+    """
+
+    return {key: list(compress(values, keep)) for key, values in columns.items()}
+
+#--------------------------------------------------
+
+def keep_rows(columns: dict, key: str, test: Callable) ->list:
+    """
+    Return a list of bool, one per row, that is True where test(value) is True for the row's value of key.
+    """
+
+    return [bool(test(value)) for value in columns[key]]
+
+#--------------------------------------------------
+
+def iter_item_rows(columns: dict, keys: list) ->Iterator[dict]:
+    """
+    Yield the item dictionaries, one per row, with the given keys in order. Keys without a column are left out.
+    """
+
+    names = [key for key in keys if key in columns]
+    for row in zip(*(columns[key] for key in names)):
+        yield dict(zip(names, row))
+
+#--------------------------------------------------
+
+def materialise_items(items: list, keys: list) ->list:
+    """
+    Turn a page of Emby items into a list of item dictionaries with the given keys, in order.
+    """
+
+    return list(iter_item_rows(item_columns(items, keys), keys))
+
+#--------------------------------------------------
+# Raw JSON Functions
+#-------------------------
+
+def get_raw_json(api_function: Callable, *args, **kwargs) ->dict:
+    """
+    Call an Emby SDK API function, but parse its JSON response directly (with orjson if it is installed)
+    rather than having the SDK turn it into model objects.
+
+    Args:
+        api_function (func): The SDK API method, e.g. emby_client.ItemsServiceApi(e_api_client).get_users_by_userid_items
+        *args, **kwargs: The arguments to call it with.
+
+    Returns:
+        dict: The parsed JSON response. For item queries this has keys 'Items' (list of dict) and 'TotalRecordCount' (int).
+
+    Raises:
+        ApiException: As the SDK would, if Emby refuses the request, the response is cut short or it is not JSON.
+    """
+
+    response = api_function(*args, _preload_content=False, **kwargs)
+    try:
+        body = response.read()
+    except urllib3.exceptions.HTTPError as e:
+        response.close() # the body was not read to the end, so the connection cannot be reused
+        raise _read_failed(e)
+    response.release_conn()
+    try:
+        parsed = orjson.loads(body) if orjson is not None else json.loads(body)
+    except ValueError as e:
+        raise ApiException(status=0, reason=f"Emby's response is not valid JSON: {e}")
+    add_emby_response_size(len(body), len(parsed['Items']) if isinstance(parsed, dict) and isinstance(parsed.get('Items'), list) else None)
+    return parsed
+
+#--------------------------------------------------
+
+def iter_raw_item_batches(api_function: Callable, *args, totals: dict, batch_size: int = STREAM_BATCH_ITEMS, **kwargs) ->Iterator[list]:
+    """
+    Call an Emby SDK API function that returns a list of items, and parse its JSON response as it arrives, yielding
+    the items batch_size at a time. Only one batch, plus a read buffer, is held at once however many items Emby sends.
+
+    Args:
+        api_function (func): The SDK API method, e.g. emby_client.ItemsServiceApi(e_api_client).get_users_by_userid_items
+        *args, **kwargs: The arguments to call it with.
+        totals (dict): Filled in with the other top level keys of the response (e.g. 'TotalRecordCount') as they are parsed.
+            Emby sends these after the items, so they are only complete once every batch has been yielded.
+        batch_size (int, optional): The number of items per batch.
+
+    Yields:
+        list of dict: The next batch of items, as parsed from Emby's JSON.
+
+    Raises:
+        ApiException: As the SDK would, if Emby refuses the request, the response is cut short or it is not JSON.
+    """
+
+    response = api_function(*args, _preload_content=False, **kwargs)
+    complete = False
+    size_bytes = 0
+    item_count = 0
+
+    def read(amount: int) ->bytes:
+        nonlocal size_bytes
+        data = response.read(amount)
+        size_bytes += len(data)
+        return data
+
+    try:
+        batch = []
+        for item in _iter_json_items(read, totals):
+            batch.append(item)
+            if len(batch) >= batch_size:
+                item_count += len(batch)
+                yield batch
+                batch = []
+        item_count += len(batch)
+        if len(batch) > 0:
+            yield batch
+        complete = True
+    except ValueError as e:
+        raise ApiException(status=0, reason=f"Emby's response is not valid JSON: {e}")
+    except urllib3.exceptions.HTTPError as e:
+        raise _read_failed(e)
+    finally:
+        if complete:
+            response.release_conn()
+            add_emby_response_size(size_bytes, item_count)
+        else:
+            response.close() # abandoned part way through, so the connection cannot be reused
+
+#--------------------------------------------------
+# Internal Helpers
+#-------------------------
+
+def _read_failed(error: Exception) ->ApiException:
+    """
+    Turn a urllib3 error raised while reading a response body (a read timeout or dropped connection part way through,
+    which the transport never sees as the body is read after urlopen() returns) into an ApiException, as the transport does.
+    """
+
+    api_error = ApiException(status=0, reason=f"{type(error).__name__} while reading Emby's response: {error}")
+    api_error.not_sent = False
+    return api_error
+
+#--------------------------------------------------
+
+def _iter_json_items(read: Callable, totals: dict) ->Iterator[dict]:
+    """
+    Parse a JSON object of the form {"Items": [...], ...} from read(amount) as it arrives, yielding each item of
+    'Items' as soon as it is complete, and putting the other keys in totals. Raises ValueError if it is not valid JSON.
+    """
+
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    text = ""
+    pos = 0
+    eof = False
+
+    def read_more() ->bool:
+        # Drop what has been parsed and append the next block of text, returning False if there is no more
+        nonlocal text, pos, eof
+        if eof:
+            return False
+        data = read(STREAM_READ_BYTES)
+        eof = len(data) == 0
+        text = text[pos:] + utf8.decode(data, final=eof)
+        pos = 0
+        return True
+
+    def next_char() ->str:
+        # Skip whitespace and return the next character, or "" at the end of the response
+        nonlocal pos
+        while True:
+            while pos < len(text) and text[pos] in ' \t\r\n':
+                pos += 1
+            if pos < len(text) or not read_more():
+                return text[pos] if pos < len(text) else ""
+
+    def next_value() ->Any:
+        # Parse the value starting at pos. A value that ends exactly at the end of the text read so far
+        # may be a number cut short, so it is only accepted once more text (or the end) has been read.
+        nonlocal pos
+        next_char()
+        while True:
+            try:
+                value, end = decoder.raw_decode(text, pos)
+                if end < len(text) or eof:
+                    pos = end
+                    return value
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            if not read_more():
+                raise ValueError("the response ended part way through")
+
+    def expect(expected: str) ->None:
+        nonlocal pos
+        found = next_char()
+        if found != expected:
+            raise ValueError(f"expected '{expected}' but found '{found}'")
+        pos += 1
+
+    expect('{')
+    if next_char() == '}':
+        return
+    while True:
+        key = next_value()
+        expect(':')
+        if key == 'Items' and next_char() == '[':
+            pos += 1
+            if next_char() == ']':
+                pos += 1
+            else:
+                while True:
+                    yield next_value()
+                    if next_char() == ']':
+                        pos += 1
+                        break
+                    expect(',')
+        else:
+            totals[key] = next_value()
+        if next_char() == '}':
+            break
+        expect(',')
+
+#--------------------------------------------------
@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""
+Model Context Protocol (MCP) server that connects an Emby media server to an AI client such as Claude Desktop.
+See emby_mcp_server.py for details.
+
+Copyright (C) 2025 Dominic Search <code@angeltek.co.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+#==================================================
+# Functions for Following Emby's WebSocket Event Feed
+#==================================================
+
+# Emby pushes events to its clients over a WebSocket at /embywebsocket. Once a client sends SessionsStart, Emby sends
+# the whole session list (as GET /Sessions returns it) whenever it changes, at most every SESSIONS_INTERVAL_MS, along
+# with playback events for single sessions. It also sends LibraryChanged whenever items are added, updated or removed.
+# The listener keeps an in-memory table of the sessions, so that the player list can be answered without asking Emby,
+# and tells Emby.MCP about library changes so that it can drop cached lists and refresh its local copies early.
+# If the connection drops, the table is not used until it has been reconnected and a fresh session list has arrived.
+# The feed needs the optional websockets package (uv pip install websockets).
+
+from typing import Callable, Optional
+from urllib.parse import urlsplit, urlunsplit, urlencode
+import asyncio
+import json
+import sys
+import time
+try:
+    import websockets # optional, needed for the WebSocket feed
+except ImportError:
+    websockets = None
+from lib_emby_functions import player_sessions_from_json
+
+SESSIONS_INTERVAL_MS = 1500 # the most often that Emby sends the session list
+RECONNECT_SECONDS = (1, 60) # the first and longest wait before reconnecting after the feed drops
+LIBRARY_SETTLE_SECONDS = 10 # how long to wait after a library change before refreshing local copies, as changes come in bursts
+
+#--------------------------------------------------
+# Event State Functions
+#-------------------------
+
+def new_event_state(server_url: str, access_token: str, device_id: str) ->dict:
+    """
+    Create the state of a listener to Emby's WebSocket feed, for listen_for_emby_events().
+
+    Args:
+        server_url (str): The Emby server URL, as EMBY_SERVER_URL.
+        access_token (str): The access token of the user whose sessions to follow.
+        device_id (str): The device ID that the access token was issued to.
+
+    Returns:
+        dict: The state, with keys:
+        url (str): The WebSocket URL of the feed
+        connected (bool): True while the feed is connected
+        ready (bool): True once a session list has arrived since the feed last connected, so the session table is current
+        sessions (dict): session ID -> Emby SessionInfo, as parsed from its JSON
+        sessions_updated (float): When the session table last changed, as time.monotonic()
+        counts (dict): The number of connects, messages, session_lists, playback_events and library_changes received so far
+    """
+
+    parts = urlsplit(server_url.rstrip('/'))
+    query = urlencode({'api_key': access_token, 'deviceId': device_id})
+    return {
+        'url': urlunsplit(('wss' if parts.scheme == 'https' else 'ws', parts.netloc, f"{parts.path}/embywebsocket", query, '')),
+        'connected': False,
+        'ready': False,
+        'sessions': {},
+        'sessions_updated': 0.0,
+        'counts': {'connects': 0, 'messages': 0, 'session_lists': 0, 'playback_events': 0, 'library_changes': 0}
+    }
+
+#--------------------------------------------------
+
+def events_available() ->bool:
+    """
+    Return True if the websockets package is installed, so that the WebSocket feed can be followed.
+    """
+
+    return websockets is not None
+
+#--------------------------------------------------
+
+async def listen_for_emby_events(state: dict, on_library_changed: Callable) ->None:
+    """
+    Background task that follows Emby's WebSocket feed, keeping state up to date, until cancelled.
+    Reconnects with a growing wait if the connection fails or drops.
+
+    Args:
+        state (dict): The state from new_event_state(). Updated in place.
+        on_library_changed (func): Called as on_library_changed(data) from the event loop when Emby reports a library change,
+            with data the LibraryChanged message's Data (ItemsAdded, ItemsUpdated, ItemsRemoved and so on).
+
+    Returns:
+        None
+    """
+
+    wait = RECONNECT_SECONDS[0]
+    while True:
+        try:
+            async with websockets.connect(state['url']) as connection:
+                state['connected'] = True
+                state['counts']['connects'] += 1
+                wait = RECONNECT_SECONDS[0]
+                await connection.send(json.dumps({'MessageType': 'SessionsStart', 'Data': f"0,{SESSIONS_INTERVAL_MS}"}))
+                keepalive = None
+                try:
+                    async for message in connection:
+                        kind = handle_emby_event(state, message)
+                        if kind == 'library':
+                            on_library_changed(state['last_library_change'])
+                        elif kind == 'keepalive' and keepalive is None:
+                            keepalive = asyncio.create_task(_send_keepalives(connection, state['keepalive_seconds']))
+                            keepalive.add_done_callback(_keepalives_stopped)
+                finally:
+                    if keepalive is not None:
+                        keepalive.cancel()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e: # any failure of the feed just means answering from Emby until it is back
+            print(f"ERROR: the Emby WebSocket feed failed, player lists will be read from the media server until it reconnects: {e}", file=sys.stderr)
+        state['connected'] = False
+        state['ready'] = False
+        await asyncio.sleep(wait)
+        wait = min(wait * 2, RECONNECT_SECONDS[1])
+
+#--------------------------------------------------
+
+def handle_emby_event(state: dict, message: str) ->Optional[str]:
+    """
+    Apply one message from Emby's WebSocket feed to the state.
+
+    Args:
+        state (dict): The state from new_event_state(). Updated in place.
+        message (str): The message, as JSON with keys MessageType and Data.
+
+    Returns:
+        str: 'sessions' if the session table changed, 'library' if the library changed (see state['last_library_change']),
+        'keepalive' if Emby asked for keep-alive messages every state['keepalive_seconds'], otherwise None.
+    """
+
+    try:
+        event = json.loads(message)
+    except ValueError:
+        return None
+    if not isinstance(event, dict):
+        return None
+    state['counts']['messages'] += 1
+    data = event.get('Data')
+    match event.get('MessageType'):
+        case 'Sessions':
+            if isinstance(data, list):
+                state['sessions'] = {session['Id']: session for session in data if isinstance(session, dict) and session.get('Id')}
+                state['sessions_updated'] = time.monotonic()
+                state['counts']['session_lists'] += 1
+                state['ready'] = True
+                return 'sessions'
+        case 'PlaybackStart' | 'PlaybackStopped' | 'PlaybackProgress':
+            # These carry the one session whose playback changed
+            if isinstance(data, dict) and data.get('Id') and state['ready']:
+                state['sessions'] = dict(state['sessions'], **{data['Id']: data})
+                state['sessions_updated'] = time.monotonic()
+                state['counts']['playback_events'] += 1
+                return 'sessions'
+        case 'SessionEnded':
+            if isinstance(data, dict) and data.get('Id') in state['sessions']:
+                state['sessions'] = {session_id: session for session_id, session in state['sessions'].items() if session_id != data['Id']}
+                state['sessions_updated'] = time.monotonic()
+                return 'sessions'
+        case 'LibraryChanged':
+            state['last_library_change'] = data if isinstance(data, dict) else {}
+            state['counts']['library_changes'] += 1
+            return 'library'
+        case 'ForceKeepAlive':
+            # Data is how many seconds Emby waits for a KeepAlive before closing the feed, so send them twice as often
+            try:
+                timeout = float(data) if data else 60.0
+            except (TypeError, ValueError):
+                timeout = 60.0
+            state['keepalive_seconds'] = max(1.0, timeout / 2)
+            return 'keepalive'
+    return None
+
+#--------------------------------------------------
+
+async def _send_keepalives(connection: object, interval: float) ->None:
+    """
+    Send Emby a KeepAlive message every interval seconds, as it asks with ForceKeepAlive, so that it does not close the feed.
+    """
+
+    while True:
+        await connection.send(json.dumps({'MessageType': 'KeepAlive'}))
+        await asyncio.sleep(interval)
+
+def _keepalives_stopped(task: asyncio.Task) ->None:
+    """
+    Report why _send_keepalives() stopped, unless it was cancelled because the feed closed.
+    """
+
+    if not task.cancelled() and task.exception() is not None:
+        print(f"ERROR: cannot send keep-alive messages to the Emby WebSocket feed: {task.exception()}", file=sys.stderr)
+
+#--------------------------------------------------
+
+def get_event_player_sessions(state: Optional[dict], user_id: Optional[str] = "", media_type: Optional[str] = "") ->dict:
+    """
+    Get the media players that can be controlled from the session table kept by the WebSocket feed, as get_player_sessions()
+    would return them, without asking Emby.
+
+    Emby's session list holds every session the user can see, so when user_id is given only the sessions it could control
+    are kept, as get_sessions(controllable_by_user_id=user_id) does: those that support remote control and either have no
+    user or are used by user_id (as their user or one of their AdditionalUsers).
+
+    Args:
+        state (dict): The state from new_event_state(), or None if the feed is not being followed.
+        user_id (str, optional): The ID of the controlling user. If empty, returns every session that supports remote control.
+        media_type (str, optional): The media type to filter sessions by (e.g., 'Audio', 'Video'). If empty, returns all players.
+
+    Returns:
+        dict: A dictionary with keys:
+        sessions (list of dict): as returned by get_player_sessions()
+        success (bool): True if the session table is current, False if the caller should ask Emby instead.
+        error (str): Why the session table cannot be used, otherwise None.
+    """
+
+    if state is None or not state['ready']:
+        return {
+            'success': False,
+            'error': 'the WebSocket feed is not connected'
+        }
+    sessions = [session for session in state['sessions'].values()
+                if session.get('SupportsRemoteControl', True) and (user_id is None or user_id == "" or _session_has_user(session, user_id))]
+    return {
+        'success': True,
+        'sessions': player_sessions_from_json(sessions, media_type)
+    }
+
+#--------------------------------------------------
+
+def _session_has_user(session: dict, user_id: str) ->bool:
+    """
+    Return True if a session has no user, or user_id is its user or one of its additional users.
+    """
+
+    if not session.get('UserId') or session['UserId'] == user_id:
+        return True
+    return any(isinstance(user, dict) and user.get('UserId') == user_id for user in session.get('AdditionalUsers') or [])
+
+#--------------------------------------------------
+
+def get_event_summary(state: dict) ->dict:
+    """
+    Summarise the WebSocket feed for diagnostics.
+
+    Returns:
+        dict: A dictionary with keys:
+        connected (bool): True while the feed is connected
+        ready (bool): True if player lists are being answered from the session table
+        sessions (int): The number of sessions in the table
+        seconds_since_sessions_updated (float): How long ago the session table last changed, or None if it never has
+        counts (dict): The number of connects, messages, session_lists, playback_events and library_changes received so far
+    """
+
+    return {
+        'connected': state['connected'],
+        'ready': state['ready'],
+        'sessions': len(state['sessions']),
+        'seconds_since_sessions_updated': round(time.monotonic() - state['sessions_updated'], 1) if state['sessions_updated'] > 0 else None,
+        'counts': dict(state['counts'])
+    }
+
+#--------------------------------------------------
@@ -21,19 +21,27 @@ along with this program. If not, see <https://www.gnu.org/licenses/>.
 # Functions for Accessing Emby Media Server
 #==================================================
 
-from typing import Optional, TypedDict, NotRequired, Any, Unpack
+from typing import Optional, TypedDict, NotRequired, Any, Unpack, Callable, Iterator
 from dataclasses import dataclass
 from unidecode import unidecode
+from concurrent.futures import ThreadPoolExecutor
+import difflib
+import fnmatch
 import json
+import os
+import time
 import uuid
 import emby_client
 from emby_client.rest import ApiException
+from lib_emby_lyrics_index import normalise_lyrics_text, search_lyrics_index
+from lib_emby_cache import cache_get, cache_set, cache_invalidate_prefix
+from lib_emby_columns import item_columns, iter_item_rows, filter_columns, keep_rows, materialise_items, format_run_time, get_raw_json, iter_raw_item_batches
 
 #--------------------------------------------------
 # Login & Logout Functions 
 #-------------------------
 
-def authenticate_with_emby(server_url: str, username: str, password: str, client_name: str = "EmbyPythonClient", client_version: str ="1.0", device_name: str ="EmbyPythonDevice") ->dict:
+def authenticate_with_emby(server_url: str, username: str, password: str, client_name: str = "EmbyPythonClient", client_version: str ="1.0", device_name: str ="EmbyPythonDevice", device_id: Optional[str] = None, e_api_client: Optional[object] = None) ->dict:
     """
     Login to the Emby server using an username and password for an existing user on that server.
     
@@ -43,6 +51,10 @@ def authenticate_with_emby(server_url: str, username: str, password: str, client
         password (str): password for authentication
         client_name (str): Name of your client application (shown in Emby server logs & devices page)
         client_version (str): Version of your client application (shown in Emby server logs)
+        device_name (str): Name of the device we are running on (shown in Emby server logs & devices page)
+        device_id (str, optional): Unique ID of this device, see stable_device_id(). If None then a random ID is used,
+            which Emby records as a new device every time.
+        e_api_client (obj, optional): An API client to log in, e.g. a PooledApiClient from lib_emby_users.py. If None then a new one is created.
         
     Returns:
         dict: A dictionary with keys:
@@ -57,11 +69,15 @@ def authenticate_with_emby(server_url: str, username: str, password: str, client
     """
     
     # Configure the API client
-    config = emby_client.Configuration()
-    config.host = server_url
+    if e_api_client is None:
+        config = emby_client.Configuration()
+        config.host = server_url
+        config.api_key = {} # Configuration() is a shallow copy of a shared default, so give each client its own token
     
-    # Create API client and user service
-    e_api_client = emby_client.ApiClient(configuration=config)
+        # Create API client
+        e_api_client = emby_client.ApiClient(configuration=config)
+
+    # Create user service
     user_service = emby_client.UserServiceApi(e_api_client)
        
     # Create the authentication request body
@@ -73,7 +89,8 @@ def authenticate_with_emby(server_url: str, username: str, password: str, client
     # Create the authorization header
     # Format: Emby UserId="", Client="client_name", Device="device_name", DeviceId="unique_id", Version="1.0"
     
-    device_id = uuid.uuid4()                                # shown in Emby server logs
+    if device_id is None:
+        device_id = uuid.uuid4()                            # shown in Emby server logs
     authorization_header = f'Emby UserId="", Client="{client_name}", Device="{device_name}", DeviceId="{device_id}", Version="{client_version}"'
     
     try:
@@ -123,6 +140,7 @@ def create_authenticated_client(server_url: str, access_token: str) ->object:
 
     config = emby_client.Configuration()
     config.host = server_url
+    config.api_key = {} # Configuration() is a shallow copy of a shared default, so give each client its own token
     
     e_api_client = emby_client.ApiClient(configuration=config)
     e_api_client.configuration.api_key['access_token'] = access_token
@@ -131,6 +149,136 @@ def create_authenticated_client(server_url: str, access_token: str) ->object:
 
 #--------------------------------------------------
 
+def stable_device_id(client_name: str, device_name: str, username: str) ->str:
+    """
+    Make a device ID that is the same every time this client logs in as this user from this device, so that
+    Emby shows one device entry for it rather than adding a new one at every start-up.
+
+    Args:
+        client_name (str): Name of your client application
+        device_name (str): Name of the device we are running on
+        username (str): Username for authentication
+
+    Returns:
+        str: The device ID, in UUID format
+    """
+
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"emby-device:{device_name}/{client_name}/{username}"))
+
+#--------------------------------------------------
+
+def resume_emby_session(server_url: str, username: str, token_cache_path: str) ->dict:
+    """
+    Reuse the access token saved by save_emby_session(), instead of logging in with a password.
+    The token is checked with one cheap request; if Emby rejects it, the saved token is deleted.
+
+    Args:
+        server_url (str): The Emby server URL
+        username (str): The username the token must have been issued to
+        token_cache_path (str): The path of the file written by save_emby_session()
+
+    Returns:
+        dict: A dictionary with the same keys as authenticate_with_emby() (session_info is None).
+        success (bool): True if the saved token is still valid, False otherwise.
+        error (str):  An error message if there is no usable saved token, otherwise None.
+    """
+
+    try:
+        with open(token_cache_path, 'r', encoding='utf-8') as token_file:
+            saved = json.load(token_file)
+    except (OSError, ValueError) as e:
+        return {
+            'success': False,
+            'error': f"no saved access token: {e}"
+        }
+    if not isinstance(saved, dict):
+        # Valid JSON that save_emby_session() did not write, so the file is of no further use
+        forget_emby_session(token_cache_path)
+        return {
+            'success': False,
+            'error': 'the saved access token file does not hold a saved session'
+        }
+    if saved.get('server_url') != server_url or saved.get('username') != username or not saved.get('access_token') or not saved.get('user_id'):
+        return {
+            'success': False,
+            'error': 'the saved access token is for a different server or user'
+        }
+
+    e_api_client = create_authenticated_client(server_url, saved['access_token'])
+    user_service = emby_client.UserServiceApi(e_api_client)
+    try:
+        user_info = user_service.get_users_by_id(saved['user_id'])
+        return {
+            'success': True,
+            'access_token': saved['access_token'],
+            'user_id': saved['user_id'],
+            'user_info': user_info,
+            'session_info': None,
+            'server_url': server_url,
+            'api_client': e_api_client
+        }
+
+    except ApiException as e:
+        if e.status in (401, 403):
+            forget_emby_session(token_cache_path)
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+#--------------------------------------------------
+
+def save_emby_session(token_cache_path: str, username: str, auth_result: dict) ->dict:
+    """
+    Save the access token from authenticate_with_emby() so that resume_emby_session() can reuse it.
+    The file is only readable by the current user, as the token gives the same access as the password.
+
+    Args:
+        token_cache_path (str): The path of the file to write
+        username (str): The username the token was issued to
+        auth_result (dict): The result of a successful authenticate_with_emby()
+
+    Returns:
+        dict: A dictionary with keys:
+        success (bool): True if the request was successful, False otherwise.
+        error (str):  An error message if the request failed, otherwise None.
+    """
+
+    saved = {
+        'server_url': auth_result['server_url'],
+        'username': username,
+        'user_id': auth_result['user_id'],
+        'access_token': auth_result['access_token']
+    }
+    try:
+        file_descriptor = os.open(token_cache_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        os.chmod(token_cache_path, 0o600) # in case the file already existed with wider permissions
+        with os.fdopen(file_descriptor, 'w', encoding='utf-8') as token_file:
+            json.dump(saved, token_file)
+        return {
+            'success': True
+        }
+
+    except OSError as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+#--------------------------------------------------
+
+def forget_emby_session(token_cache_path: str) ->None:
+    """
+    Delete the access token saved by save_emby_session(), if there is one.
+    """
+
+    try:
+        os.remove(token_cache_path)
+    except FileNotFoundError:
+        pass
+
+#--------------------------------------------------
+
 def logout_from_emby(e_api_client: object) ->dict:
     """
     Logs out of the Emby server revoking the access token
@@ -298,7 +446,117 @@ def get_genre_list(e_api_client: object, library_id: str = "") ->dict:
 # Item Functions
 #-------------------------
 
+# The keys of the item dictionaries returned by get_items(), get_playlist_items() and get_playqueue_items(),
+# grouped into profiles so that callers can ask for only as much detail as they need. 'full' is every key.
+ITEM_FIELD_PROFILES = {
+    'minimal': ['title', 'artists', 'album', 'item_id'],
+    'standard': ['title', 'artists', 'album', 'album_id', 'album_artist', 'disk_number', 'track_number', 'production_year', 'genres', 'media_type', 'run_time', 'item_id'],
+    'full': None
+}
+ITEM_FIELD_KEYS = ['title', 'artists', 'album', 'album_id', 'album_artist', 'disk_number', 'track_number', 'creation_date', 'premiere_date', 'production_year',
+                   'genres', 'overview', 'lyrics', 'media_type', 'bitrate', 'run_time', 'item_id', 'file_path']
+
+# The Emby 'fields' expansions that each key needs. Keys not listed here are always returned by Emby.
+ITEM_EMBY_FIELDS = {
+    'genres': ('Genres',),
+    'lyrics': ('MediaSources', 'MediaStreams'),
+    'creation_date': ('DateCreated',),
+    'overview': ('Overview',),
+    'production_year': ('ProductionYear',),
+    'premiere_date': ('PremiereDate',),
+    'file_path': ('Path',),
+    'sort_name': ('SortName',)
+}
+
+#--------------------------------------------------
+
+def resolve_item_fields(fields: Optional[str]) ->dict:
+    """
+    Turn a field profile name, or a comma separated list of item keys, into the list of keys to return.
+
+    Args:
+        fields (str): One of the ITEM_FIELD_PROFILES ('minimal', 'standard', 'full'), or a comma separated list of
+            keys from ITEM_FIELD_KEYS. Empty or None means 'full'.
+
+    Returns:
+        dict: A dictionary with keys:
+        keys (list of str): The keys to return, or None for every key.
+        success (bool): True if the request was successful, False otherwise.
+        error (str): An error message if the request failed, otherwise None.
+    """
+
+    if fields is None or fields.strip() == "":
+        fields = 'full'
+    if fields.strip().lower() in ITEM_FIELD_PROFILES:
+        return {
+            'success': True,
+            'keys': ITEM_FIELD_PROFILES[fields.strip().lower()]
+        }
+    keys = [key.strip() for key in fields.split(',') if key.strip() != ""]
+    unknown = [key for key in keys if key not in ITEM_FIELD_KEYS]
+    if len(unknown) > 0:
+        return {
+            'success': False,
+            'error': f"Unknown item fields {', '.join(unknown)}. Use one of {', '.join(ITEM_FIELD_PROFILES)}, or a comma separated list of: {', '.join(ITEM_FIELD_KEYS)}"
+        }
+    if 'item_id' not in keys:
+        keys.append('item_id') # other tools need it to act on the item
+    return {
+        'success': True,
+        'keys': keys
+    }
+
+#--------------------------------------------------
+
+def item_emby_fields(keys: Optional[list], full_fields: str, extra_keys: tuple = ()) ->str:
+    """
+    Return the subset of full_fields (an Emby 'fields' string) that is needed to fill in keys plus extra_keys.
+    """
+
+    if keys is None:
+        return full_fields
+    needed = set()
+    for key in list(keys) + list(extra_keys):
+        needed.update(ITEM_EMBY_FIELDS.get(key, ()))
+    return ','.join(field for field in full_fields.split(',') if field in needed)
+
+#--------------------------------------------------
+
+# The keys that identify an entry on a playlist, which the playlist tools need, so are always returned with playlist items
+PLAYLIST_ENTRY_KEYS = ('playlist_item_number', 'playlist_item_index')
+
+# Every key returned for playlist and play queue items. Emby does not send file paths for either, nor lyrics for play queues.
+PLAYLIST_ITEM_KEYS = [key for key in ITEM_FIELD_KEYS if key != 'file_path'] + list(PLAYLIST_ENTRY_KEYS)
+PLAYQUEUE_ITEM_KEYS = [key for key in ITEM_FIELD_KEYS if key not in ('lyrics', 'file_path')] + ['playlist_item_id']
+
+def item_output_keys(keys: Optional[list], all_keys: list, always_keys: tuple = ()) ->list:
+    """
+    Return the keys to build for each item, in order: keys (from resolve_item_fields()) that are among all_keys
+    plus always_keys, or all_keys if keys is None.
+    """
+
+    if keys is None:
+        return list(all_keys)
+    return [key for key in keys if key in all_keys] + [key for key in always_keys if key not in keys]
+
+def project_items(items: list, keys: Optional[list], always_keys: tuple = ()) ->list:
+    """
+    Return the items with only the given keys (plus always_keys), or unchanged if keys is None.
+    """
+
+    if keys is None:
+        return items
+    wanted = list(keys) + [key for key in always_keys if key not in keys]
+    return [{key: item[key] for key in wanted if key in item} for item in items]
+
+#--------------------------------------------------
+
 # Define the data typing for kwargs of get_item_list 
+# Items are always asked for in this order, so that pages fetched at different times with StartIndex/Limit (search
+# chunks, and the lyrics index and library mirror crawls) neither repeat nor skip items. Emby's own default is by
+# SortName alone, which leaves items with the same name in no particular order; Id breaks the ties.
+ITEM_SORT_BY = 'SortName,Id'
+
 class getitems_kwargs(TypedDict, total=False):
     search_term: NotRequired[str]
     artist: NotRequired[str]
@@ -310,21 +568,26 @@ class getitems_kwargs(TypedDict, total=False):
     is_unplayed: NotRequired[bool]
     is_played: NotRequired[bool]
     is_favorite: NotRequired[bool]
+    min_date_last_saved: NotRequired[str]
+    start_index: NotRequired[int]
     limit: NotRequired[str]
+    fields: NotRequired[str]
     
-def get_items(e_api_client: object, user_id: str, library_id: str = "", **kwargs: Unpack[getitems_kwargs]) ->dict:
+def get_items(e_api_client: object, user_id: str, library_id: str = "", lyrics_index: Optional[dict] = None, **kwargs: Unpack[getitems_kwargs]) ->dict:
 
     """
     Get a list of media items from the Emby server, filtered by library and search query terms.
     Query parameters are "anded" (narrow the selection), however where multiple values are given 
     for a particular parameter (such as 'years') these are "ored" (widening the selection of 'years').
     Lyrics are searched for a single exact phrase in a way that attempts to find UTF8 by ASCII equivalents.
+    If a ready lyrics index is supplied then only the items it finds are fetched from Emby, otherwise every item is fetched and searched.
     Only retrieves items of type 'Audio' or 'Video', and only returns a subset of metadata fields.
     
     Args:
         e_api_client (obj): The authenticated API client.
         user_id (str): The ID of the user doing the search.
         library_id (str, optional): The ID of the library to filter genres by. If empty, retrieves from all libraries.
+        lyrics_index (dict, optional): The index returned by open_lyrics_index(), used to speed up lyrics searches.
         search_term (str, optional as keyword): The title and/or album to filter items by. 
         artist (str, optional as keyword): The artist to filter items by.
         genre (str, optional as keyword): The genre to filter items by.
@@ -335,11 +598,16 @@ def get_items(e_api_client: object, user_id: str, library_id: str = "", **kwargs
         is_unplayed (bool, optional as keyword): filter items that have not been played yet.
         is_played (bool, optional as keyword): filter items that have already been played.
         is_favorite (bool, optional as keyword): filter items the user has marked as favourite.
+        min_date_last_saved (str, optional as keyword): filter items saved by Emby since this date in ISO format.
+        start_index (int, optional as keyword): Skip this many matching items (zero-based), for paging through large results.
         limit (str, optional as keyword): Return at most this many (as integer) items
+        fields (str, optional as keyword): Which keys to return for each item, as accepted by resolve_item_fields(). Defaults to 'full'.
+            Only the Emby field expansions needed for these keys are requested.
         
     Returns:
         dict: A dictionary with keys:
-        items (list of dict): A list of items that match the criteria if successful.
+        total_count (int): the total number of items matching the criteria in Emby, regardless of start_index and limit.
+        items (list of dict): A list of items that match the criteria if successful, with the keys selected by 'fields':
             title (str): the title of the item.
             artists (list): the artists of the item, as a list of strings.
             album (str): the album of the item.
@@ -362,6 +630,56 @@ def get_items(e_api_client: object, user_id: str, library_id: str = "", **kwargs
         error (str): An error message if the request failed, otherwise None.
     """
 
+    field_keys = resolve_item_fields(kwargs.get('fields') or "full")
+    if not field_keys['success']:
+        return field_keys
+    output_keys = item_output_keys(field_keys['keys'], ITEM_FIELD_KEYS)
+
+    # Build the items a batch and a column at a time, with only the keys asked for
+    query = {key: value for key, value in kwargs.items() if key != 'fields'}
+    column_batches = get_item_columns(e_api_client, user_id, library_id, output_keys, lyrics_index=lyrics_index, **query)
+    if not column_batches['success']:
+        return column_batches
+    try:
+        filtered_items = []
+        for columns in column_batches['batches']:
+            filtered_items.extend(iter_item_rows(columns, output_keys))
+        return {
+            'success': True,
+            'total_count': column_batches['totals'].get('TotalRecordCount') or 0,
+            'items': filtered_items
+        }
+
+    except ApiException as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+#--------------------------------------------------
+
+def get_item_columns(e_api_client: object, user_id: str, library_id: str = "", column_keys: Optional[list] = None, lyrics_index: Optional[dict] = None, **kwargs: Unpack[getitems_kwargs]) ->dict:
+    """
+    Get the media items that match a query as it is read from the Emby server, a batch of columns at a time (see
+    lib_emby_columns.py), without building an item dictionary for each. Matches items exactly as get_items() does.
+
+    Args:
+        e_api_client (obj): The authenticated API client.
+        user_id (str): The ID of the user doing the search.
+        library_id (str, optional): The ID of the library to search. If empty, searches all libraries.
+        column_keys (list of str): The keys from ITEM_COLUMNS to make columns for. Only the Emby field expansions they need are requested.
+        lyrics_index (dict, optional): The index returned by open_lyrics_index(), used to speed up lyrics searches.
+        **kwargs: search query terms as accepted by get_items(), except fields.
+
+    Returns:
+        dict: A dictionary with keys:
+        batches (iterator of dict): Yields one dictionary per batch of matching items, of key -> list of values, one per item.
+            Emby is asked for each batch as it is read, so reading it raises ApiException if a request fails.
+        totals (dict): Holds 'TotalRecordCount', the total number of items matching the criteria in Emby, once every batch has been read.
+        success (bool): True if the request was successful, False otherwise.
+        error (str): An error message if the request failed, otherwise None.
+    """
+
     # Translate our notion of query strings into Emby's notion
     kwcooked = {}
     filters = ""
@@ -401,105 +719,94 @@ def get_items(e_api_client: object, user_id: str, library_id: str = "", **kwargs
                     kwcooked[key] = kwargs[key]
     if filters != "":
         kwcooked["filters"] = filters
-    
-    # Run query and process results
+    column_keys = list(column_keys or [])
+
+    # Only ask Emby for the detail that we need (including for lyric matching)
     api_instance = emby_client.ItemsServiceApi(e_api_client)
-    extrafields='Genres,MediaSources,DateCreated,Overview,ProductionYear,PremiereDate,Path'
+    extrafields = item_emby_fields(column_keys, 'Genres,MediaSources,DateCreated,Overview,ProductionYear,PremiereDate,Path,SortName', ('lyrics', 'overview') if lyrics_search != "" else ())
     media_types = 'Audio,Video' # Only return these media types
 
-    try:
-        api_response = api_instance.get_users_by_userid_items(user_id, parent_id=library_id, media_types=media_types, recursive=True, fields=extrafields, **kwcooked)
-        total_count = api_response.total_record_count
-        if total_count > 0:
-            items_list = api_response.items
-            # Return only a subset of fields
-            filtered_items = [
-                {
-                    'title': item.name if item.name else "",
-                    'artists': [artist for artist in item.artists] if item.artists else [],
-                    'album': item.album if item.album else "",
-                    'album_id': item.album_id if item.album_id else "",
-                    'album_artist': item.album_artist if item.album_artist else "",
-                    'disk_number': item.parent_index_number if item.parent_index_number else "",
-                    'track_number': item.index_number if item.index_number else "",
-                    'creation_date': item.date_created.isoformat() if item.date_created else "",
-                    'premiere_date': item.premiere_date.isoformat() if item.premiere_date else "",
-                    'production_year': item.production_year if item.production_year else "",
-                    'genres': item.genres if item.genres else [],
-                    'overview': item.overview if item.overview else "",
-                    'lyrics': "",  # Placeholder for lyrics, will be filled later
-                    # Extract 'extradata' from 'media sources' that are text subtitles with title 'lyrics'
-                    'media_sources': [
-                        {
-                            'media_streams': [
-                                {'extradata': stream.extradata if hasattr(stream, 'extradata') else None}
-                                for stream in media_source.media_streams
-                                if stream.is_text_subtitle_stream is not None and stream.is_text_subtitle_stream == True and stream.title is not None and stream.title.lower() == 'lyrics'
-                            ] if media_source.media_streams else []
-                        }
-                        for media_source in item.media_sources
-                    ] if item.media_sources else [],
-                    'media_type': item.media_type if item.media_type else "",
-                    'bitrate': item.bitrate if item.bitrate else "",
-                    'run_time_ticks': item.run_time_ticks if item.run_time_ticks else 0,
-                    'run_time': "",  # Placeholder for run time, will be filled later
-                    'item_id': item.id if item.id else "",
-                    'file_path': item.path if item.path else ""  # File path of the item
-                }
-                for item in items_list
+    totals = {}
+    query = dict(kwcooked, parent_id=library_id, media_types=media_types, recursive=True, fields=extrafields, sort_by=ITEM_SORT_BY, sort_order='Ascending')
+    if lyrics_search != "" and lyrics_index is not None and lyrics_index['ready']:
+        # Only fetch the items that the index says contain the lyrics
+        index_result = search_lyrics_index(lyrics_index, lyrics_search)
+        if not index_result['success']:
+            return index_result
+        item_batches = _get_item_batches(api_instance.get_users_by_userid_items, user_id, totals, candidate_ids=index_result['item_ids'], **query)
+    else:
+        item_batches = _get_item_batches(api_instance.get_users_by_userid_items, user_id, totals, **query)
+
+    return {
+        'success': True,
+        'batches': _filter_item_columns(item_batches, column_keys, lyrics_search),
+        'totals': totals
+    }
+
+#--------------------------------------------------
+
+def _filter_item_columns(item_batches: Iterator[list], column_keys: list, lyrics_search: str) ->Iterator[dict]:
+    """
+    Turn each batch of Emby items into columns, keeping only the rows whose lyrics or overview contain lyrics_search (if not empty).
+    """
+
+    norm_lyrics_search = normalise_lyrics_text(lyrics_search) if lyrics_search != "" else ""
+    for items_list in item_batches:
+        columns = item_columns(items_list, column_keys + (['lyrics', 'overview'] if lyrics_search != "" else []))
+
+        # Perform lyric searching by matching against the lyric or overview fields of each item returned by Emby, after convertion to lower case ASCII
+        if lyrics_search != "":
+            keep = [
+                norm_lyrics_search in normalise_lyrics_text(lyrics) or norm_lyrics_search in normalise_lyrics_text(overview)
+                for lyrics, overview in zip(columns['lyrics'], columns['overview'])
             ]
-            
-            # Extract the lyrics string from the 'media sources' object, if available
-            for item in filtered_items:
-                if item['media_sources']:
-                    media_streams = item['media_sources'][0].get('media_streams', [])
-                    if media_streams and 'extradata' in media_streams[0]:
-                        # update the item 'lyrics' string and remove the now redundant 'media_sources' key
-                        item['lyrics'] = media_streams[0]['extradata'] 
-                        item.pop('media_sources', None)
-                if item['run_time_ticks'] > 0:
-                    total_seconds = int(item['run_time_ticks'] / 10000000) # convert from ticks
-                    tthours = total_seconds // 3600
-                    ttmins = (total_seconds % 3600) // 60
-                    ttsecs = total_seconds % 60
-                    item['run_time'] = f"{str(tthours).zfill(2)}:{str(ttmins).zfill(2)}:{str(ttsecs).zfill(2)}"
-                item.pop('run_time_ticks', None)
-  
-            # Perform lyric searching by matching against the lyric or overview fields of each item returned by Emby, after convertion to lower case ASCII
-            if lyrics_search != "":
-                filtered_items = [
-                    item for item in filtered_items
-                    if (item['lyrics'] is not None and unidecode(lyrics_search.casefold()) in unidecode(item['lyrics'].casefold())) or (item['overview'] is not None and unidecode(lyrics_search.casefold()) in unidecode(item['overview'].casefold()))
-                ]
+            columns = filter_columns(columns, keep)
+        yield columns
 
-        else:
-            filtered_items = []
-        return {
-            'success': True,
-            'total_count': total_count,
-            'items': filtered_items
-        }
+#--------------------------------------------------
 
-    except ApiException as e:
-        return {
-            'success': False,
-            'error': str(e)
-        }
+def _get_item_batches(api_function: Callable, user_id: str, totals: dict, candidate_ids: Optional[list] = None, **query) ->Iterator[list]:
+    """
+    Yield the items that match query from Emby a batch at a time, as parsed from its JSON, setting totals['TotalRecordCount']
+    once every batch has been yielded. If candidate_ids is given then only those items are fetched, 200 at a time to keep
+    URLs a sensible length. A query without a limit can return the whole library, so its response is parsed as it arrives
+    rather than read in full first, so that only a batch of raw items is held at once.
+    """
+
+    if candidate_ids is not None:
+        totals['TotalRecordCount'] = 0
+        for start in range(0, len(candidate_ids), 200):
+            api_response = get_raw_json(api_function, user_id, **dict(query, ids=",".join(candidate_ids[start:start + 200])))
+            totals['TotalRecordCount'] += api_response.get('TotalRecordCount') or 0
+            yield api_response.get('Items') or []
+    elif query.get('limit') in (None, ""):
+        yield from iter_raw_item_batches(api_function, user_id, totals=totals, **query)
+    else:
+        api_response = get_raw_json(api_function, user_id, **query)
+        totals['TotalRecordCount'] = api_response.get('TotalRecordCount') or 0
+        yield api_response.get('Items') or []
 
 #--------------------------------------------------
 # Playlist Functions
 #-------------------------
 
-def get_playlists(e_api_client: object, user_id: str, available_libraries:list, playlist_id: Optional[str] = "") ->dict:
+def get_playlists(e_api_client: object, user_id: str, available_libraries:list, playlist_id: Optional[str] = "", min_date_last_saved: Optional[str] = None,
+                  include_access: bool = True, max_workers: int = 8, access_cache: Optional[dict] = None) ->dict:
     """
     Get a list of playlists from the Emby server, assuming all playlists are in the 'Playlists' library.
     Includes only 'CollectionFolder' items of media_type 'Playlist'.
+    Emby needs one request per playlist to find who has access to it, so these are made concurrently 
+    and may be answered from access_cache, or skipped altogether if include_access is False.
 
     Args:
         e_api_client (obj): The autentitcated API client
         user_id (str): The ID of the user doing the search.
         available_libraries (list of dict): list returned by get_library_list() that contains 'playlists' libraries.
         playlist_id (str, optional): if supplied, only return information about this playlist
+        min_date_last_saved (str, optional): if supplied, only return playlists saved by Emby since this date in ISO format
+        include_access (bool, optional): if False, do not look up user_access and can_share (returned as empty and False)
+        max_workers (int, optional): the maximum number of user access lookups to make at once
+        access_cache (dict, optional): a cache from new_cache() of user access lists by playlist ID
     
     Returns:
         dict: A dictionary with keys:
@@ -534,6 +841,8 @@ def get_playlists(e_api_client: object, user_id: str, available_libraries:list,
             kwargs ={}
             if playlist_id != '':
                 kwargs['ids'] = playlist_id
+            if min_date_last_saved is not None:
+                kwargs['min_date_last_saved'] = min_date_last_saved
 
             try:
                 api_response = api_instance.get_users_by_userid_items(user_id, parent_id=library_id, recursive=True, fields=extrafields, **kwargs)
@@ -561,46 +870,24 @@ def get_playlists(e_api_client: object, user_id: str, available_libraries:list,
                     ]
 
                     playlist_items = []
-                    api_instance = emby_client.UserServiceApi(e_api_client)
                     for item in filtered_items:    
                         # convert run_time_ticks to hh:mm:ss
-                        if item['run_time_ticks'] > 0:
-                            total_seconds = int(item['run_time_ticks'] / 10000000) # convert from ticks
-                            tthours = total_seconds // 3600
-                            ttmins = (total_seconds % 3600) // 60
-                            ttsecs = total_seconds % 60
-                            item['run_time'] = f"{str(tthours).zfill(2)}:{str(ttmins).zfill(2)}:{str(ttsecs).zfill(2)}"
-                        item.pop('run_time_ticks', None)
+                        item['run_time'] = format_run_time(item.pop('run_time_ticks', None))
                         playlist_items.append(item)
-                        
-                        # Determine user access level for this playlist.
-                        filtered_access = []
-                        can_share = False
-                        try:
-                            api_response = api_instance.get_users_itemaccess(item_id=item['playlist_id'])
-                            total_count = api_response.total_record_count
-                            if total_count > 0:
-                                access_user_list = api_response.items
-                                filtered_access = [
-                                    {
-                                        'user_name': a_user.name if a_user.name else "",
-                                        'user_id': a_user.id if a_user.id else "",
-                                        'access_level': a_user.user_item_share_level if a_user.user_item_share_level else ""
-                                    }
-                                    for a_user in access_user_list
-                                ]
-                                # Determine what we can do with this playlist
-                                can_share = False
-                                for a_user in filtered_access:
-                                    if a_user['user_id'] == user_id:
-                                        if a_user['access_level'] in ['Manage', 'ManageDelete']:
-                                            can_share = True
-                        except ApiException as e:
-                            # ignore errors while getting user access levels - often they are because we do not own the playlist.
-                            do_nothing=True
-
-                        item['user_access'] = filtered_access
-                        item['can_share'] = can_share
+
+                    if include_access and len(playlist_items) > 0:
+                        # Determine user access levels for all playlists at once, rather than one after another
+                        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(playlist_items)))) as pool:
+                            access_lists = list(pool.map(lambda item: get_playlist_access(e_api_client, item['playlist_id'], access_cache), playlist_items))
+                        for item, filtered_access in zip(playlist_items, access_lists):
+                            # Determine what we can do with this playlist
+                            can_share = False
+                            for a_user in filtered_access:
+                                if a_user['user_id'] == user_id:
+                                    if a_user['access_level'] in ['Manage', 'ManageDelete']:
+                                        can_share = True
+                            item['user_access'] = filtered_access
+                            item['can_share'] = can_share
              
                 else:
                     playlist_items = []
@@ -626,7 +913,50 @@ def get_playlists(e_api_client: object, user_id: str, available_libraries:list,
 
 #--------------------------------------------------
 
-def get_playlist_items(e_api_client: object, user_id: str, playlist_id: str) ->dict:
+def get_playlist_access(e_api_client: object, playlist_id: str, access_cache: Optional[dict] = None) ->list:
+    """
+    Get the per-user access levels of a playlist, from access_cache if it holds an unexpired copy.
+    Errors are treated as no access information, as they are usually because we do not own the playlist.
+
+    Args:
+        e_api_client (obj): The authenticated API client.
+        playlist_id (str): The ID of the playlist.
+        access_cache (dict, optional): a cache from new_cache() of user access lists by playlist ID
+
+    Returns:
+        list of dict: Per-user sharing, or an empty list if not available:
+            user_name (str): name of user
+            user_id (str): ID of user
+            access_level (str): access level this user has for this item 
+    """
+
+    filtered_access = cache_get(access_cache, playlist_id)
+    if filtered_access is not None:
+        return [dict(a_user) for a_user in filtered_access] # callers may modify what they are given
+
+    filtered_access = []
+    api_instance = emby_client.UserServiceApi(e_api_client)
+    try:
+        api_response = api_instance.get_users_itemaccess(item_id=playlist_id)
+        if api_response.total_record_count > 0:
+            filtered_access = [
+                {
+                    'user_name': a_user.name if a_user.name else "",
+                    'user_id': a_user.id if a_user.id else "",
+                    'access_level': a_user.user_item_share_level if a_user.user_item_share_level else ""
+                }
+                for a_user in api_response.items
+            ]
+    except ApiException as e:
+        # ignore errors while getting user access levels - often they are because we do not own the playlist.
+        do_nothing=True
+
+    cache_set(access_cache, playlist_id, [dict(a_user) for a_user in filtered_access])
+    return filtered_access
+
+#--------------------------------------------------
+
+def get_playlist_items(e_api_client: object, user_id: str, playlist_id: str, fields: Optional[str] = "full") ->dict:
 
     """
     Get a list of media items on a playlist from the Emby server.
@@ -636,10 +966,12 @@ def get_playlist_items(e_api_client: object, user_id: str, playlist_id: str) ->d
         e_api_client (obj): The authenticated API client.
         user_id (str): The ID of the user doing the getting.
         playlist_id (str): The ID of the playlist.
+        fields (str, optional): Which keys to return for each item, as accepted by resolve_item_fields(). Defaults to 'full'.
+            playlist_item_number and playlist_item_index are always returned.
         
     Returns:
         dict: A dictionary with keys:
-        items (list): An ordered list of items on the playlist if successful. Each item is a dictionary of metadata fields:
+        items (list): An ordered list of items on the playlist if successful. Each item is a dictionary of the metadata fields selected by 'fields':
             title (str): the title of the item.
             artists (list): the artists of the item, as a list of strings.
             album (str): the album of the item.
@@ -654,8 +986,8 @@ def get_playlist_items(e_api_client: object, user_id: str, playlist_id: str) ->d
             overview (str): the short description of the item.
             lyrics (str): the lyrics for, or long description of, the item
             media_type (str): the item type, either 'Audio' or 'Video'.
-            run_time_ticks (int): the run time of the item in ticks (100 nanoseconds).
             bitrate (int): the bitrate of the item in bits per second.
+            run_time (str): the run time of the item as hh:mm:ss.
             item_id (str): the unique identifier of the item within this Emby server.
             playlist_item_number (str): the unique identifier of the item within this playlist.
             playlist_item_index (str): the position of the item within this playlist.
@@ -663,70 +995,23 @@ def get_playlist_items(e_api_client: object, user_id: str, playlist_id: str) ->d
         error (str): An error message if the request failed, otherwise None.
     """
 
+    field_keys = resolve_item_fields(fields)
+    if not field_keys['success']:
+        return field_keys
+    field_keys = field_keys['keys']
+
     # Run query and process results
     api_instance = emby_client.PlaylistServiceApi(e_api_client)
     try:
-        api_response = api_instance.get_playlists_by_id_items(playlist_id, user_id=user_id, fields='Genres,MediaStreams,DateCreated,Overview')
-        total_count = api_response.total_record_count
+        api_response = get_raw_json(api_instance.get_playlists_by_id_items, playlist_id, user_id=user_id, fields=item_emby_fields(field_keys, 'Genres,MediaStreams,DateCreated,Overview'))
+        total_count = api_response.get('TotalRecordCount') or 0
         if total_count > 0:
-            index_counter = 0
-            items_list = api_response.items
-            # Filter out non-audio and non-video items, and return only a subset of fields
-            filtered_items = [
-                {
-                    'title': item.name if item.name else "",
-                    'artists': [artist for artist in item.artists] if item.artists else [],
-                    'album': item.album if item.album else "",
-                    'album_id': item.album_id if item.album_id else "",
-                    'album_artist': item.album_artist if item.album_artist else "",
-                    'disk_number': item.parent_index_number if item.parent_index_number else "",
-                    'track_number': item.index_number if item.index_number else "",
-                    'creation_date': item.date_created.isoformat() if item.date_created else "",
-                    'premiere_date': item.premiere_date.isoformat() if item.premiere_date else "",
-                    'production_year': item.production_year if item.production_year else "",
-                    'genres': item.genres if item.genres else [],
-                    'overview': item.overview if item.overview else "",
-                    'lyrics': "",  # Placeholder for lyrics, will be filled later
-                    # Extract 'extradata' from 'media sources' that are text subtitles with title 'lyrics'
-                    'media_sources': [
-                        {
-                            'media_streams': [
-                                {'extradata': stream.extradata if hasattr(stream, 'extradata') else None}
-                                for stream in media_source.media_streams
-                                if stream.is_text_subtitle_stream is not None and stream.is_text_subtitle_stream == True and stream.title is not None and stream.title.lower() == 'lyrics'
-                            ] if media_source.media_streams else []
-                        }
-                        for media_source in item.media_sources
-                    ] if item.media_sources else [],
-                    'media_type': item.media_type if item.media_type else "",
-                    'bitrate': item.bitrate if item.bitrate else "",
-                    'run_time_ticks': item.run_time_ticks if item.run_time_ticks else 0,
-                    'item_id': item.id if item.id else "",
-                    'playlist_item_number': item.playlist_item_id if item.playlist_item_id else "",
-                    'playlist_item_index': "" # Placeholder for playlist item index, will be filled later
-                }
-                for item in items_list
-                if item.media_type.lower() == 'audio' or item.media_type.lower() == 'video'
-            ]
-            
-            # Extract the lyrics string from the 'media sources' object, if available
-            index_counter = 0
-            for item in filtered_items:
-                if item['media_sources']:
-                    media_streams = item['media_sources'][0].get('media_streams', [])
-                    if media_streams and 'extradata' in media_streams[0]:
-                        # update the item 'lyrics' string and remove the now redundant 'media_sources' key
-                        item['lyrics'] = media_streams[0]['extradata'] 
-                        item.pop('media_sources', None)
-                if item['run_time_ticks'] > 0:
-                    total_seconds = int(item['run_time_ticks'] / 10000000) # convert from ticks
-                    tthours = total_seconds // 3600
-                    ttmins = (total_seconds % 3600) // 60
-                    ttsecs = total_seconds % 60
-                    item['run_time'] = f"{str(tthours).zfill(2)}:{str(ttmins).zfill(2)}:{str(ttsecs).zfill(2)}"
-                item.pop('run_time_ticks', None)
-                item['playlist_item_index'] = str(index_counter)
-                index_counter += 1
+            # Filter out non-audio and non-video items, and return only the keys asked for, built a column at a time
+            output_keys = item_output_keys(field_keys, PLAYLIST_ITEM_KEYS, PLAYLIST_ENTRY_KEYS)
+            columns = item_columns(api_response.get('Items') or [], output_keys + ['media_type'])
+            columns = filter_columns(columns, keep_rows(columns, 'media_type', lambda media_type: media_type.lower() in ('audio', 'video')))
+            columns['playlist_item_index'] = [str(index) for index in range(len(columns['media_type']))]
+            filtered_items = list(iter_item_rows(columns, output_keys))
 
         else:
             filtered_items = []
@@ -744,7 +1029,82 @@ def get_playlist_items(e_api_client: object, user_id: str, playlist_id: str) ->d
 
 #--------------------------------------------------
 
-def new_playlist(e_api_client: object, user_id:str, available_libraries:list, playlist_name: str, **kwargs) ->dict:
+# Playlist names must be unique (ignoring case) among the playlists a user can see. Rather than list every playlist with its
+# user access to check a new name, each user's names are kept in the name cache (usually the list cache) as a dictionary
+# of lower case name -> playlist ID, read from Emby with no field expansions and updated by every create and rename.
+
+def get_playlist_names(e_api_client: object, user_id: str, available_libraries: list, name_cache: Optional[dict] = None) ->dict:
+    """
+    Get the names of the playlists a user can see, from the name cache if it holds them, otherwise from the Emby server.
+
+    Args:
+        e_api_client (obj): The authenticated API client.
+        user_id (str): The ID of the user.
+        available_libraries (list of dict): list returned by get_library_list() that contains 'playlists' libraries.
+        name_cache (dict, optional): The cache from new_cache() in which to keep the names, under ('playlist_names', user_id).
+
+    Returns:
+        dict: A dictionary with keys:
+        names (dict): lower case playlist name -> playlist ID. Shared with the cache, so do not modify it.
+        success (bool): True if the request was successful, False otherwise.
+        error (str): An error message if the request failed, otherwise None.
+    """
+
+    names = cache_get(name_cache, ('playlist_names', user_id))
+    if names is not None:
+        return {
+            'success': True,
+            'names': names
+        }
+
+    library_id = ""
+    for library in available_libraries or []:
+        if library['type'] == 'playlists':
+            library_id = library['id']
+            break
+    if library_id == "":
+        return {
+            'success': False,
+            'error': 'No playlist libraries are available.'
+        }
+
+    api_instance = emby_client.ItemsServiceApi(e_api_client)
+    try:
+        api_response = get_raw_json(api_instance.get_users_by_userid_items, user_id, parent_id=library_id, recursive=True)
+        names = {}
+        for item in api_response.get('Items') or []:
+            if (item.get('Type') or "").lower() == 'playlist' and item.get('Name'):
+                names.setdefault(item['Name'].lower(), item.get('Id') or "")
+        cache_set(name_cache, ('playlist_names', user_id), names)
+        return {
+            'success': True,
+            'names': names
+        }
+
+    except ApiException as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+#--------------------------------------------------
+
+def _note_playlist_name(name_cache: Optional[dict], user_id: str, playlist_id: str, name: str) ->None:
+    """
+    Record in the user's cached playlist names that playlist_id is now called name, after it has been created or renamed.
+    Other users' names are dropped, as they may or may not be able to see the playlist.
+    """
+
+    names = cache_get(name_cache, ('playlist_names', user_id))
+    cache_invalidate_prefix(name_cache, ('playlist_names',))
+    if names is not None:
+        names = {old_name: an_id for old_name, an_id in names.items() if an_id != playlist_id}
+        names[name.lower()] = playlist_id
+        cache_set(name_cache, ('playlist_names', user_id), names)
+
+#--------------------------------------------------
+
+def new_playlist(e_api_client: object, user_id:str, available_libraries:list, playlist_name: str, name_cache: Optional[dict] = None, **kwargs) ->dict:
 
     """
     Creates a new playlist on the Emby server.
@@ -754,6 +1114,7 @@ def new_playlist(e_api_client: object, user_id:str, available_libraries:list, pl
         user_id (str): The ID of the user doing the search.
         available_libraries (list of dict): list returned by get_library_list() that contains 'playlists' libraries.
         playlist_name (str): The name of the new playlist.
+        name_cache (dict, optional): The cache holding the user's playlist names, see get_playlist_names().
         media_type (str, optional as keyword): The type of playlist, either 'Audio' or 'Video'. Defaults to 'Audio'.
         overview (str, optional as keyword): A short description of the playlist. Defaults to an empty description.
 
@@ -770,15 +1131,12 @@ def new_playlist(e_api_client: object, user_id:str, available_libraries:list, pl
             'success': False,
             'error': 'Playlist name cannot be empty.'
         }  
-    playlist_list =  get_playlists(e_api_client, user_id, available_libraries)
-    if playlist_list['success']:
-        playlists = playlist_list['playlists']
-        for playlist in playlists:
-            if playlist['name'].lower() == playlist_name.lower():
-                return {
-                    'success': False,
-                    'error': f'Playlist with name "{playlist_name}" already exists.'
-                }
+    playlist_names = get_playlist_names(e_api_client, user_id, available_libraries, name_cache)
+    if playlist_names['success'] and playlist_name.lower() in playlist_names['names']:
+        return {
+            'success': False,
+            'error': f'Playlist with name "{playlist_name}" already exists.'
+        }
 
     # Process kwargs
     media_type = "Audio"
@@ -803,6 +1161,7 @@ def new_playlist(e_api_client: object, user_id:str, available_libraries:list, pl
         api_response = api_instance.post_playlists(name=playlist_name, media_type=media_type)
         if api_response is not None and api_response.id is not None:
             playlist_id = api_response.id
+            _note_playlist_name(name_cache, user_id, playlist_id, playlist_name)
 
             # To add an overview, we need to update the playlist metadata, which means first getting its BaseItemDto object
             if overview != "":
@@ -842,7 +1201,7 @@ def new_playlist(e_api_client: object, user_id:str, available_libraries:list, pl
 
 #--------------------------------------------------
 
-def set_playlist_meta(e_api_client: object, user_id:str, available_libraries:list, playlist_id: str, **kwargs) ->dict:
+def set_playlist_meta(e_api_client: object, user_id:str, available_libraries:list, playlist_id: str, name_cache: Optional[dict] = None, **kwargs) ->dict:
 
     """
     Modifies metadata for an existing playlist on the Emby server.
@@ -851,6 +1210,7 @@ def set_playlist_meta(e_api_client: object, user_id:str, available_libraries:lis
         e_api_client (obj): The authenticated API client.
         user_id (str): The ID of the user doing the search.
         playlist_id (str): The ID of the playlist to modify.
+        name_cache (dict, optional): The cache holding the user's playlist names, see get_playlist_names().
         name (str, optional as keyword): The new name of the playlist. Defaults to not changing the name.
         overview (str, optional as keyword): A short description of the playlist. Defaults to not changing the overview.
 
@@ -884,19 +1244,13 @@ def set_playlist_meta(e_api_client: object, user_id:str, available_libraries:lis
 
     # check that the playlist name does not already exist
     if name != "":
-        playlist_list =  get_playlists(e_api_client, user_id, available_libraries)
-        if playlist_list['success']:
-            playlists = playlist_list['playlists']
-            for playlist in playlists:
-                if playlist['name'].lower() == name.lower():
-                    if playlist['playlist_id'] == playlist_id:
-                        # it's OK, we are modifying the playlist with this name so skip further checking.
-                        break 
-                    else:
-                        return {
-                            'success': False,
-                            'error': f'Playlist with name "{name}" already exists.'
-                        }
+        playlist_names = get_playlist_names(e_api_client, user_id, available_libraries, name_cache)
+        # it's OK if we are modifying the playlist with this name
+        if playlist_names['success'] and playlist_names['names'].get(name.lower(), playlist_id) != playlist_id:
+            return {
+                'success': False,
+                'error': f'Playlist with name "{name}" already exists.'
+            }
 
     # Run query and process results
     api_instance = emby_client.PlaylistServiceApi(e_api_client)
@@ -918,6 +1272,8 @@ def set_playlist_meta(e_api_client: object, user_id:str, available_libraries:lis
         try:
         # Update the playlist metadata with the new overview
             api_response = emby_client.ItemUpdateServiceApi(e_api_client).post_items_by_itemid(body=playlist_object, item_id=playlist_id)
+            if name != "":
+                _note_playlist_name(name_cache, user_id, playlist_id, name)
             return {
                 'success': True
             }
@@ -934,43 +1290,89 @@ def set_playlist_meta(e_api_client: object, user_id:str, available_libraries:lis
 
 #--------------------------------------------------
 
-def add_playlist_items(e_api_client: object, user_id: str, playlist_id: str, item_ids: str) ->dict:
+# Item and entry IDs are sent to Emby in the query string, so long lists are split into batches that keep the URL a sensible
+# length. The batches are sent in order, one after another over the same kept-alive connection, as Emby appends each to the end.
+PLAYLIST_BATCH_ITEMS = 200
+PLAYLIST_BATCH_CHARS = 4000
+
+def playlist_id_batches(ids: list) ->list:
+    """
+    Split a list of item or playlist entry IDs into batches of at most PLAYLIST_BATCH_ITEMS IDs and PLAYLIST_BATCH_CHARS characters, in order.
+    """
+
+    batches = []
+    batch_chars = 0
+    for an_id in ids:
+        if len(batches) == 0 or len(batches[-1]) >= PLAYLIST_BATCH_ITEMS or (len(batches[-1]) > 0 and batch_chars + len(an_id) + 1 > PLAYLIST_BATCH_CHARS):
+            batches.append([])
+            batch_chars = 0
+        batches[-1].append(an_id)
+        batch_chars += len(an_id) + 1
+    return batches
+
+
+def add_playlist_items(e_api_client: object, user_id: str, playlist_id: str, item_ids: str, progress: Optional[Callable] = None) ->dict:
 
     """
-    Adds one or more items to the end of an existing playlist on the Emby server.
+    Adds one or more items to the end of an existing playlist on the Emby server, in the order given.
+    Any number of items can be added: they are sent in batches of at most PLAYLIST_BATCH_ITEMS items, and if a batch
+    fails the remaining batches are still sent, so that as many items as possible are added.
     
     Args:
         e_api_client (obj): The authenticated API client.
         user_id (str): The ID of the user doing the search.
         playlist_id (str): The ID of the existing playlist.
         item_ids (str): A comma-separated list of item IDs to add to the playlist.
+        progress (func, optional): Called as progress(items_sent, total_items) after each batch is sent.
 
     Returns:
         dict: A dictionary with keys:
-        item_count (str): the number of items added to the playlist.
-        success (bool): True if the request was successful, False otherwise.
-        error (str): An error message if the request failed, otherwise None.
+        item_count (int): the number of items added to the playlist.
+        batch_count (int): the number of batches the items were sent in.
+        failed_batches (list of dict): the batches that were not added, with keys:
+            batch_number (int): the batch number (one-based)
+            item_ids (str): the comma-separated item IDs of the batch, in order
+            error (str): why the batch was not added
+        success (bool): True if every batch was added, False otherwise (some items may still have been added, see item_count).
+        error (str): An error message if any batch failed, otherwise None.
     """
-    # Run query and process results
-    api_instance = emby_client.PlaylistServiceApi(e_api_client)
-    try:
-        api_response = api_instance.post_playlists_by_id_items(item_ids, playlist_id, user_id=user_id)
-        if api_response is not None and api_response.item_added_count > 0:
-            return {
-                'success': True,
-                'item_count': api_response.item_added_count
-            }
-        else:
-            return {
-                'success': False,
-                'error': 'Failed to add item(s) to playlist.'
-            }
 
-    except ApiException as e:
+    id_list = [item_id.strip() for item_id in item_ids.split(',') if item_id.strip() != ""]
+    if len(id_list) == 0:
         return {
             'success': False,
-            'error': str(e)
+            'error': 'No item IDs supplied.'
         }
+    batches = playlist_id_batches(id_list)
+
+    # Run query and process results
+    api_instance = emby_client.PlaylistServiceApi(e_api_client)
+    item_count = 0
+    items_sent = 0
+    failed_batches = []
+    for batch_number, batch in enumerate(batches, start=1):
+        batch_ids = ",".join(batch)
+        try:
+            api_response = api_instance.post_playlists_by_id_items(batch_ids, playlist_id, user_id=user_id)
+            if api_response is not None and api_response.item_added_count > 0:
+                item_count += api_response.item_added_count
+            else:
+                failed_batches.append({'batch_number': batch_number, 'item_ids': batch_ids, 'error': 'Failed to add item(s) to playlist.'})
+        except ApiException as e:
+            failed_batches.append({'batch_number': batch_number, 'item_ids': batch_ids, 'error': str(e)})
+        items_sent += len(batch)
+        if progress is not None:
+            progress(items_sent, len(id_list))
+
+    result = {
+        'success': len(failed_batches) == 0,
+        'item_count': item_count,
+        'batch_count': len(batches),
+        'failed_batches': failed_batches
+    }
+    if len(failed_batches) > 0:
+        result['error'] = f"{len(failed_batches)} of {len(batches)} batches of items were not added, the first because: {failed_batches[0]['error']}"
+    return result
 
 #--------------------------------------------------
 
@@ -978,6 +1380,8 @@ def delete_playlist_items(e_api_client: object, playlist_id: str, playlist_item_
 
     """
     Removes one or more items from the end of an existing playlist on the Emby server.
+    Any number of entries can be removed: they are sent in batches of at most PLAYLIST_BATCH_ITEMS entries, and the
+    remaining batches are not sent once a batch fails, though the entries of earlier batches have already been removed.
     
     Args:
         e_api_client (obj): The authenticated API client.
@@ -987,22 +1391,32 @@ def delete_playlist_items(e_api_client: object, playlist_id: str, playlist_item_
 
     Returns:
         dict: A dictionary with keys:
-        success (bool): True if the request was successful, False otherwise.
+        item_count (int): the number of entries removed from the playlist.
+        batch_count (int): the number of batches that were sent, including a batch that failed.
+        success (bool): True if every batch was removed, False otherwise (some entries may still have been removed, see item_count).
         error (str): An error message if the request failed, otherwise None.
     """
     # Run query and process results
     api_instance = emby_client.PlaylistServiceApi(e_api_client)
-    try:
-        api_response = api_instance.post_playlists_by_id_items_delete(playlist_id, playlist_item_number)
-        return {
-            'success': True
-        }
-
-    except ApiException as e:
-        return {
-            'success': False,
-            'error': str(e)
-        }
+    item_count = 0
+    batch_count = 0
+    for batch in playlist_id_batches([entry_id.strip() for entry_id in playlist_item_number.split(',') if entry_id.strip() != ""]):
+        batch_count += 1
+        try:
+            api_response = api_instance.post_playlists_by_id_items_delete(playlist_id, ",".join(batch))
+        except ApiException as e:
+            return {
+                'success': False,
+                'item_count': item_count,
+                'batch_count': batch_count,
+                'error': str(e)
+            }
+        item_count += len(batch)
+    return {
+        'success': True,
+        'item_count': item_count,
+        'batch_count': batch_count
+    }
 
 #--------------------------------------------------
 
@@ -1039,6 +1453,143 @@ def move_playlist_items(e_api_client: object, playlist_id: str, playlist_item_nu
 
 #--------------------------------------------------
 
+def sync_playlist_items(e_api_client: object, user_id: str, playlist_id: str, item_ids: str) ->dict:
+
+    """
+    Makes an existing playlist on the Emby server hold exactly the given items in the given order, using as few requests as
+    it can. The playlist is compared with the wanted order (see _plan_playlist_sync()), then in turn: the entries that are
+    not wanted are removed in batches, the missing items are added in batches, and only those added items that belong
+    before the end of the playlist are moved into place, one request each. Items that are already in the right order are
+    left where they are, so they keep their playlist entry. Playlists holding entries that are neither audio nor video are
+    refused, as Emby counts those entries in the positions that items are moved to.
+
+    Args:
+        e_api_client (obj): The authenticated API client.
+        user_id (str): The ID of the user doing the search.
+        playlist_id (str): The ID of the existing playlist.
+        item_ids (str): A comma-separated list of the item IDs the playlist should hold, in order. An item may appear more than once.
+
+    Returns:
+        dict: A dictionary with keys:
+        item_count (int): the number of items on the playlist when it is in the wanted order.
+        unchanged (int): the number of items that were left where they were.
+        removed (int): the number of entries removed.
+        added (int): the number of items added.
+        moved (int): the number of added items moved into place.
+        emby_requests (int): the number of requests made to Emby, including reading the playlist.
+        success (bool): True if the playlist is now in the wanted order, False otherwise.
+        error (str): An error message if the request failed, otherwise None.
+    """
+
+    target = [item_id.strip() for item_id in item_ids.split(',') if item_id.strip() != ""]
+    current = get_playlist_items(e_api_client, user_id, playlist_id, fields='item_id')
+    if not current['success']:
+        return current
+    if current['total_count'] != len(current['items']):
+        return {
+            'success': False,
+            'error': f"playlist ID {playlist_id} holds {current['total_count'] - len(current['items'])} entries that are neither audio nor video, so it cannot be put in order."
+        }
+    entries = [(item['playlist_item_number'], item['item_id']) for item in current['items']]
+    plan = _plan_playlist_sync([item_id for entry_id, item_id in entries], target)
+    result = {
+        'success': True,
+        'item_count': len(target),
+        'unchanged': len(plan['keep']),
+        'removed': 0,
+        'added': 0,
+        'moved': 0,
+        'emby_requests': 1
+    }
+
+    remove_entry_ids = [entries[index][0] for index in plan['remove']]
+    if len(remove_entry_ids) > 0:
+        removed = delete_playlist_items(e_api_client, playlist_id, ",".join(remove_entry_ids))
+        result['emby_requests'] += removed['batch_count']
+        result['removed'] = removed['item_count']
+        if not removed['success']:
+            return dict(result, success=False, error=f"failed to remove entries from the playlist: {removed['error']}")
+
+    add_item_ids = [target[index] for index in plan['insert']] + target[plan['append_from']:]
+    if len(add_item_ids) > 0:
+        added = add_playlist_items(e_api_client, user_id, playlist_id, ",".join(add_item_ids))
+        result['emby_requests'] += added.get('batch_count', 1)
+        result['added'] = added.get('item_count', 0)
+        if not added['success']:
+            return dict(result, success=False, error=f"failed to add items to the playlist: {added['error']}")
+        if added['item_count'] != len(add_item_ids):
+            return dict(result, success=False, error=f"Emby added {added['item_count']} of the {len(add_item_ids)} items to the playlist, check that the item IDs exist.")
+
+    if len(plan['insert']) > 0:
+        # The added items are the last entries on the playlist, in the order they were added
+        updated = get_playlist_items(e_api_client, user_id, playlist_id, fields='item_id')
+        result['emby_requests'] += 1
+        if not updated['success']:
+            return dict(result, success=False, error=f"failed to read the playlist back to move the added items into place: {updated['error']}")
+        added_entries = updated['items'][len(updated['items']) - len(add_item_ids):]
+        if [entry['item_id'] for entry in added_entries] != add_item_ids:
+            return dict(result, success=False, error="the playlist changed while it was being put in order, so the added items were not moved into place.")
+        # Moving each item to its index in increasing order leaves everything before it in its final place
+        for index, added_entry in zip(plan['insert'], added_entries):
+            moved = move_playlist_items(e_api_client, playlist_id, added_entry['playlist_item_number'], str(index))
+            result['emby_requests'] += 1
+            if not moved['success']:
+                return dict(result, success=False, error=f"failed to move item {target[index]} into place on the playlist: {moved['error']}")
+            result['moved'] += 1
+
+    return result
+
+#--------------------------------------------------
+
+def _plan_playlist_sync(current_ids: list, target_ids: list) ->dict:
+    """
+    Work out how to turn a playlist holding current_ids into one holding target_ids with the fewest requests. A diff of the two
+    (difflib's longest matching blocks) finds the items that are already in order. Then, for each point in target_ids, the cost
+    is estimated of keeping the in-order items before it, removing every other entry, appending the missing items before it
+    and everything after it, and moving those missing items that come before it into place. A move is a request per item,
+    while removes and appends are batched, so for a shuffled playlist the cheapest plan is usually to remove most of it and
+    append it again in order, and for a playlist with a few items added or removed it is to keep almost everything.
+
+    Returns:
+        dict: A dictionary with keys:
+        keep (list of int): the indexes in current_ids of the entries to keep
+        remove (list of int): the indexes in current_ids of the entries to remove
+        insert (list of int): the indexes in target_ids of the items to append and then move to that index, in increasing order
+        append_from (int): the index in target_ids from which every item is appended in order, after those in insert
+    """
+
+    matcher = difflib.SequenceMatcher(None, current_ids, target_ids, autojunk=False)
+    kept_at = {} # target index -> current index of the entries already in order
+    for block in matcher.get_matching_blocks():
+        for offset in range(block.size):
+            kept_at[block.b + offset] = block.a + offset
+
+    def batches(count: int) ->int:
+        return -(-count // PLAYLIST_BATCH_ITEMS)
+
+    best_cut = len(target_ids)
+    best_cost = None
+    kept_before = [0] * (len(target_ids) + 1) # the number of kept entries before each target index
+    for index in range(len(target_ids)):
+        kept_before[index + 1] = kept_before[index] + (1 if index in kept_at else 0)
+    for cut in range(len(target_ids), -1, -1): # later cuts keep more entries, so win ties
+        kept = kept_before[cut]
+        moves = cut - kept
+        cost = batches(len(current_ids) - kept) + batches(len(target_ids) - kept) + (1 + moves if moves > 0 else 0)
+        if best_cost is None or cost < best_cost:
+            best_cut, best_cost = cut, cost
+
+    keep = sorted(kept_at[index] for index in range(best_cut) if index in kept_at)
+    kept_set = set(keep)
+    return {
+        'keep': keep,
+        'remove': [index for index in range(len(current_ids)) if index not in kept_set],
+        'insert': [index for index in range(best_cut) if index not in kept_at],
+        'append_from': best_cut
+    }
+
+#--------------------------------------------------
+
 class sharing_kwargs(TypedDict, total=False):
     user_ids: NotRequired[list]
     item_access: NotRequired[str]
@@ -1232,78 +1783,12 @@ def get_player_sessions(e_api_client:object, user_id: Optional[str] = "", media_
     api_instance = emby_client.SessionsServiceApi(e_api_client)
     try:
         if user_id == "":
-            api_response = api_instance.get_sessions()
+            api_response = get_raw_json(api_instance.get_sessions)
         else:
-            api_response = api_instance.get_sessions(controllable_by_user_id=user_id)
-        # Filter out sessions that do not have any playable media types, and return a subset of fields
-        session_list = api_response
-        filtered_items = [
-            {
-                'client_name': session.client,
-                'session_id': session.id,
-                'device_id': session.device_id,
-                'device_name': session.device_name,
-                'device_ip_address': session.remote_end_point,
-                'local_to_media_server': False,
-                'media_types': session.playable_media_types if session.playable_media_types is not None else [],
-                'now_playing_item' : session.now_playing_item if session.now_playing_item is not None else None,
-                'play_state' : session.play_state if session.play_state is not None else None
-            }
-            for session in session_list
-            if session.playable_media_types is not None and session.playable_media_types != []
-        ]
- 
-        # Extract some info from the now_playing_item and play_state objects, if available
-        for item in filtered_items:
-            if item['now_playing_item']:
-                now_playing_item = item['now_playing_item']
-                item['now_playing_title'] = now_playing_item.name
-                item['now_playing_artists'] = now_playing_item.artists
-                item['now_playing_album'] = now_playing_item.album
-                item['now_playing_track_number'] = now_playing_item.index_number
-                item['now_playing_disk_number'] = now_playing_item.parent_index_number
-                item['now_playing_item_id'] = now_playing_item.id
-                item['now_playing_total_milliseconds'] = int(now_playing_item.run_time_ticks / 10000) # convert from ticks
-                total_seconds = item['now_playing_total_milliseconds'] // 1000
-                tthours = total_seconds // 3600
-                ttmins = (total_seconds % 3600) // 60
-                ttsecs = total_seconds % 60
-                item['now_playing_total_time'] = f"{str(tthours).zfill(2)}:{str(ttmins).zfill(2)}:{str(ttsecs).zfill(2)}"
-                item.pop('now_playing_item', None)
-            if item['play_state']:
-                play_state = item['play_state']
-                if play_state.position_ticks is not None:
-                    item['now_playing_position_milliseconds'] = int(play_state.position_ticks / 10000) # convert from ticks
-                    total_seconds = item['now_playing_position_milliseconds'] // 1000
-                    tthours = total_seconds // 3600
-                    ttmins = (total_seconds % 3600) // 60
-                    ttsecs = total_seconds % 60
-                    item['now_playing_position_time'] = f"{str(tthours).zfill(2)}:{str(ttmins).zfill(2)}:{str(ttsecs).zfill(2)}"
-                else:
-                    item['now_playing_position_milliseconds'] = None
-                    item['now_playing_total_time'] = ""
-                item['now_playing_is_paused'] = play_state.is_paused
-                item.pop('play_state', None)
-
-        # If media_type is specified, return only sessions that can actually play this media_type
-        # Also update the 'device_local_to_emby' field to True if the device IP is localhost relative to the Emby server
-        session_list = []
-        for item in filtered_items:
-            if media_type != '':
-                for mt in item['media_types']:
-                    if mt.lower() == media_type.lower():
-                        if item['device_ip_address'] is not None and (item['device_ip_address'] == '::1' or item['device_ip_address'] == '127.0.0.1'):
-                            item['local_to_media_server'] = True
-                        session_list.append(item)
-                        break
-            else:
-                if item['device_ip_address'] is not None and (item['device_ip_address'] == '::1' or item['device_ip_address'] == '127.0.0.1'):
-                    item['local_to_media_server'] = True
-                session_list.append(item)
-
+            api_response = get_raw_json(api_instance.get_sessions, controllable_by_user_id=user_id)
         return {
             'success': True,
-            'sessions': session_list
+            'sessions': player_sessions_from_json(api_response or [], media_type)
         }
         
     except ApiException as e:
@@ -1314,6 +1799,72 @@ def get_player_sessions(e_api_client:object, user_id: Optional[str] = "", media_
 
 #--------------------------------------------------
 
+def player_sessions_from_json(session_list: list, media_type: Optional[str] = "") ->list:
+    """
+    Turn Emby SessionInfo objects, as parsed from its JSON (from the REST API or the WebSocket feed), into the session
+    dictionaries returned by get_player_sessions(), leaving out sessions that cannot play anything or cannot play media_type.
+    """
+
+    # Filter out sessions that do not have any playable media types, and return a subset of fields
+    filtered_items = [
+        {
+            'client_name': session.get('Client'),
+            'session_id': session.get('Id'),
+            'device_id': session.get('DeviceId'),
+            'device_name': session.get('DeviceName'),
+            'device_ip_address': session.get('RemoteEndPoint'),
+            'local_to_media_server': False,
+            'media_types': session.get('PlayableMediaTypes') or [],
+            'now_playing_item' : session.get('NowPlayingItem'),
+            'play_state' : session.get('PlayState')
+        }
+        for session in session_list
+        if session.get('PlayableMediaTypes')
+    ]
+
+    # Extract some info from the now_playing_item and play_state objects, if available
+    for item in filtered_items:
+        if item['now_playing_item']:
+            now_playing_item = item['now_playing_item']
+            item['now_playing_title'] = now_playing_item.get('Name')
+            item['now_playing_artists'] = now_playing_item.get('Artists')
+            item['now_playing_album'] = now_playing_item.get('Album')
+            item['now_playing_track_number'] = now_playing_item.get('IndexNumber')
+            item['now_playing_disk_number'] = now_playing_item.get('ParentIndexNumber')
+            item['now_playing_item_id'] = now_playing_item.get('Id')
+            item['now_playing_total_milliseconds'] = int((now_playing_item.get('RunTimeTicks') or 0) / 10000) # convert from ticks
+            item['now_playing_total_time'] = format_run_time(now_playing_item.get('RunTimeTicks')) or "00:00:00"
+            item.pop('now_playing_item', None)
+        if item['play_state']:
+            play_state = item['play_state']
+            if play_state.get('PositionTicks') is not None:
+                item['now_playing_position_milliseconds'] = int(play_state['PositionTicks'] / 10000) # convert from ticks
+                item['now_playing_position_time'] = format_run_time(play_state['PositionTicks']) or "00:00:00"
+            else:
+                item['now_playing_position_milliseconds'] = None
+                item['now_playing_total_time'] = ""
+            item['now_playing_is_paused'] = play_state.get('IsPaused')
+            item.pop('play_state', None)
+
+    # If media_type is specified, return only sessions that can actually play this media_type
+    # Also update the 'device_local_to_emby' field to True if the device IP is localhost relative to the Emby server
+    session_list = []
+    for item in filtered_items:
+        if media_type is not None and media_type != '':
+            for mt in item['media_types']:
+                if mt.lower() == media_type.lower():
+                    if item['device_ip_address'] is not None and (item['device_ip_address'] == '::1' or item['device_ip_address'] == '127.0.0.1'):
+                        item['local_to_media_server'] = True
+                    session_list.append(item)
+                    break
+        else:
+            if item['device_ip_address'] is not None and (item['device_ip_address'] == '::1' or item['device_ip_address'] == '127.0.0.1'):
+                item['local_to_media_server'] = True
+            session_list.append(item)
+    return session_list
+
+#--------------------------------------------------
+
 def full_player_sessions(e_api_client:object, user_id: str = "", media_type: str = "") -> dict:
     """
     Get a full list of active sessions from the Emby server that are media players which we can control.
@@ -1363,17 +1914,19 @@ def full_player_sessions(e_api_client:object, user_id: str = "", media_type: str
 
 #--------------------------------------------------
 
-def get_playqueue_items(e_api_client: object, session_id: str) ->dict:
+def get_playqueue_items(e_api_client: object, session_id: str, fields: Optional[str] = "full") ->dict:
     """
     Get the playqueue for a player session as a list of media item from the Emby server.
     
     Args:
         e_api_client (obj): The authenticated API client.
         session_id (str): The ID of the session to query.
+        fields (str, optional): Which keys to return for each item, as accepted by resolve_item_fields(). Defaults to 'full'.
+            playlist_item_id is always returned.
     
     Returns:
         dict: A dictionary with keys:
-        items (list of dict): the media items in the playqueue as dictionary entries.
+        items (list of dict): the media items in the playqueue as dictionary entries, with the keys selected by 'fields':
             title (str): item name
             artists (list of str): name of the item's atists  
             album (str): name of the album that the item is from
@@ -1395,51 +1948,22 @@ def get_playqueue_items(e_api_client: object, session_id: str) ->dict:
         error (str): An error message if the request failed, otherwise None.
     """
 
+    field_keys = resolve_item_fields(fields)
+    if not field_keys['success']:
+        return field_keys
+    field_keys = field_keys['keys']
+
     api_instance = emby_client.SessionsServiceApi(e_api_client)
 
     if session_id != '':
         try:
-            api_response = api_instance.get_sessions_playqueue(id=session_id)
-            total_count = api_response.total_record_count
+            # Emby always sends the full play queue entries, so only the returned keys can be trimmed
+            api_response = get_raw_json(api_instance.get_sessions_playqueue, id=session_id)
+            total_count = api_response.get('TotalRecordCount') or 0
             if total_count > 0:
-                items_list = api_response.items
-                filtered_items = [
-                    {
-                        'title': item.name if item.name else "",
-                        'artists': [artist for artist in item.artists] if item.artists else [],
-                        'album': item.album if item.album else "",
-                        'album_id': item.album_id if item.album_id else "",
-                        'album_artist': item.album_artist if item.album_artist else "",
-                        'disk_number': item.parent_index_number if item.parent_index_number else "",
-                        'track_number': item.index_number if item.index_number else "",
-                        'creation_date': item.date_created.isoformat() if item.date_created else "",
-                        'premiere_date': item.premiere_date.isoformat() if item.premiere_date else "",
-                        'production_year': item.production_year if item.production_year else "",
-                        'genres': item.genres if item.genres else [],
-                        'overview': item.overview if item.overview else "",
-                        'media_type': item.media_type if item.media_type else "",
-                        'bitrate': item.bitrate if item.bitrate else "",
-                        'run_time_ticks': item.run_time_ticks if item.run_time_ticks else 0,
-                        'run_time': "",  # Placeholder for run time, will be filled later
-                        'item_id': item.id if item.id else "",
-                        'playlist_item_id': item.playlist_item_id if item.playlist_item_id else ""
-                    }
-                    for item in items_list
-                ]
-                
-                # Convert run_time_ticks into hh:mm:ss
-                for item in filtered_items:
-                    if item['run_time_ticks'] > 0:
-                        total_seconds = int(item['run_time_ticks'] / 10000000) # convert from ticks
-                        tthours = total_seconds // 3600
-                        ttmins = (total_seconds % 3600) // 60
-                        ttsecs = total_seconds % 60
-                        item['run_time'] = f"{str(tthours).zfill(2)}:{str(ttmins).zfill(2)}:{str(ttsecs).zfill(2)}"
-                    item.pop('run_time_ticks', None)
-
                 return {
                     'success': True,
-                    'items': filtered_items
+                    'items': materialise_items(api_response.get('Items') or [], item_output_keys(field_keys, PLAYQUEUE_ITEM_KEYS, ('playlist_item_id',)))
                 }
 
             return {
@@ -1557,3 +2081,86 @@ def send_player_command(e_api_client: object, session_id: str, command: str, **k
         }
 
 #--------------------------------------------------
+
+def select_player_sessions(sessions: list, session_ids: Optional[str] = "", device_name: Optional[str] = "") ->list:
+    """
+    Choose the player sessions to send a command to, from those returned by get_player_sessions().
+
+    Args:
+        sessions (list of dict): The sessions returned by get_player_sessions(), already filtered by media type if wanted.
+        session_ids (str, optional): A comma separated list of session IDs to choose. If empty, sessions are chosen by device_name.
+        device_name (str, optional): A device name pattern, with * and ? wildcards and ignoring case (e.g., 'Speaker*').
+            If empty, all of the sessions are chosen.
+
+    Returns:
+        list of dict: The chosen sessions, in the order given.
+    """
+
+    if session_ids is not None and session_ids != "":
+        wanted = [session_id.strip() for session_id in session_ids.split(',') if session_id.strip() != ""]
+        by_id = {session['session_id']: session for session in sessions}
+        return [by_id[session_id] for session_id in dict.fromkeys(wanted) if session_id in by_id]
+    if device_name is not None and device_name != "":
+        pattern = device_name.lower()
+        return [session for session in sessions if fnmatch.fnmatchcase((session['device_name'] or "").lower(), pattern)]
+    return list(sessions)
+
+#--------------------------------------------------
+
+def broadcast_player_command(e_api_client: object, session_ids: list, command: str, max_workers: int = 8, **kwargs: Unpack[playcmd_kwargs]) ->dict:
+    """
+    Send the same command to several sessions at once, e.g. to pause every player in the house, rather than one after another.
+
+    Args:
+        e_api_client (obj): The authenticated API client.
+        session_ids (list of str): The IDs of the sessions to send the command to.
+        command (str): The command to send, as send_player_command().
+        max_workers (int, optional): The maximum number of commands to send at once.
+        item_ids, user_id, time_ms (optional as keywords): as send_player_command().
+
+    Returns:
+        dict: A dictionary with keys:
+        results (list of dict): one per session, in the order given, with keys:
+            session_id (str): The ID of the session
+            success (bool): True if the session accepted the command
+            error (str): An error message if the command failed, otherwise None
+            seconds (float): How long the command took
+        succeeded (int): The number of sessions that accepted the command
+        failed (int): The number of sessions that did not
+        seconds (float): How long the whole broadcast took
+        success (bool): True if every session accepted the command, False otherwise.
+        error (str): An error message if any command failed, otherwise None.
+    """
+
+    def send(session_id: str) ->dict:
+        start = time.perf_counter()
+        try:
+            result = send_player_command(e_api_client, session_id, command, **kwargs)
+        except Exception as e: # e.g. the player's connection dropped, which must not stop the other players getting the command
+            result = {'success': False, 'error': str(e)}
+        return {
+            'session_id': session_id,
+            'success': result['success'],
+            'error': result.get('error'),
+            'seconds': round(time.perf_counter() - start, 3)
+        }
+
+    if len(session_ids) == 0:
+        return {
+            'success': False,
+            'error': "no player sessions were chosen."
+        }
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(session_ids)))) as pool:
+        results = list(pool.map(send, session_ids))
+    failed = [result for result in results if not result['success']]
+    return {
+        'success': len(failed) == 0,
+        'error': f"{len(failed)} of {len(results)} players did not accept the command, first because: {failed[0]['error']}" if failed else None,
+        'results': results,
+        'succeeded': len(results) - len(failed),
+        'failed': len(failed),
+        'seconds': round(time.perf_counter() - start, 3)
+    }
+
+#--------------------------------------------------
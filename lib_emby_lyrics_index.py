@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+"""
+Model Context Protocol (MCP) server that connects an Emby media server to an AI client such as Claude Desktop.
+See emby_mcp_server.py for details.
+
+Copyright (C) 2025 Dominic Search <code@angeltek.co.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+#==================================================
+# Functions for a Local Lyrics & Description Index
+#==================================================
+
+# Emby cannot search lyrics, so without an index every lyrics search downloads the whole library.
+# This index holds the normalised (casefolded ASCII) lyrics and overview of every item in a SQLite
+# file, plus an inverted index of the words in them. A search looks up the items that contain every
+# word of the phrase, then verifies the exact phrase against only those candidate items.
+
+from datetime import datetime, timedelta, timezone
+from unidecode import unidecode
+import re
+import sqlite3
+import threading
+
+LYRICS_INDEX_PAGE_SIZE = 500 # items fetched from Emby per request while building the index
+LYRICS_INDEX_OVERLAP_SECONDS = 300 # refresh overlap, to allow for clock differences with the Emby server
+_TOKEN_PATTERN = re.compile(r'[A-Za-z0-9]+')
+
+#--------------------------------------------------
+# Index Management Functions
+#-------------------------
+
+def open_lyrics_index(db_path: str, refresh_seconds: int = 3600, rebuild_seconds: int = 604800) ->dict:
+    """
+    Open (creating if necessary) the on-disk lyrics index.
+
+    Args:
+        db_path (str): The path of the SQLite file that holds the index.
+        refresh_seconds (int, optional): How often refresh_lyrics_index() should be called to pick up changed items.
+        rebuild_seconds (int, optional): How often the refresh should re-read the whole library to drop deleted items.
+
+    Returns:
+        dict: A dictionary with keys:
+        index (dict): The index handle to pass to the other index functions:
+            db_path (str): the path of the SQLite file
+            refresh_seconds (int): as supplied
+            rebuild_seconds (int): as supplied
+            ready (bool): True once the index has been fully built at least once
+            lock (obj): serialises refreshes of the index
+        success (bool): True if the request was successful, False otherwise.
+        error (str): An error message if the request failed, otherwise None.
+    """
+
+    try:
+        connection = sqlite3.connect(db_path, timeout=30)
+        with connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            connection.execute("CREATE TABLE IF NOT EXISTS docs (item_id TEXT PRIMARY KEY, lyrics TEXT, overview TEXT, generation INTEGER)")
+            connection.execute("CREATE TABLE IF NOT EXISTS postings (token TEXT, item_id TEXT, PRIMARY KEY (token, item_id)) WITHOUT ROWID")
+            connection.execute("CREATE INDEX IF NOT EXISTS postings_by_item ON postings (item_id)")
+            connection.execute("CREATE TABLE IF NOT EXISTS vocab (token TEXT PRIMARY KEY) WITHOUT ROWID")
+        ready = _get_meta(connection, 'built_at') is not None
+        connection.close()
+
+    except sqlite3.Error as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+    return {
+        'success': True,
+        'index': {
+            'db_path': db_path,
+            'refresh_seconds': refresh_seconds,
+            'rebuild_seconds': rebuild_seconds,
+            'ready': ready,
+            'lock': threading.Lock()
+        }
+    }
+
+#--------------------------------------------------
+
+def refresh_lyrics_index(e_api_client: object, user_id: str, lyrics_index: dict, rebuild: bool = False) ->dict:
+    """
+    Bring the lyrics index up to date with the Emby server. The first call (and any call once rebuild_seconds
+    have passed since the last full build) reads every item in the library; other calls only read the
+    items that Emby has saved since the previous refresh. Blocking - run it on a background thread.
+
+    Args:
+        e_api_client (obj): The authenticated API client.
+        user_id (str): The ID of the user whose view of the library is indexed.
+        lyrics_index (dict): The index returned by open_lyrics_index().
+        rebuild (bool, optional): Force a full re-read of the library.
+
+    Returns:
+        dict: A dictionary with keys:
+        item_count (int): the number of items read from Emby.
+        full_build (bool): True if the whole library was read.
+        success (bool): True if the request was successful, False otherwise.
+        error (str): An error message if the request failed, otherwise None.
+    """
+
+    # Imported here as lib_emby_functions uses this module for lyrics searches
+    from lib_emby_functions import get_items
+
+    with lyrics_index['lock']:
+        connection = sqlite3.connect(lyrics_index['db_path'], timeout=30)
+        try:
+            now = datetime.now(timezone.utc)
+            built_at = _get_meta(connection, 'built_at')
+            refreshed_at = _get_meta(connection, 'refreshed_at')
+            if built_at is None or refreshed_at is None or now - datetime.fromisoformat(built_at) > timedelta(seconds=lyrics_index['rebuild_seconds']):
+                rebuild = True
+
+            query = {}
+            if not rebuild:
+                since = datetime.fromisoformat(refreshed_at) - timedelta(seconds=LYRICS_INDEX_OVERLAP_SECONDS)
+                query['min_date_last_saved'] = since.isoformat()
+            generation = int(_get_meta(connection, 'generation') or 0) + 1
+
+            # Read the library a page at a time so that memory stays bounded
+            item_count = 0
+            start_index = 0
+            while True:
+                item_list = get_items(e_api_client, user_id, start_index=start_index, limit=LYRICS_INDEX_PAGE_SIZE, **query)
+                if not item_list['success']:
+                    return item_list
+                with connection:
+                    for item in item_list['items']:
+                        _index_item(connection, item['item_id'], item['lyrics'], item['overview'], generation)
+                item_count += len(item_list['items'])
+                start_index += LYRICS_INDEX_PAGE_SIZE
+                if len(item_list['items']) == 0 or start_index >= item_list['total_count']:
+                    break
+
+            with connection:
+                if rebuild:
+                    # Anything not seen during a full read has been deleted from Emby
+                    connection.execute("DELETE FROM postings WHERE item_id IN (SELECT item_id FROM docs WHERE generation < ?)", (generation,))
+                    connection.execute("DELETE FROM docs WHERE generation < ?", (generation,))
+                    _set_meta(connection, 'built_at', now.isoformat())
+                _set_meta(connection, 'generation', str(generation))
+                _set_meta(connection, 'refreshed_at', now.isoformat())
+            lyrics_index['ready'] = True
+
+            return {
+                'success': True,
+                'item_count': item_count,
+                'full_build': rebuild
+            }
+
+        except sqlite3.Error as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        finally:
+            connection.close()
+
+#--------------------------------------------------
+# Search Functions
+#-------------------------
+
+def normalise_lyrics_text(text: str) ->str:
+    """
+    Normalise text for lyrics searching: casefold, then transliterate to the nearest ASCII equivalents.
+    """
+
+    return unidecode(text.casefold()) if text else ""
+
+#--------------------------------------------------
+
+def search_lyrics_index(lyrics_index: dict, phrase: str) ->dict:
+    """
+    Find the items whose lyrics or overview contain a phrase, using the same matching rules as get_items():
+    the normalised phrase must appear within the normalised lyrics or normalised overview.
+
+    Args:
+        lyrics_index (dict): The index returned by open_lyrics_index().
+        phrase (str): The phrase to search for.
+
+    Returns:
+        dict: A dictionary with keys:
+        item_ids (list of str): The IDs of matching items.
+        success (bool): True if the request was successful, False otherwise.
+        error (str): An error message if the request failed, otherwise None.
+    """
+
+    norm_phrase = normalise_lyrics_text(phrase)
+    connection = sqlite3.connect(lyrics_index['db_path'], timeout=30)
+    try:
+        # Narrow down to candidate items that contain every word of the phrase
+        candidates = None
+        for token, whole_start, whole_end in _phrase_tokens(norm_phrase):
+            token = token.lower()
+            if whole_start and whole_end:
+                rows = connection.execute("SELECT item_id FROM postings WHERE token = ?", (token,))
+            else:
+                # A word at either end of the phrase may only be part of a word in the lyrics
+                vocab = _match_vocab(connection, token, whole_start, whole_end)
+                if len(vocab) == 0:
+                    return {
+                        'success': True,
+                        'item_ids': []
+                    }
+                rows = []
+                for batch in _batches(vocab, 500):
+                    rows += connection.execute(f"SELECT item_id FROM postings WHERE token IN ({','.join('?' * len(batch))})", batch).fetchall()
+            item_ids = set(row[0] for row in rows)
+            candidates = item_ids if candidates is None else candidates & item_ids
+            if len(candidates) == 0:
+                return {
+                    'success': True,
+                    'item_ids': []
+                }
+
+        # Verify the whole phrase against the text of each candidate
+        if candidates is None:
+            # No words in the phrase (just punctuation), so verify against everything
+            rows = connection.execute("SELECT item_id, lyrics, overview FROM docs").fetchall()
+        else:
+            rows = []
+            for batch in _batches(sorted(candidates), 500):
+                rows += connection.execute(f"SELECT item_id, lyrics, overview FROM docs WHERE item_id IN ({','.join('?' * len(batch))})", batch).fetchall()
+        matches = [item_id for item_id, lyrics, overview in rows if norm_phrase in lyrics or norm_phrase in overview]
+
+        return {
+            'success': True,
+            'item_ids': matches
+        }
+
+    except sqlite3.Error as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+    finally:
+        connection.close()
+
+#--------------------------------------------------
+# Internal Helpers
+#-------------------------
+
+def _index_item(connection: object, item_id: str, lyrics: str, overview: str, generation: int) ->None:
+    """
+    Add or replace one item in the index.
+    """
+
+    norm_lyrics = normalise_lyrics_text(lyrics)
+    norm_overview = normalise_lyrics_text(overview)
+    tokens = set(token.lower() for token in _TOKEN_PATTERN.findall(norm_lyrics))
+    tokens.update(token.lower() for token in _TOKEN_PATTERN.findall(norm_overview))
+
+    connection.execute("DELETE FROM postings WHERE item_id = ?", (item_id,))
+    connection.execute("INSERT OR REPLACE INTO docs (item_id, lyrics, overview, generation) VALUES (?, ?, ?, ?)", (item_id, norm_lyrics, norm_overview, generation))
+    connection.executemany("INSERT OR IGNORE INTO postings (token, item_id) VALUES (?, ?)", [(token, item_id) for token in tokens])
+    connection.executemany("INSERT OR IGNORE INTO vocab (token) VALUES (?)", [(token,) for token in tokens])
+
+#--------------------------------------------------
+
+def _phrase_tokens(norm_phrase: str) ->list:
+    """
+    Split a normalised phrase into words, noting whether each word is known to be a whole word:
+    a word touching the start or end of the phrase may continue beyond it in the matched text.
+    Returns a list of tuples (word, whole_at_start, whole_at_end).
+    """
+
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(norm_phrase):
+        tokens.append((match.group(0), match.start() > 0, match.end() < len(norm_phrase)))
+    return tokens
+
+#--------------------------------------------------
+
+def _match_vocab(connection: object, token: str, whole_start: bool, whole_end: bool) ->list:
+    """
+    Find indexed words that could contain a partial word from the edge of a phrase.
+    """
+
+    if whole_start:
+        # The word starts where the phrase word starts, but may carry on after the end of the phrase
+        rows = connection.execute("SELECT token FROM vocab WHERE token >= ? AND token < ?", (token, token[:-1] + chr(ord(token[-1]) + 1)))
+    elif whole_end:
+        rows = connection.execute("SELECT token FROM vocab WHERE substr(token, -?) = ?", (len(token), token))
+    else:
+        rows = connection.execute("SELECT token FROM vocab WHERE instr(token, ?) > 0", (token,))
+    return [row[0] for row in rows]
+
+#--------------------------------------------------
+
+def _batches(values: list, size: int):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+#--------------------------------------------------
+
+def _get_meta(connection: object, key: str):
+    row = connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+def _set_meta(connection: object, key: str, value: str) ->None:
+    connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+#--------------------------------------------------
@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+"""
+Model Context Protocol (MCP) server that connects an Emby media server to an AI client such as Claude Desktop.
+See emby_mcp_server.py for details.
+
+Copyright (C) 2025 Dominic Search <code@angeltek.co.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+#==================================================
+# Functions for Measuring Tool and Emby Call Latency
+#==================================================
+
+# Metrics are kept in a plain dictionary (held in the lifespan context) as a set of series, each keyed
+# by (kind, name). The kinds are:
+#   'tool'      - an MCP tool call, from the tool being called to its JSON being returned
+#   'emby_call' - an Emby SDK call, including turning the response into SDK objects, named by its
+#                 HTTP method and path template, e.g. 'GET /Users/{UserId}/Items'
+#   'emby_http' - the HTTP request and transfer part of the same Emby SDK call
+# So for a slow tool, the time spent waiting for Emby, in the SDK and in Emby.MCP itself can be told apart.
+# Each series counts calls and errors, and keeps a latency histogram and the total response size.
+# Nothing is measured unless metrics are enabled, so there is no cost otherwise.
+
+from typing import Any, Callable, Optional
+import emby_client
+import os
+import threading
+import time
+
+METRIC_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0) # seconds, as Prometheus 'le' bounds
+METRIC_KIND_NAMES = {'tool': 'tool', 'emby_call': 'call', 'emby_http': 'call'} # the Prometheus label that names each kind of series
+
+_emby_http = threading.local() # passes the HTTP measurements of an Emby SDK call from request() to call_api()
+
+#--------------------------------------------------
+# Recording Functions
+#-------------------------
+
+def new_metrics() ->dict:
+    """
+    Create an empty set of metrics.
+
+    Returns:
+        dict: The metrics, with keys:
+        started (float): when the metrics were created, as time.time()
+        series (dict): (kind, name) -> dict with keys count, errors, buckets (list of int, one more than
+            METRIC_LATENCY_BUCKETS for slower calls), seconds_total, seconds_max, bytes_total, items_total
+        originals (dict): the Emby SDK methods replaced by install_emby_call_metrics(), for uninstall_emby_call_metrics()
+        lock (obj): serialises access to series
+    """
+
+    return {
+        'started': time.time(),
+        'series': {},
+        'originals': {},
+        'lock': threading.Lock()
+    }
+
+#--------------------------------------------------
+
+def record_metric(metrics: dict, kind: str, name: str, seconds: float, error: bool = False, items: Optional[int] = None, size_bytes: Optional[int] = None) ->None:
+    """
+    Add one call to the series for (kind, name).
+
+    Args:
+        metrics (dict): The metrics from new_metrics().
+        kind (str): 'tool', 'emby_call' or 'emby_http'.
+        name (str): The tool name, or the Emby call's method and path template.
+        seconds (float): How long the call took.
+        error (bool, optional): True if the call failed.
+        items (int, optional): The number of items returned, if known.
+        size_bytes (int, optional): The size of the response, if known.
+    """
+
+    bucket = 0
+    while bucket < len(METRIC_LATENCY_BUCKETS) and seconds > METRIC_LATENCY_BUCKETS[bucket]:
+        bucket += 1
+    with metrics['lock']:
+        series = metrics['series'].get((kind, name))
+        if series is None:
+            series = {'count': 0, 'errors': 0, 'buckets': [0] * (len(METRIC_LATENCY_BUCKETS) + 1), 'seconds_total': 0.0, 'seconds_max': 0.0, 'bytes_total': 0, 'items_total': 0}
+            metrics['series'][(kind, name)] = series
+        series['count'] += 1
+        series['errors'] += 1 if error else 0
+        series['buckets'][bucket] += 1
+        series['seconds_total'] += seconds
+        series['seconds_max'] = max(series['seconds_max'], seconds)
+        series['bytes_total'] += size_bytes or 0
+        series['items_total'] += items or 0
+
+#--------------------------------------------------
+
+async def metered_tool_call(metrics: dict, tool_name: str, tool_function: Callable, *args, **kwargs) ->Any:
+    """
+    Call an MCP tool function and record its latency and the size of what it returns.
+    A tool that raises, or returns an 'ERROR: ...' message (as the tools do), counts as an error.
+
+    Args:
+        metrics (dict): The metrics from new_metrics().
+        tool_name (str): The name of the tool.
+        tool_function (func): The async tool function.
+        *args, **kwargs: The arguments to call it with.
+
+    Returns:
+        Whatever the tool returns.
+    """
+
+    start = time.perf_counter()
+    try:
+        result = await tool_function(*args, **kwargs)
+    except Exception:
+        record_metric(metrics, 'tool', tool_name, time.perf_counter() - start, error=True)
+        raise
+    is_text = isinstance(result, str)
+    failed = is_text and result.lstrip().startswith(('ERROR', '{"error"'))
+    record_metric(metrics, 'tool', tool_name, time.perf_counter() - start, error=failed, size_bytes=len(result) if is_text else None)
+    return result
+
+#--------------------------------------------------
+
+def install_emby_call_metrics(metrics: dict) ->None:
+    """
+    Measure every call made through the Emby SDK, by wrapping its ApiClient.call_api() and ApiClient.request().
+    This applies to every API client in the process, until uninstall_emby_call_metrics() is called.
+    Response sizes are the length of the response text, and are only known for responses that the SDK reads in full.
+    """
+
+    if len(metrics['originals']) > 0:
+        return
+    original_call_api = emby_client.ApiClient.call_api
+    original_request = emby_client.ApiClient.request
+
+    def metered_request(self, method, url, *args, **kwargs):
+        start = time.perf_counter()
+        response = original_request(self, method, url, *args, **kwargs)
+        size_bytes = None
+        if kwargs.get('_preload_content', True) and isinstance(getattr(response, 'data', None), (str, bytes)):
+            size_bytes = len(response.data)
+        _emby_http.measured = (time.perf_counter() - start, size_bytes)
+        return response
+
+    def metered_call_api(self, resource_path, method, *args, **kwargs):
+        _emby_http.measured = None
+        _emby_http.unread = None
+        call_name = f"{method} {resource_path}"
+        start = time.perf_counter()
+        try:
+            result = original_call_api(self, resource_path, method, *args, **kwargs)
+        except Exception:
+            record_metric(metrics, 'emby_call', call_name, time.perf_counter() - start, error=True)
+            raise
+        seconds = time.perf_counter() - start
+        data = result[0] if isinstance(result, tuple) else result
+        items = getattr(data, 'items', None) if not isinstance(data, (list, dict)) else data
+        http_seconds, size_bytes = _emby_http.measured or (None, None)
+        record_metric(metrics, 'emby_call', call_name, seconds, items=len(items) if isinstance(items, list) else None, size_bytes=size_bytes)
+        if http_seconds is not None:
+            record_metric(metrics, 'emby_http', call_name, http_seconds, size_bytes=size_bytes)
+        if not kwargs.get('_preload_content', True):
+            _emby_http.unread = (metrics, call_name) # the caller reads the response, see add_emby_response_size()
+        return result
+
+    metrics['originals'] = {'call_api': original_call_api, 'request': original_request}
+    emby_client.ApiClient.call_api = metered_call_api
+    emby_client.ApiClient.request = metered_request
+
+#--------------------------------------------------
+
+def add_emby_response_size(size_bytes: int, items: Optional[int] = None) ->None:
+    """
+    Add the size (and item count) of a response that the caller read itself, rather than the SDK (because it was
+    requested with _preload_content=False), to the last Emby call made by this thread. Does nothing if metrics are off.
+    """
+
+    unread = getattr(_emby_http, 'unread', None)
+    if unread is None:
+        return
+    _emby_http.unread = None
+    metrics, call_name = unread
+    with metrics['lock']:
+        for kind in ('emby_call', 'emby_http'):
+            series = metrics['series'].get((kind, call_name))
+            if series is not None:
+                series['bytes_total'] += size_bytes
+                if kind == 'emby_call':
+                    series['items_total'] += items or 0
+
+#--------------------------------------------------
+
+def uninstall_emby_call_metrics(metrics: dict) ->None:
+    """
+    Stop measuring Emby SDK calls, restoring the methods replaced by install_emby_call_metrics().
+    """
+
+    if len(metrics['originals']) > 0:
+        emby_client.ApiClient.call_api = metrics['originals']['call_api']
+        emby_client.ApiClient.request = metrics['originals']['request']
+        metrics['originals'] = {}
+
+#--------------------------------------------------
+# Reporting Functions
+#-------------------------
+
+def get_metrics_summary(metrics: dict) ->dict:
+    """
+    Summarise the metrics, slowest series first.
+
+    Args:
+        metrics (dict): The metrics from new_metrics().
+
+    Returns:
+        dict: A dictionary with keys:
+        uptime_seconds (float): how long the metrics have been collected
+        series (list of dict): one entry per series, with keys:
+            kind (str): 'tool', 'emby_call' or 'emby_http'
+            name (str): the tool name, or the Emby call's method and path template
+            count (int): the number of calls
+            errors (int): the number of failed calls
+            total_seconds (float): the total time taken
+            mean_seconds (float): the average time taken
+            p50_seconds (float): the median time taken, estimated from the histogram
+            p95_seconds (float): the 95th percentile time taken, estimated from the histogram
+            max_seconds (float): the longest time taken
+            mean_bytes (int): the average response size
+            mean_items (float): the average number of items returned, for Emby calls
+        success (bool): True if the request was successful, False otherwise.
+        error (str): An error message if the request failed, otherwise None.
+    """
+
+    with metrics['lock']:
+        series_list = [(kind, name, dict(series, buckets=list(series['buckets']))) for (kind, name), series in metrics['series'].items()]
+
+    summary = []
+    for kind, name, series in series_list:
+        count = series['count']
+        summary.append({
+            'kind': kind,
+            'name': name,
+            'count': count,
+            'errors': series['errors'],
+            'total_seconds': round(series['seconds_total'], 4),
+            'mean_seconds': round(series['seconds_total'] / count, 4),
+            'p50_seconds': round(_histogram_quantile(series, 0.5), 4),
+            'p95_seconds': round(_histogram_quantile(series, 0.95), 4),
+            'max_seconds': round(series['seconds_max'], 4),
+            'mean_bytes': int(series['bytes_total'] / count),
+            'mean_items': round(series['items_total'] / count, 1)
+        })
+    summary.sort(key=lambda entry: entry['total_seconds'], reverse=True)
+
+    return {
+        'success': True,
+        'uptime_seconds': round(time.time() - metrics['started'], 1),
+        'series': summary
+    }
+
+#--------------------------------------------------
+
+def get_metrics_prometheus(metrics: dict) ->str:
+    """
+    Return the metrics in the Prometheus text exposition format.
+    """
+
+    with metrics['lock']:
+        series_list = sorted(((kind, name, dict(series, buckets=list(series['buckets']))) for (kind, name), series in metrics['series'].items()), key=lambda entry: entry[:2])
+
+    lines = []
+    for kind in ('tool', 'emby_call', 'emby_http'):
+        of_kind = [(name, series) for series_kind, name, series in series_list if series_kind == kind]
+        if len(of_kind) == 0:
+            continue
+        label = METRIC_KIND_NAMES[kind]
+        metric = f"emby_mcp_{kind}"
+        lines.append(f"# HELP {metric}_seconds Latency of each {kind.replace('_', ' ')}.")
+        lines.append(f"# TYPE {metric}_seconds histogram")
+        for name, series in of_kind:
+            labels = f'{label}="{_prometheus_escape(name)}"'
+            cumulative = 0
+            for bound, bucket_count in zip(METRIC_LATENCY_BUCKETS, series['buckets']):
+                cumulative += bucket_count
+                lines.append(f'{metric}_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_seconds_bucket{{{labels},le="+Inf"}} {series["count"]}')
+            lines.append(f'{metric}_seconds_sum{{{labels}}} {series["seconds_total"]:.6f}')
+            lines.append(f'{metric}_seconds_count{{{labels}}} {series["count"]}')
+        for suffix, key, help_text in (('errors_total', 'errors', 'Failed calls'), ('response_bytes_total', 'bytes_total', 'Total response size'), ('response_items_total', 'items_total', 'Total items returned')):
+            if kind == 'tool' and key == 'items_total':
+                continue
+            if kind == 'emby_http' and key != 'bytes_total':
+                continue
+            lines.append(f"# HELP {metric}_{suffix} {help_text} of each {kind.replace('_', ' ')}.")
+            lines.append(f"# TYPE {metric}_{suffix} counter")
+            for name, series in of_kind:
+                lines.append(f'{metric}_{suffix}{{{label}="{_prometheus_escape(name)}"}} {series[key]}')
+    return '\n'.join(lines) + '\n'
+
+#--------------------------------------------------
+
+def write_metrics_file(metrics: dict, file_path: str) ->dict:
+    """
+    Write the metrics to file_path in the Prometheus text format, e.g. for node_exporter's textfile collector.
+    The file is replaced in one step, so that readers never see it half written.
+
+    Returns:
+        dict: A dictionary with keys:
+        success (bool): True if the request was successful, False otherwise.
+        error (str): An error message if the request failed, otherwise None.
+    """
+
+    temporary_path = f"{file_path}.tmp"
+    try:
+        with open(temporary_path, 'w', encoding='utf-8') as metrics_file:
+            metrics_file.write(get_metrics_prometheus(metrics))
+        os.replace(temporary_path, file_path)
+        return {
+            'success': True
+        }
+
+    except OSError as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+#--------------------------------------------------
+# Internal Helpers
+#-------------------------
+
+def _histogram_quantile(series: dict, quantile: float) ->float:
+    """
+    Estimate a quantile of a series' latency from its histogram, interpolating within the bucket it falls in.
+    """
+
+    rank = quantile * series['count']
+    cumulative = 0
+    lower = 0.0
+    for bound, bucket_count in zip(list(METRIC_LATENCY_BUCKETS) + [series['seconds_max']], series['buckets']):
+        if bucket_count > 0 and cumulative + bucket_count >= rank:
+            upper = min(bound, series['seconds_max'])
+            return lower + (upper - lower) * (rank - cumulative) / bucket_count
+        cumulative += bucket_count
+        lower = bound
+    return series['seconds_max']
+
+#--------------------------------------------------
+
+def _prometheus_escape(value: str) ->str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+#--------------------------------------------------
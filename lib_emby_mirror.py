@@ -0,0 +1,626 @@
+# -*- coding: utf-8 -*-
+"""
+Model Context Protocol (MCP) server that connects an Emby media server to an AI client such as Claude Desktop.
+See emby_mcp_server.py for details.
+
+Copyright (C) 2025 Dominic Search <code@angeltek.co.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+#==================================================
+# Functions for a Local Mirror of the Emby Library
+#==================================================
+
+# The mirror holds a copy of the items, genres and playlists that one user can see, in a SQLite file.
+# It is filled by a full crawl of each library and then kept fresh by reading only the items that Emby
+# has saved since the previous refresh. Searches that only use criteria the mirror can evaluate are
+# answered from it with indexed queries; anything else (such as played or favourite filters, which
+# depend on constantly changing user data) still goes to Emby.
+# Items and playlists are stored in exactly the form returned by get_items() and get_playlists(),
+# so that tools give the same answers whether or not the mirror is in use. Each item also keeps Emby's
+# SortName, so that searches return items in the order Emby would (see ITEM_SORT_BY) however they
+# arrived in the mirror, including items added by a refresh after the library was first crawled.
+
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Unpack
+import json
+import sqlite3
+import threading
+from lib_emby_functions import get_library_list, get_genre_list, get_items, get_item_columns, getitems_kwargs, ITEM_FIELD_KEYS, get_playlists, get_playlist_items, resolve_item_fields, project_items, PLAYLIST_ENTRY_KEYS
+from lib_emby_lyrics_index import normalise_lyrics_text
+from lib_emby_columns import iter_item_rows
+from emby_client.rest import ApiException
+
+MIRROR_PAGE_SIZE = 500 # items fetched from Emby per request while crawling
+MIRROR_OVERLAP_SECONDS = 300 # refresh overlap, to allow for clock differences with the Emby server
+MIRROR_SEARCH_TERMS = ('search_term', 'artist', 'genre', 'lyrics', 'years', 'start_index', 'limit', 'fields') # get_items() terms the mirror can answer
+
+#--------------------------------------------------
+# Mirror Management Functions
+#-------------------------
+
+def open_library_mirror(db_path: str, user_id: str, refresh_seconds: int = 900, rebuild_seconds: int = 86400) ->dict:
+    """
+    Open (creating if necessary) the on-disk library mirror.
+
+    Args:
+        db_path (str): The path of the SQLite file that holds the mirror.
+        user_id (str): The ID of the user whose view of the library is mirrored. A mirror built for another user is not ready.
+        refresh_seconds (int, optional): How often refresh_library_mirror() should be called to pick up changes.
+        rebuild_seconds (int, optional): How often the refresh should re-crawl everything to drop deleted items and playlists.
+
+    Returns:
+        dict: A dictionary with keys:
+        mirror (dict): The mirror handle to pass to the other mirror functions:
+            db_path (str): the path of the SQLite file
+            refresh_seconds (int): as supplied
+            rebuild_seconds (int): as supplied
+            ready (bool): True once the mirror has been fully built at least once
+            library_ids (set of str): the IDs of the mirrored libraries
+            generation (int): the number of the latest crawl, used to sweep out items and playlists that have gone
+            lock (obj): serialises refreshes of the mirror
+        success (bool): True if the request was successful, False otherwise.
+        error (str): An error message if the request failed, otherwise None.
+    """
+
+    try:
+        connection = sqlite3.connect(db_path, timeout=30)
+        with connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            connection.execute("CREATE TABLE IF NOT EXISTS items (library_id TEXT, item_id TEXT, sort_key TEXT, title_key TEXT, album_key TEXT, production_year INTEGER, lyrics_key TEXT, overview_key TEXT, item_json TEXT, generation INTEGER, PRIMARY KEY (library_id, item_id))")
+            if 'sort_key' not in [column[1] for column in connection.execute("PRAGMA table_info(items)")]:
+                # A mirror made before items kept their sort name, which must be crawled again to fill it in
+                connection.execute("ALTER TABLE items ADD COLUMN sort_key TEXT")
+                connection.execute("DELETE FROM meta WHERE key = 'built_at'")
+            connection.execute("CREATE INDEX IF NOT EXISTS items_by_sort_key ON items (library_id, sort_key, item_id)")
+            connection.execute("CREATE INDEX IF NOT EXISTS items_by_year ON items (library_id, production_year)")
+            connection.execute("CREATE TABLE IF NOT EXISTS item_artists (artist_key TEXT, library_id TEXT, item_id TEXT, PRIMARY KEY (artist_key, library_id, item_id)) WITHOUT ROWID")
+            connection.execute("CREATE INDEX IF NOT EXISTS item_artists_by_item ON item_artists (library_id, item_id)")
+            connection.execute("CREATE TABLE IF NOT EXISTS item_genres (genre_key TEXT, library_id TEXT, item_id TEXT, PRIMARY KEY (genre_key, library_id, item_id)) WITHOUT ROWID")
+            connection.execute("CREATE INDEX IF NOT EXISTS item_genres_by_item ON item_genres (library_id, item_id)")
+            connection.execute("CREATE TABLE IF NOT EXISTS genres (library_id TEXT, position INTEGER, name TEXT, PRIMARY KEY (library_id, position))")
+            connection.execute("CREATE TABLE IF NOT EXISTS playlists (playlist_id TEXT PRIMARY KEY, position INTEGER, playlist_json TEXT, generation INTEGER)")
+            connection.execute("CREATE TABLE IF NOT EXISTS playlist_items (playlist_id TEXT, position INTEGER, item_json TEXT, PRIMARY KEY (playlist_id, position))")
+        ready = _get_meta(connection, 'built_at') is not None and _get_meta(connection, 'user_id') == user_id
+        library_ids = set(json.loads(_get_meta(connection, 'library_ids') or '[]'))
+        generation = int(_get_meta(connection, 'generation') or 0)
+        connection.close()
+
+    except sqlite3.Error as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+    return {
+        'success': True,
+        'mirror': {
+            'db_path': db_path,
+            'refresh_seconds': refresh_seconds,
+            'rebuild_seconds': rebuild_seconds,
+            'ready': ready,
+            'library_ids': library_ids,
+            'generation': generation,
+            'lock': threading.Lock()
+        }
+    }
+
+#--------------------------------------------------
+
+def refresh_library_mirror(e_api_client: object, user_id: str, mirror: dict, rebuild: bool = False) ->dict:
+    """
+    Bring the library mirror up to date with the Emby server. The first call (and any call once rebuild_seconds
+    have passed since the last full build) crawls every library and playlist; other calls only read the items
+    and playlists that Emby has saved since the previous refresh. A library whose item count no longer matches
+    Emby's (because items were deleted) is re-crawled. Blocking - run it on a background thread.
+
+    Args:
+        e_api_client (obj): The authenticated API client.
+        user_id (str): The ID of the user whose view of the library is mirrored.
+        mirror (dict): The mirror returned by open_library_mirror().
+        rebuild (bool, optional): Force a full crawl.
+
+    Returns:
+        dict: A dictionary with keys:
+        item_count (int): the number of items read from Emby.
+        playlist_count (int): the number of playlists read from Emby.
+        full_build (bool): True if everything was crawled.
+        success (bool): True if the request was successful, False otherwise.
+        error (str): An error message if the request failed, otherwise None.
+    """
+
+    with mirror['lock']:
+        connection = sqlite3.connect(mirror['db_path'], timeout=30)
+        try:
+            now = datetime.now(timezone.utc)
+            built_at = _get_meta(connection, 'built_at')
+            refreshed_at = _get_meta(connection, 'refreshed_at')
+            if built_at is None or refreshed_at is None or _get_meta(connection, 'user_id') != user_id:
+                rebuild = True
+            elif now - datetime.fromisoformat(built_at) > timedelta(seconds=mirror['rebuild_seconds']):
+                rebuild = True
+            since = None if rebuild else (datetime.fromisoformat(refreshed_at) - timedelta(seconds=MIRROR_OVERLAP_SECONDS)).isoformat()
+            generation = int(_get_meta(connection, 'generation') or 0) + 1
+            mirror['generation'] = generation
+
+            library_list = get_library_list(e_api_client)
+            if not library_list['success']:
+                return library_list
+            available_libraries = library_list['items']
+
+            item_count = 0
+            for library in available_libraries:
+                if library['type'] == 'playlists':
+                    continue
+                result = _crawl_library(e_api_client, user_id, connection, library['id'], since, generation)
+                if result['success'] and since is not None and not result['in_step']:
+                    # Items have been deleted from this library, which deltas cannot see
+                    result = _crawl_library(e_api_client, user_id, connection, library['id'], None, generation)
+                if not result['success']:
+                    return result
+                item_count += result['item_count']
+
+                genre_list = get_genre_list(e_api_client, library_id=library['id'])
+                if not genre_list['success']:
+                    return genre_list
+                with connection:
+                    connection.execute("DELETE FROM genres WHERE library_id = ?", (library['id'],))
+                    connection.executemany("INSERT INTO genres (library_id, position, name) VALUES (?, ?, ?)", [(library['id'], position, name) for position, name in enumerate(genre_list['genres'])])
+
+            result = _crawl_playlists(e_api_client, user_id, connection, available_libraries, since, generation)
+            if not result['success']:
+                return result
+
+            with connection:
+                # Drop libraries that no longer exist
+                library_ids = [library['id'] for library in available_libraries if library['type'] != 'playlists']
+                for table in ('items', 'item_artists', 'item_genres', 'genres'):
+                    connection.execute(f"DELETE FROM {table} WHERE library_id NOT IN ({','.join('?' * len(library_ids))})", library_ids)
+                if rebuild:
+                    _set_meta(connection, 'built_at', now.isoformat())
+                    _set_meta(connection, 'user_id', user_id)
+                _set_meta(connection, 'generation', str(generation))
+                _set_meta(connection, 'refreshed_at', now.isoformat())
+                _set_meta(connection, 'library_ids', json.dumps(library_ids))
+            mirror['library_ids'] = set(library_ids)
+            mirror['ready'] = True
+
+            return {
+                'success': True,
+                'item_count': item_count,
+                'playlist_count': result['playlist_count'],
+                'full_build': rebuild
+            }
+
+        except sqlite3.Error as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        finally:
+            connection.close()
+
+#--------------------------------------------------
+
+def refresh_mirror_playlist(e_api_client: object, user_id: str, available_libraries: list, mirror: dict, playlist_id: str) ->dict:
+    """
+    Re-read one playlist and its items from Emby into the mirror, or remove it from the mirror if it no longer exists.
+    Call this after changing a playlist so that the mirror does not return stale answers. This does not wait for
+    a refresh that is in progress, so that tools are not held up by a long crawl.
+
+    Args:
+        e_api_client (obj): The authenticated API client.
+        user_id (str): The ID of the user whose view of the library is mirrored.
+        available_libraries (list of dict): list returned by get_library_list() that contains 'playlists' libraries.
+        mirror (dict): The mirror returned by open_library_mirror().
+        playlist_id (str): The ID of the playlist that has changed.
+
+    Returns:
+        dict: A dictionary with keys:
+        success (bool): True if the request was successful, False otherwise.
+        error (str): An error message if the request failed, otherwise None.
+    """
+
+    connection = sqlite3.connect(mirror['db_path'], timeout=30)
+    try:
+        playlist_list = get_playlists(e_api_client, user_id, available_libraries, playlist_id)
+        if not playlist_list['success']:
+            return playlist_list
+        if len(playlist_list['playlists']) == 0:
+            with connection:
+                connection.execute("DELETE FROM playlists WHERE playlist_id = ?", (playlist_id,))
+                connection.execute("DELETE FROM playlist_items WHERE playlist_id = ?", (playlist_id,))
+            return {
+                'success': True
+            }
+        # Stored with the generation of any crawl in progress, so that the crawl does not sweep it out
+        return _store_playlists(e_api_client, user_id, connection, playlist_list['playlists'], mirror['generation'])
+
+    except sqlite3.Error as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+    finally:
+        connection.close()
+
+#--------------------------------------------------
+# Query Functions
+#-------------------------
+
+def mirror_can_search(mirror: Optional[dict], library_id: str, query: dict) ->bool:
+    """
+    Return True if the mirror is ready and can answer a get_items() query of this library with these search terms.
+    """
+
+    if mirror is None or not mirror['ready']:
+        return False
+    if library_id != "" and library_id not in mirror['library_ids']:
+        return False
+    return all(key in MIRROR_SEARCH_TERMS for key in query)
+
+#--------------------------------------------------
+
+def search_mirror_items(mirror: dict, library_id: str = "", **kwargs: Unpack[getitems_kwargs]) ->dict:
+    """
+    Get a list of media items from the mirror, filtered by library and search query terms, matching items
+    in the same way and in the same order as get_items() does against Emby.
+    Only the search terms listed in MIRROR_SEARCH_TERMS are supported; check with mirror_can_search() first.
+
+    Args:
+        mirror (dict): The mirror returned by open_library_mirror().
+        library_id (str, optional): The ID of the library to search. If empty, searches all libraries.
+        **kwargs: search query terms as accepted by get_items().
+
+    Returns:
+        dict: A dictionary with keys:
+        total_count (int): the total number of items matching the criteria, regardless of start_index and limit.
+        items (list of dict): A list of items that match the criteria, as returned by get_items().
+        success (bool): True if the request was successful, False otherwise.
+        error (str): An error message if the request failed, otherwise None.
+    """
+
+    field_keys = resolve_item_fields(kwargs.get('fields') or "full")
+    if not field_keys['success']:
+        return field_keys
+    field_keys = field_keys['keys']
+
+    where = []
+    params = []
+    if library_id != "":
+        where.append("items.library_id = ?")
+        params.append(library_id)
+    for key in kwargs:
+        if kwargs[key] is None or kwargs[key] == "":
+            continue
+        match key:
+            case "search_term":
+                search_key = normalise_lyrics_text(kwargs[key])
+                where.append("(instr(title_key, ?) > 0 OR instr(album_key, ?) > 0)")
+                params += [search_key, search_key]
+            case "artist":
+                # Emby accepts several artists separated by '|'
+                artist_keys = [artist.strip().casefold() for artist in kwargs[key].split('|')]
+                where.append(f"EXISTS (SELECT 1 FROM item_artists WHERE item_artists.library_id = items.library_id AND item_artists.item_id = items.item_id AND artist_key IN ({','.join('?' * len(artist_keys))}))")
+                params += artist_keys
+            case "genre":
+                genre_keys = [genre.strip().casefold() for genre in kwargs[key].split('|')]
+                where.append(f"EXISTS (SELECT 1 FROM item_genres WHERE item_genres.library_id = items.library_id AND item_genres.item_id = items.item_id AND genre_key IN ({','.join('?' * len(genre_keys))}))")
+                params += genre_keys
+            case "lyrics":
+                lyrics_key = normalise_lyrics_text(kwargs[key])
+                where.append("(instr(lyrics_key, ?) > 0 OR instr(overview_key, ?) > 0)")
+                params += [lyrics_key, lyrics_key]
+            case "years":
+                years = [int(year) for year in str(kwargs[key]).split(',') if year.strip().isdigit()]
+                where.append(f"production_year IN ({','.join('?' * len(years))})")
+                params += years
+    where_clause = f"WHERE {' AND '.join(where)}" if len(where) > 0 else ""
+
+    start_index = int(kwargs.get('start_index') or 0)
+    limit = int(kwargs['limit']) if kwargs.get('limit') not in (None, "") else -1
+
+    connection = sqlite3.connect(mirror['db_path'], timeout=30)
+    try:
+        total_count = connection.execute(f"SELECT COUNT(*) FROM items {where_clause}", params).fetchone()[0]
+        rows = connection.execute(f"SELECT item_json FROM items {where_clause} ORDER BY sort_key, item_id, library_id LIMIT ? OFFSET ?", params + [limit, start_index]).fetchall()
+        return {
+            'success': True,
+            'total_count': total_count,
+            'items': project_items([json.loads(row[0]) for row in rows], field_keys)
+        }
+
+    except sqlite3.Error as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+    finally:
+        connection.close()
+
+#--------------------------------------------------
+
+def get_mirror_genres(mirror: dict, library_id: str) ->dict:
+    """
+    Get the list of genres available in the given library from the mirror, as returned by get_genre_list().
+    Fails if the library is not in the mirror, so that the caller can ask Emby instead.
+
+    Args:
+        mirror (dict): The mirror returned by open_library_mirror().
+        library_id (str): The ID of the library.
+
+    Returns:
+        dict: A dictionary with keys:
+        genres (list): A simple list of genre names (strings) if successful.
+        success (bool): True if the request was successful, False otherwise.
+        error (str): An error message if the request failed, otherwise None.
+    """
+
+    if library_id not in mirror['library_ids']:
+        return {
+            'success': False,
+            'error': f"Library {library_id} is not in the library mirror."
+        }
+
+    connection = sqlite3.connect(mirror['db_path'], timeout=30)
+    try:
+        rows = connection.execute("SELECT name FROM genres WHERE library_id = ? ORDER BY position", (library_id,)).fetchall()
+        return {
+            'success': True,
+            'genres': [row[0] for row in rows]
+        }
+
+    except sqlite3.Error as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+    finally:
+        connection.close()
+
+#--------------------------------------------------
+
+def get_mirror_playlists(mirror: dict, playlist_id: Optional[str] = "") ->dict:
+    """
+    Get the list of playlists from the mirror, as returned by get_playlists().
+
+    Args:
+        mirror (dict): The mirror returned by open_library_mirror().
+        playlist_id (str, optional): if supplied, only return information about this playlist
+
+    Returns:
+        dict: A dictionary with keys:
+        playlists (list of dict): A list of playlists, as returned by get_playlists().
+        success (bool): True if the request was successful, False otherwise.
+        error (str): An error message if the request failed, otherwise None.
+    """
+
+    connection = sqlite3.connect(mirror['db_path'], timeout=30)
+    try:
+        if playlist_id is not None and playlist_id != "":
+            rows = connection.execute("SELECT playlist_json FROM playlists WHERE playlist_id = ?", (playlist_id,)).fetchall()
+        else:
+            rows = connection.execute("SELECT playlist_json FROM playlists ORDER BY position").fetchall()
+        return {
+            'success': True,
+            'playlists': [json.loads(row[0]) for row in rows]
+        }
+
+    except sqlite3.Error as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+    finally:
+        connection.close()
+
+#--------------------------------------------------
+
+def get_mirror_playlist_items(mirror: dict, playlist_id: str, fields: Optional[str] = "full") ->dict:
+    """
+    Get the list of media items on a playlist from the mirror, as returned by get_playlist_items().
+    Fails if the playlist is not in the mirror, so that the caller can ask Emby instead.
+
+    Args:
+        mirror (dict): The mirror returned by open_library_mirror().
+        playlist_id (str): The ID of the playlist.
+        fields (str, optional): Which keys to return for each item, as accepted by get_playlist_items().
+
+    Returns:
+        dict: A dictionary with keys:
+        total_count (int): the number of items on the playlist.
+        items (list): An ordered list of items on the playlist, as returned by get_playlist_items().
+        success (bool): True if the request was successful, False otherwise.
+        error (str): An error message if the request failed, otherwise None.
+    """
+
+    field_keys = resolve_item_fields(fields)
+    if not field_keys['success']:
+        return field_keys
+    field_keys = field_keys['keys']
+
+    connection = sqlite3.connect(mirror['db_path'], timeout=30)
+    try:
+        if connection.execute("SELECT 1 FROM playlists WHERE playlist_id = ?", (playlist_id,)).fetchone() is None:
+            return {
+                'success': False,
+                'error': f"Playlist {playlist_id} is not in the library mirror."
+            }
+        rows = connection.execute("SELECT item_json FROM playlist_items WHERE playlist_id = ? ORDER BY position", (playlist_id,)).fetchall()
+        return {
+            'success': True,
+            'total_count': len(rows),
+            'items': project_items([json.loads(row[0]) for row in rows], field_keys, PLAYLIST_ENTRY_KEYS)
+        }
+
+    except sqlite3.Error as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+    finally:
+        connection.close()
+
+#--------------------------------------------------
+# Internal Helpers
+#-------------------------
+
+def _crawl_library(e_api_client: object, user_id: str, connection: object, library_id: str, since: Optional[str], generation: int) ->dict:
+    """
+    Read the items of one library into the mirror, a page at a time. If since is None then every item is read
+    and any mirrored item not seen is removed, otherwise only items saved since then are read.
+    Returns 'in_step' False if the mirror and Emby disagree on the number of items in the library afterwards.
+    """
+
+    query = {}
+    if since is not None:
+        query['min_date_last_saved'] = since
+
+    item_count = 0
+    start_index = 0
+    library_total = None
+    while True:
+        # Read the items as get_items() returns them, along with the sort name that orders them
+        column_batches = get_item_columns(e_api_client, user_id, library_id, ITEM_FIELD_KEYS + ['sort_name'], start_index=start_index, limit=MIRROR_PAGE_SIZE, **query)
+        if not column_batches['success']:
+            return column_batches
+        page_count = 0
+        try:
+            for columns in column_batches['batches']:
+                with connection:
+                    for item, sort_name in zip(iter_item_rows(columns, ITEM_FIELD_KEYS), columns['sort_name']):
+                        _store_item(connection, library_id, item, sort_name, generation)
+                page_count += len(columns['item_id'])
+        except ApiException as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+        total_count = column_batches['totals'].get('TotalRecordCount') or 0
+        item_count += page_count
+        start_index += MIRROR_PAGE_SIZE
+        if since is None:
+            library_total = total_count
+        if page_count == 0 or start_index >= total_count:
+            break
+
+    if since is None:
+        with connection:
+            for table in ('item_artists', 'item_genres'):
+                connection.execute(f"DELETE FROM {table} WHERE library_id = ? AND item_id IN (SELECT item_id FROM items WHERE library_id = ? AND generation < ?)", (library_id, library_id, generation))
+            connection.execute("DELETE FROM items WHERE library_id = ? AND generation < ?", (library_id, generation))
+    else:
+        # Only the total is needed, so ask for as little as possible
+        item_list = get_items(e_api_client, user_id, library_id=library_id, start_index=0, limit=1)
+        if not item_list['success']:
+            return item_list
+        library_total = item_list['total_count']
+    mirrored_total = connection.execute("SELECT COUNT(*) FROM items WHERE library_id = ?", (library_id,)).fetchone()[0]
+
+    return {
+        'success': True,
+        'item_count': item_count,
+        'in_step': mirrored_total == library_total
+    }
+
+#--------------------------------------------------
+
+def _crawl_playlists(e_api_client: object, user_id: str, connection: object, available_libraries: list, since: Optional[str], generation: int) ->dict:
+    """
+    Read the playlists and their items into the mirror. If since is None then every playlist is read and
+    any mirrored playlist not seen is removed, otherwise only playlists saved since then are read.
+    """
+
+    if not any(library['type'] == 'playlists' for library in available_libraries):
+        with connection:
+            connection.execute("DELETE FROM playlists")
+            connection.execute("DELETE FROM playlist_items")
+        return {
+            'success': True,
+            'playlist_count': 0
+        }
+
+    playlist_list = get_playlists(e_api_client, user_id, available_libraries, min_date_last_saved=since)
+    if not playlist_list['success']:
+        return playlist_list
+    result = _store_playlists(e_api_client, user_id, connection, playlist_list['playlists'], generation, renumber=since is None)
+    if not result['success']:
+        return result
+
+    if since is None:
+        with connection:
+            connection.execute("DELETE FROM playlist_items WHERE playlist_id IN (SELECT playlist_id FROM playlists WHERE generation < ?)", (generation,))
+            connection.execute("DELETE FROM playlists WHERE generation < ?", (generation,))
+
+    return {
+        'success': True,
+        'playlist_count': len(playlist_list['playlists'])
+    }
+
+#--------------------------------------------------
+
+def _store_playlists(e_api_client: object, user_id: str, connection: object, playlists: list, generation: int, renumber: bool = False) ->dict:
+    """
+    Store playlists as returned by get_playlists(), together with their items. New playlists go at the end of
+    the playlist order unless renumber is True, when the order is taken from the supplied list.
+    """
+
+    next_position = connection.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM playlists").fetchone()[0]
+    for index, playlist in enumerate(playlists):
+        playlist_items = get_playlist_items(e_api_client, user_id, playlist['playlist_id'])
+        if not playlist_items['success']:
+            return playlist_items
+        if renumber:
+            position = index
+        else:
+            row = connection.execute("SELECT position FROM playlists WHERE playlist_id = ?", (playlist['playlist_id'],)).fetchone()
+            position = row[0] if row is not None else next_position
+            if position == next_position:
+                next_position += 1
+        with connection:
+            connection.execute("INSERT OR REPLACE INTO playlists (playlist_id, position, playlist_json, generation) VALUES (?, ?, ?, ?)", (playlist['playlist_id'], position, json.dumps(playlist), generation))
+            connection.execute("DELETE FROM playlist_items WHERE playlist_id = ?", (playlist['playlist_id'],))
+            connection.executemany("INSERT INTO playlist_items (playlist_id, position, item_json) VALUES (?, ?, ?)", [(playlist['playlist_id'], entry_index, json.dumps(item)) for entry_index, item in enumerate(playlist_items['items'])])
+
+    return {
+        'success': True
+    }
+
+#--------------------------------------------------
+
+def _store_item(connection: object, library_id: str, item: dict, sort_name: str, generation: int) ->None:
+    """
+    Add or replace one item, as returned by get_items(), in the mirror, with Emby's sort name for it.
+    """
+
+    item_id = item['item_id']
+    production_year = item['production_year'] if item['production_year'] != "" else None
+    connection.execute("INSERT OR REPLACE INTO items (library_id, item_id, sort_key, title_key, album_key, production_year, lyrics_key, overview_key, item_json, generation) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                       (library_id, item_id, sort_name, normalise_lyrics_text(item['title']), normalise_lyrics_text(item['album']), production_year,
+                        normalise_lyrics_text(item['lyrics']), normalise_lyrics_text(item['overview']), json.dumps(item), generation))
+    connection.execute("DELETE FROM item_artists WHERE library_id = ? AND item_id = ?", (library_id, item_id))
+    connection.executemany("INSERT OR IGNORE INTO item_artists (artist_key, library_id, item_id) VALUES (?, ?, ?)", [(artist.casefold(), library_id, item_id) for artist in item['artists']])
+    connection.execute("DELETE FROM item_genres WHERE library_id = ? AND item_id = ?", (library_id, item_id))
+    connection.executemany("INSERT OR IGNORE INTO item_genres (genre_key, library_id, item_id) VALUES (?, ?, ?)", [(genre.casefold(), library_id, item_id) for genre in item['genres']])
+
+#--------------------------------------------------
+
+def _get_meta(connection: object, key: str):
+    row = connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+def _set_meta(connection: object, key: str, value: str) ->None:
+    connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+#--------------------------------------------------
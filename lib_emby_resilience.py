@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+"""
+Model Context Protocol (MCP) server that connects an Emby media server to an AI client such as Claude Desktop.
+See emby_mcp_server.py for details.
+
+Copyright (C) 2025 Dominic Search <code@angeltek.co.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+#==================================================
+# Functions for Retrying, Hedging and Circuit Breaking Emby Requests
+#==================================================
+
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+import functools
+import random
+import threading
+import time
+import urllib3
+from emby_client.rest import ApiException
+
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS') # Emby's POSTs and DELETEs change things, e.g. add items to a playlist
+RETRY_STATUSES = (0, 408, 429, 502, 503, 504) # 0 is a timeout or failed connection, see lib_emby_transport.py
+BREAKER_STATUSES = (0, 502, 503, 504) # responses that suggest the Emby server is down rather than the request is wrong
+
+#--------------------------------------------------
+# Resilience Policy Functions
+#-------------------------
+
+# Every request to Emby goes through the shared REST client of the API client logged in as the .env user (pooled
+# user clients share it too), so the policy is applied there, below the SDK and above urllib3:
+#  - Requests that fail with a timeout, a failed connection or a busy / unavailable server are retried after a
+#    jittered exponential backoff. Requests that change things (POST, DELETE) are only retried if they cannot have
+#    reached Emby, because no connection was made, so that e.g. items are never added to a playlist twice.
+#  - Optionally, a read that has not been answered within hedge_after seconds is sent again on another connection,
+#    and whichever answer arrives first is used. Streamed queries without a Limit are never hedged, as they are slow
+#    because they are big rather than because a request was unlucky, and repeating them would double Emby's work.
+#  - A circuit breaker counts consecutive failures that suggest Emby is down. Once there are breaker_failures of
+#    them, requests fail at once without waiting for a timeout, until breaker_cooldown seconds have passed. Then
+#    a single trial request is let through, closing the breaker if it succeeds or opening it again if it fails.
+
+def new_resilience_policy(retries: int = 2, backoff_seconds: float = 0.2, backoff_max_seconds: float = 5, hedge_after: float = 0,
+                          breaker_failures: int = 5, breaker_cooldown: float = 30, max_hedges: int = 4) ->dict:
+    """
+    Create a resilience policy for requests to Emby, for install_emby_resilience().
+
+    Args:
+        retries (int, optional): The most times to retry a failed request, or 0 never to retry.
+        backoff_seconds (float, optional): The average wait before the first retry, doubling for each further retry.
+        backoff_max_seconds (float, optional): The longest wait before a retry.
+        hedge_after (float, optional): Seconds after which an unanswered read is sent again, or 0 never to hedge.
+        breaker_failures (int, optional): Consecutive failures after which requests fail at once, or 0 for no circuit breaker.
+        breaker_cooldown (float, optional): Seconds for which requests fail at once before a trial request is let through.
+        max_hedges (int, optional): The most hedged requests in flight at once, so that hedging cannot swamp a slow server.
+
+    Returns:
+        dict: The policy, with the keys above and:
+        breaker_state (str): 'closed' (requests go through), 'open' (requests fail at once) or 'half-open' (one trial request is in flight)
+        consecutive_failures (int): The number of failures since the last success
+        opened_at (float): When the breaker last opened
+        counts (dict): The number of requests, retries, hedges, hedge_wins (hedges answered first), fast_failures (requests failed by the open breaker) and breaker_opened
+        hedges_in_flight (int): The number of hedged requests in flight
+        hedge_executor (obj): The max_hedges threads on which hedges are sent, or None if not hedging
+        lock (obj): serialises access to the breaker and counts
+    """
+
+    return {
+        'retries': retries,
+        'backoff_seconds': backoff_seconds,
+        'backoff_max_seconds': backoff_max_seconds,
+        'hedge_after': hedge_after,
+        'breaker_failures': breaker_failures,
+        'breaker_cooldown': breaker_cooldown,
+        'max_hedges': max_hedges,
+        'breaker_state': 'closed',
+        'consecutive_failures': 0,
+        'opened_at': 0.0,
+        'counts': {'requests': 0, 'retries': 0, 'hedges': 0, 'hedge_wins': 0, 'fast_failures': 0, 'breaker_opened': 0},
+        'hedges_in_flight': 0,
+        'hedge_executor': ThreadPoolExecutor(max_workers=max(1, max_hedges), thread_name_prefix="emby-hedge") if hedge_after > 0 else None,
+        'lock': threading.Lock()
+    }
+
+#--------------------------------------------------
+
+def install_emby_resilience(e_api_client: object, policy: dict) ->None:
+    """
+    Apply a resilience policy to every request made through an API client's REST client, including by clients that share
+    it (see PooledApiClient). urllib3's own retries are turned off, so that requests are not retried twice over.
+    Call after configure_emby_transport().
+
+    Args:
+        e_api_client (obj): The API client.
+        policy (dict): The policy from new_resilience_policy().
+
+    Returns:
+        None
+    """
+
+    rest_client = e_api_client.rest_client
+    rest_client.request = functools.partial(resilient_request, policy, rest_client.request)
+    rest_client.pool_manager.default_retries = urllib3.Retry(total=None, connect=0, read=0, status=0, other=0, redirect=5)
+
+#--------------------------------------------------
+
+def uninstall_emby_resilience(e_api_client: object, policy: dict) ->None:
+    """
+    Stop applying a resilience policy to an API client, and stop its hedging threads.
+    """
+
+    rest_client = e_api_client.rest_client
+    if 'request' in vars(rest_client):
+        del rest_client.request
+    if policy['hedge_executor'] is not None:
+        policy['hedge_executor'].shutdown(wait=False, cancel_futures=True)
+
+#--------------------------------------------------
+
+def resilient_request(policy: dict, request: callable, method: str, url: str, *args, **kwargs) ->object:
+    """
+    Send a request through the SDK's REST client request function, retrying, hedging and failing fast as the policy says.
+    Takes the same arguments and returns the same response as RESTClientObject.request().
+
+    Raises:
+        ApiException: as RESTClientObject.request() does, once the retries are used up, or at once if the breaker is open.
+    """
+
+    idempotent = method in IDEMPOTENT_METHODS
+    hedge = idempotent and policy['hedge_executor'] is not None and (kwargs.get('_preload_content', True) or _has_limit(kwargs.get('query_params')))
+    attempt = 0
+    while True:
+        _breaker_admit(policy)
+        try:
+            if hedge:
+                response = _hedged_request(policy, request, method, url, args, kwargs)
+            else:
+                response = request(method, url, *args, **kwargs)
+            _breaker_record(policy, True)
+            return response
+
+        except ApiException as e:
+            _breaker_record(policy, e.status not in BREAKER_STATUSES)
+            retryable = e.status in RETRY_STATUSES and (idempotent or getattr(e, 'not_sent', False))
+            if not retryable or attempt >= policy['retries'] or policy['breaker_state'] == 'open':
+                raise
+            attempt += 1
+            with policy['lock']:
+                policy['counts']['retries'] += 1
+            time.sleep(_backoff_seconds(policy, attempt, e))
+
+#--------------------------------------------------
+
+def get_resilience_summary(policy: dict) ->dict:
+    """
+    Summarise a resilience policy and what it has done, for diagnostics.
+
+    Args:
+        policy (dict): The policy from new_resilience_policy().
+
+    Returns:
+        dict: A dictionary with keys:
+        retries, backoff_seconds, hedge_after, breaker_failures, breaker_cooldown (as the policy)
+        breaker_state (str): 'closed', 'open' or 'half-open'
+        consecutive_failures (int): The number of failures since the last success
+        counts (dict): The number of requests, retries, hedges, hedge_wins, fast_failures and breaker_opened so far
+    """
+
+    with policy['lock']:
+        return {
+            'retries': policy['retries'],
+            'backoff_seconds': policy['backoff_seconds'],
+            'hedge_after': policy['hedge_after'],
+            'breaker_failures': policy['breaker_failures'],
+            'breaker_cooldown': policy['breaker_cooldown'],
+            'breaker_state': policy['breaker_state'],
+            'consecutive_failures': policy['consecutive_failures'],
+            'counts': dict(policy['counts'])
+        }
+
+#--------------------------------------------------
+
+def _breaker_admit(policy: dict) ->None:
+    """
+    Count a request and let it through, or raise ApiException (status 0) at once if the breaker is open.
+    Once the cooldown has passed, a single trial request is let through and the breaker is half-open until it completes.
+    """
+
+    with policy['lock']:
+        policy['counts']['requests'] += 1
+        if policy['breaker_state'] == 'closed':
+            return
+        waited = time.monotonic() - policy['opened_at']
+        if policy['breaker_state'] == 'open' and waited >= policy['breaker_cooldown']:
+            policy['breaker_state'] = 'half-open'
+            return
+        policy['counts']['fast_failures'] += 1
+        retry_in = max(0, round(policy['breaker_cooldown'] - waited))
+    raise ApiException(status=0, reason=f"the media server is not responding after {policy['consecutive_failures']} failed requests, so requests are paused for {retry_in} more seconds")
+
+#--------------------------------------------------
+
+def _breaker_record(policy: dict, success: bool) ->None:
+    """
+    Record the outcome of a request, closing the breaker on success and opening it after too many consecutive failures.
+    """
+
+    with policy['lock']:
+        if success:
+            policy['consecutive_failures'] = 0
+            policy['breaker_state'] = 'closed'
+            return
+        policy['consecutive_failures'] += 1
+        if policy['breaker_failures'] > 0 and (policy['breaker_state'] == 'half-open' or policy['consecutive_failures'] >= policy['breaker_failures']):
+            if policy['breaker_state'] != 'open':
+                policy['counts']['breaker_opened'] += 1
+            policy['breaker_state'] = 'open'
+            policy['opened_at'] = time.monotonic()
+
+#--------------------------------------------------
+
+def _backoff_seconds(policy: dict, attempt: int, error: ApiException) ->float:
+    """
+    How long to wait before retry number attempt: a random time up to twice the exponential backoff (so that clients that
+    failed together do not retry together), or what Emby asked for in a Retry-After header if that is longer, within the maximum.
+    """
+
+    backoff = random.uniform(0, 2 * policy['backoff_seconds'] * 2 ** (attempt - 1))
+    retry_after = error.headers.get('Retry-After') if error.headers else None
+    if retry_after is not None and retry_after.strip().isdigit():
+        backoff = max(backoff, float(retry_after))
+    return min(backoff, policy['backoff_max_seconds'])
+
+#--------------------------------------------------
+
+def _hedged_request(policy: dict, request: callable, method: str, url: str, args: tuple, kwargs: dict) ->object:
+    """
+    Send a request, and if it has not been answered within the policy's hedge_after seconds send it again,
+    returning whichever answer arrives first (or the error of the second to fail, if both fail).
+    """
+
+    # The first attempt gets a thread of its own, so that it starts at once however many requests are in flight and the
+    # hedge_after timer only counts time spent waiting for Emby. Only the hedges share the bounded executor.
+    first = _start_request(request, method, url, args, kwargs)
+    try:
+        return first.result(timeout=policy['hedge_after'])
+    except FuturesTimeoutError:
+        pass
+
+    with policy['lock']:
+        if policy['hedges_in_flight'] >= policy['max_hedges']:
+            hedging = False
+        else:
+            hedging = True
+            policy['hedges_in_flight'] += 1
+            policy['counts']['hedges'] += 1
+    if not hedging:
+        return first.result()
+
+    try:
+        second = policy['hedge_executor'].submit(request, method, url, *args, **kwargs)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.add_done_callback(_discard_response)
+                    if future is second:
+                        with policy['lock']:
+                            policy['counts']['hedge_wins'] += 1
+                    return future.result()
+                error = future.exception()
+        raise error
+    finally:
+        with policy['lock']:
+            policy['hedges_in_flight'] -= 1
+
+#--------------------------------------------------
+
+def _start_request(request: callable, method: str, url: str, args: tuple, kwargs: dict) ->Future:
+    """
+    Send a request on a new thread, returning a future for its response.
+    """
+
+    future = Future()
+
+    def run() ->None:
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(request(method, url, *args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name="emby-request", daemon=True).start()
+    return future
+
+#--------------------------------------------------
+
+def _discard_response(future: object) ->None:
+    """
+    Close the connection of the slower response to a hedged request, if its body has not been read.
+    """
+
+    if future.exception() is None:
+        response = future.result()
+        if isinstance(response, urllib3.BaseHTTPResponse):
+            response.close()
+
+#--------------------------------------------------
+
+def _has_limit(query_params: object) ->bool:
+    """
+    True if a request's query parameters (a list of name, value pairs) include a Limit.
+    """
+
+    return query_params is not None and any(name == 'Limit' for name, value in query_params)
+
+#--------------------------------------------------
@@ -0,0 +1,393 @@
+# -*- coding: utf-8 -*-
+"""
+Model Context Protocol (MCP) server that connects an Emby media server to an AI client such as Claude Desktop.
+See emby_mcp_server.py for details.
+
+Copyright (C) 2025 Dominic Search <code@angeltek.co.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+#==================================================
+# Functions for Chunked Searching of Emby Media Items
+#==================================================
+
+from collections import OrderedDict
+from typing import Optional, Unpack
+import json
+import threading
+import time
+import uuid
+from lib_emby_functions import get_items, getitems_kwargs
+from lib_emby_mirror import mirror_can_search, search_mirror_items
+
+SEARCH_PAGE_SIZE = 100 # items fetched per request when a paged search has a byte budget but no item limit
+
+#--------------------------------------------------
+# Search Cursor Functions
+#-------------------------
+
+def start_item_search(e_api_client: object, user_id: str, library_id: str, max_chunk_size: int, lyrics_index: Optional[dict] = None, mirror: Optional[dict] = None, max_chunk_bytes: Optional[int] = 0, **kwargs: Unpack[getitems_kwargs]) ->dict:
+    """
+    Start a new search for media items and return its first chunk, together with a cursor that
+    next_search_chunk() uses to return the following chunks.
+
+    Each chunk holds at most max_chunk_size items, and its JSON (as returned to the MCP client) is at most
+    max_chunk_bytes long, so chunks of items with little metadata hold more items than chunks of items with
+    long lyrics. Whichever limit is reached first ends the chunk. A single item bigger than max_chunk_bytes
+    is returned in a chunk on its own.
+
+    Where Emby can apply all of the search criteria itself, only the first chunk is fetched now
+    and each following chunk is fetched on demand using Emby's StartIndex/Limit paging, so that
+    time and memory are bounded by the chunk limits rather than by the number of matching items.
+    Lyrics searches are filtered locally, so they fetch all matching items up front and the cursor
+    holds the filtered items for slicing into chunks.
+    If a ready library mirror can answer the search then every chunk is read from the mirror instead of Emby
+    (including lyrics searches, which the mirror can page through).
+    Every chunk returned is kept in the cursor, so that it can be returned again without asking Emby.
+
+    Args:
+        e_api_client (obj): The authenticated API client.
+        user_id (str): The ID of the user doing the search.
+        library_id (str): The ID of the library to search, or empty to search all libraries.
+        max_chunk_size (int): The maximum number of items per chunk, or 0 for no limit.
+        lyrics_index (dict, optional): The index returned by open_lyrics_index(), used to speed up lyrics searches.
+        mirror (dict, optional): The mirror returned by open_library_mirror(), used instead of Emby where it can answer the search.
+        max_chunk_bytes (int, optional): The maximum length of each chunk's JSON, or 0 for no limit.
+        **kwargs: search query terms as accepted by get_items().
+
+    Returns:
+        dict: A dictionary with keys:
+        cursor (dict): The search state to pass to next_search_chunk():
+            search_id (str): The unique ID of the search
+            library_id (str): The ID of the library being searched
+            query (dict): The get_items() query terms
+            mirror (dict): The library mirror answering the search, or None if Emby is answering it
+            paged (bool): True if chunks are fetched from Emby on demand
+            items (list of dict): All of the search items if not paged, otherwise None
+            pending (list of dict): Items fetched for a paged search but left out of the last chunk by the byte limit
+            total_number_of_items (int): Total number of items in the search
+            chunk_size (int): The maximum number of items per chunk, or 0 for no limit
+            chunk_bytes (int): The maximum length of each chunk's JSON, or 0 for no limit
+            chunk_number (int): The number of chunks returned so far
+            chunk_offsets (list of int): The index of the first item of each chunk returned so far
+            chunks (list of list): The items of each chunk returned so far
+            next_index (int): The index of the first item of the next chunk
+            more_chunks_available (bool): False if the last chunk has been returned
+            held_bytes (int): The approximate JSON size of the items held by the cursor
+            last_used (float): When the cursor was last used, as time.monotonic()
+            lock (obj): serialises use of the cursor by concurrent tool calls
+        chunk (dict): The first chunk, as returned by next_search_chunk()
+        success (bool): True if the request was successful, False otherwise.
+        error (str): An error message if the request failed, otherwise None.
+    """
+
+    query = {key: value for key, value in kwargs.items() if value is not None and value != ""}
+    if not mirror_can_search(mirror, library_id, query):
+        mirror = None
+    chunk_size = max_chunk_size if max_chunk_size is not None and max_chunk_size > 0 else 0
+    chunk_bytes = max_chunk_bytes if max_chunk_bytes is not None and max_chunk_bytes > 0 else 0
+    paged = (chunk_size > 0 or chunk_bytes > 0) and (query.get('lyrics', "") == "" or mirror is not None)
+    cursor = {
+        'search_id': str(uuid.uuid4()),
+        'library_id': library_id,
+        'query': query,
+        'mirror': mirror,
+        'paged': paged,
+        'items': None,
+        'pending': [],
+        'total_number_of_items': None, # not known until the first page is fetched
+        'chunk_size': chunk_size,
+        'chunk_bytes': chunk_bytes,
+        'chunk_number': 0,
+        'chunk_offsets': [],
+        'chunks': [],
+        'next_index': 0,
+        'more_chunks_available': True,
+        'held_bytes': 0,
+        'last_used': time.monotonic(),
+        'lock': threading.Lock()
+    }
+
+    if not paged:
+        if mirror is not None:
+            item_list = search_mirror_items(mirror, library_id=library_id, **query)
+        else:
+            item_list = get_items(e_api_client, user_id, library_id=library_id, lyrics_index=lyrics_index, **query)
+        if not item_list['success']:
+            return item_list
+        cursor['items'] = item_list['items']
+        cursor['total_number_of_items'] = len(item_list['items'])
+        cursor['held_bytes'] = len(json.dumps(item_list['items']))
+
+    chunk = _next_chunk(e_api_client, user_id, cursor)
+    if not chunk['success']:
+        return chunk
+
+    return {
+        'success': True,
+        'cursor': cursor,
+        'chunk': chunk['chunk']
+    }
+
+#--------------------------------------------------
+
+def next_search_chunk(e_api_client: object, user_id: str, cursor: dict, chunk_number: Optional[int] = 0) ->dict:
+    """
+    Return the next chunk of a search started by start_item_search(), and advance the cursor.
+    Alternatively return a given chunk: chunks that have already been returned are returned again from the cursor,
+    without asking Emby, and later chunks are fetched in turn up to the one asked for.
+
+    Args:
+        e_api_client (obj): The authenticated API client.
+        user_id (str): The ID of the user doing the search.
+        cursor (dict): The search cursor returned by start_item_search(). Updated in place.
+        chunk_number (int, optional): The chunk to return (one-based), or 0 for the next chunk.
+
+    Returns:
+        dict: A dictionary with keys:
+        chunk (dict): The chunk of search results:
+            search_id (str): The unique ID of the search
+            total_number_of_items (int): Total number of items in the search
+            chunk_size (int): the number of items in this chunk
+            chunk_number (int): this chunk number (one-based)
+            more_chunks_available (bool): False if this is the last chunk, otherwise True.
+            items (list of dict): the items in this chunk, as returned by get_items()
+        success (bool): True if the request was successful, False otherwise.
+        error (str): An error message if the request failed, otherwise None.
+    """
+
+    with cursor['lock']:
+        if chunk_number is not None and 0 < chunk_number <= cursor['chunk_number']:
+            return {
+                'success': True,
+                'chunk': _make_search_chunk(cursor, chunk_number)
+            }
+
+        while cursor['more_chunks_available']:
+            result = _next_chunk(e_api_client, user_id, cursor)
+            if not result['success'] or chunk_number is None or chunk_number <= cursor['chunk_number']:
+                return result
+
+        # Running past the last chunk is a soft error, so return what we know
+        return {
+            'success': True,
+            'chunk': {
+                'search_id': cursor['search_id'],
+                'total_number_of_items': cursor['total_number_of_items'],
+                'chunk_size': 0,
+                'chunk_number': cursor['chunk_number'],
+                'more_chunks_available': False,
+                'items': []
+            }
+        }
+
+#--------------------------------------------------
+
+def _next_chunk(e_api_client: object, user_id: str, cursor: dict) ->dict:
+    """
+    Gather the items for the next chunk, fetching pages of a paged search as needed, cut them to the chunk
+    limits and advance the cursor past them.
+    """
+
+    chunk_start = cursor['next_index']
+    item_limit = cursor['chunk_size']
+    if cursor['paged']:
+        # Start with any items left over from the last page, then fetch until the chunk is full or the search is exhausted
+        candidates = cursor['pending']
+        candidate_bytes = sum(len(json.dumps(item)) + 2 for item in candidates)
+        while (item_limit == 0 or len(candidates) < item_limit) and (cursor['chunk_bytes'] == 0 or candidate_bytes < cursor['chunk_bytes']):
+            fetch_start = chunk_start + len(candidates)
+            if cursor['total_number_of_items'] is not None and fetch_start >= cursor['total_number_of_items']:
+                break
+            item_list = _get_search_page(e_api_client, user_id, cursor, fetch_start, item_limit - len(candidates) if item_limit > 0 else SEARCH_PAGE_SIZE)
+            if not item_list['success']:
+                return item_list
+            # The library may have changed since the search started, so believe Emby's latest total
+            cursor['total_number_of_items'] = item_list['total_count']
+            if len(item_list['items']) == 0:
+                break
+            candidates = candidates + item_list['items']
+            candidate_bytes += sum(len(json.dumps(item)) + 2 for item in item_list['items'])
+    else:
+        candidates = cursor['items'][chunk_start:chunk_start + item_limit] if item_limit > 0 else cursor['items'][chunk_start:]
+
+    chunk_items = _fit_chunk_items(cursor, candidates)
+    if cursor['paged']:
+        cursor['pending'] = candidates[len(chunk_items):]
+        cursor['held_bytes'] += len(json.dumps(chunk_items)) # the items of non-paged searches were counted when fetched
+
+    cursor['chunk_offsets'].append(chunk_start)
+    cursor['chunks'].append(chunk_items)
+    cursor['chunk_number'] += 1
+    cursor['next_index'] = chunk_start + len(chunk_items)
+    cursor['more_chunks_available'] = len(chunk_items) > 0 and cursor['next_index'] < cursor['total_number_of_items']
+    if not cursor['more_chunks_available']:
+        cursor['items'] = None # the chunks now hold every item
+        cursor['pending'] = []
+
+    return {
+        'success': True,
+        'chunk': _make_search_chunk(cursor, cursor['chunk_number'])
+    }
+
+#--------------------------------------------------
+
+def _make_search_chunk(cursor: dict, chunk_number: int) ->dict:
+    """
+    Build the chunk dictionary that is returned to the MCP client for a chunk that the cursor has already gathered.
+    """
+
+    chunk_items = cursor['chunks'][chunk_number - 1]
+    return {
+        'search_id': cursor['search_id'],
+        'total_number_of_items': cursor['total_number_of_items'],
+        'chunk_size': len(chunk_items),
+        'chunk_number': chunk_number,
+        'more_chunks_available': chunk_number < cursor['chunk_number'] or cursor['more_chunks_available'],
+        'items': chunk_items
+    }
+
+#--------------------------------------------------
+
+def _fit_chunk_items(cursor: dict, candidates: list) ->list:
+    """
+    Return as many of the candidate items as fit in the cursor's byte limit when serialised in a chunk, and at least one.
+    The sizes are those of json.dumps(), which is how the MCP tools return chunks.
+    """
+
+    if cursor['chunk_bytes'] == 0 or len(candidates) == 0:
+        return candidates
+
+    # The chunk's own keys, measured with values at least as long as the real ones will be
+    used_bytes = len(json.dumps({
+        'search_id': cursor['search_id'],
+        'total_number_of_items': max(cursor['total_number_of_items'] or 0, cursor['next_index'] + len(candidates)),
+        'chunk_size': len(candidates),
+        'chunk_number': cursor['chunk_number'] + 1,
+        'more_chunks_available': False,
+        'items': []
+    }))
+    for count, item in enumerate(candidates):
+        used_bytes += len(json.dumps(item)) + (2 if count > 0 else 0) # items are separated by ', '
+        if used_bytes > cursor['chunk_bytes'] and count > 0:
+            return candidates[:count]
+    return candidates
+
+#--------------------------------------------------
+
+def _get_search_page(e_api_client: object, user_id: str, cursor: dict, start_index: int, limit: int) ->dict:
+    """
+    Get one page of a paged search, from the library mirror if it is answering the search, otherwise from Emby.
+    """
+
+    if cursor['mirror'] is not None:
+        return search_mirror_items(cursor['mirror'], library_id=cursor['library_id'], start_index=start_index, limit=limit, **cursor['query'])
+    return get_items(e_api_client, user_id, library_id=cursor['library_id'], start_index=start_index, limit=limit, **cursor['query'])
+
+#--------------------------------------------------
+# Search Store Functions
+#-------------------------
+
+# The store holds the cursors of recent searches, keyed by search_id, so that several searches can be
+# read in turn and any chunk of them returned again. Like the caches in lib_emby_cache.py it is a plain
+# dictionary. Cursors are dropped once idle for idle_seconds, and the least recently used are dropped
+# while there are more than max_searches or they hold more than max_bytes of items between them.
+
+def new_search_store(max_searches: int = 16, idle_seconds: float = 1800, max_bytes: int = 50000000) ->dict:
+    """
+    Create an empty search store.
+
+    Args:
+        max_searches (int, optional): The maximum number of searches to keep.
+        idle_seconds (float, optional): How long a search is kept after it was last used.
+        max_bytes (int, optional): The maximum approximate JSON size of the items held by all of the searches.
+
+    Returns:
+        dict: The store, with keys:
+        max_searches (int): as supplied
+        idle_seconds (float): as supplied
+        max_bytes (int): as supplied
+        cursors (OrderedDict): search_id -> cursor from start_item_search(), least recently used first
+        latest_search_id (str): The ID of the most recently started search, or None
+        lock (obj): serialises access to cursors
+    """
+
+    return {
+        'max_searches': max_searches,
+        'idle_seconds': idle_seconds,
+        'max_bytes': max_bytes,
+        'cursors': OrderedDict(),
+        'latest_search_id': None,
+        'lock': threading.Lock()
+    }
+
+#--------------------------------------------------
+
+def store_search(store: dict, cursor: dict) ->None:
+    """
+    Add the cursor of a new search to the store, making it the latest search, and drop any searches that no longer fit.
+    """
+
+    with store['lock']:
+        cursor['last_used'] = time.monotonic()
+        store['cursors'][cursor['search_id']] = cursor
+        store['latest_search_id'] = cursor['search_id']
+        _prune_searches(store)
+
+#--------------------------------------------------
+
+def find_search(store: dict, search_id: Optional[str] = "") ->Optional[dict]:
+    """
+    Return the cursor for search_id (or for the latest search if search_id is empty), or None if it is unknown or has expired.
+    """
+
+    with store['lock']:
+        _prune_searches(store)
+        if search_id is None or search_id == "":
+            search_id = store['latest_search_id']
+        cursor = store['cursors'].get(search_id)
+        if cursor is not None:
+            cursor['last_used'] = time.monotonic()
+            store['cursors'].move_to_end(search_id)
+        return cursor
+
+#--------------------------------------------------
+
+def prune_searches(store: dict) ->None:
+    """
+    Drop the searches that have expired or no longer fit, e.g. after a search has grown by fetching more chunks.
+    """
+
+    with store['lock']:
+        _prune_searches(store)
+
+#--------------------------------------------------
+
+def _prune_searches(store: dict) ->None:
+    """
+    Drop expired searches, then the least recently used searches until the rest fit. The most recently used search is always kept.
+    Call with the store lock held.
+    """
+
+    cursors = store['cursors']
+    idle_before = time.monotonic() - store['idle_seconds']
+    for search_id in [search_id for search_id, cursor in cursors.items() if cursor['last_used'] < idle_before]:
+        del cursors[search_id]
+    held_bytes = sum(cursor['held_bytes'] for cursor in cursors.values())
+    while len(cursors) > 1 and (len(cursors) > store['max_searches'] or held_bytes > store['max_bytes']):
+        search_id, cursor = cursors.popitem(last=False)
+        held_bytes -= cursor['held_bytes']
+    if store['latest_search_id'] not in cursors:
+        store['latest_search_id'] = None
+
+#--------------------------------------------------
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Model Context Protocol (MCP) server that connects an Emby media server to an AI client such as Claude Desktop.
+See emby_mcp_server.py for details.
+
+Copyright (C) 2025 Dominic Search <code@angeltek.co.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+#==================================================
+# Functions for Per-Client MCP Session State
+#==================================================
+
+from collections import OrderedDict
+import threading
+import time
+from lib_emby_search import new_search_store
+
+#--------------------------------------------------
+# Session Store Functions
+#-------------------------
+
+# When Emby.MCP serves several MCP clients at once (the streamable-http and sse transports) the Emby login,
+# thread pool, caches, lyrics index and library mirror are shared by every client, but the state of each
+# conversation - the selected library and the cursors of its recent searches - is kept per MCP session in
+# a session store. Like the search store in lib_emby_search.py it is a plain dictionary. A session's state
+# is dropped once idle for idle_seconds, and the least recently used are dropped while there are more than
+# max_sessions. A client whose state has been dropped simply starts again with no library selected.
+
+def new_session_store(idle_seconds: float = 3600, max_sessions: int = 64, max_searches: int = 16, search_idle_seconds: float = 1800, search_max_bytes: int = 50000000) ->dict:
+    """
+    Create an empty session store.
+
+    Args:
+        idle_seconds (float, optional): How long a session's state is kept after it was last used.
+        max_sessions (int, optional): The maximum number of sessions to keep state for.
+        max_searches (int, optional): The maximum number of searches to keep per session, see new_search_store().
+        search_idle_seconds (float, optional): How long a search is kept after it was last used, see new_search_store().
+        search_max_bytes (int, optional): The maximum approximate JSON size of the items held by the searches of each session.
+
+    Returns:
+        dict: The store, with keys:
+        idle_seconds (float): as supplied
+        max_sessions (int): as supplied
+        search_limits (tuple): the new_search_store() arguments for each session's search store
+        sessions (OrderedDict): session key -> session state from get_session_state(), least recently used first
+        evicted (int): The number of sessions dropped so far for being idle or least recently used
+        lock (obj): serialises access to sessions
+    """
+
+    return {
+        'idle_seconds': idle_seconds,
+        'max_sessions': max_sessions,
+        'search_limits': (max_searches, search_idle_seconds, search_max_bytes),
+        'sessions': OrderedDict(),
+        'evicted': 0,
+        'lock': threading.Lock()
+    }
+
+#--------------------------------------------------
+
+def get_session_state(store: dict, session_key: object) ->dict:
+    """
+    Return the state of an MCP session, creating it if the session is new or its state has been dropped.
+
+    Args:
+        store (dict): The session store from new_session_store().
+        session_key (obj): Identifies the MCP session, e.g. the session object of the request context.
+
+    Returns:
+        dict: The session state, with keys:
+        current_library (dict): The currently selected library, as returned by set_current_library(), or empty if none
+        search_store (dict): The cursors of the session's recent searches, from new_search_store()
+        created (float): when the state was created
+        last_used (float): when the state was last used
+    """
+
+    with store['lock']:
+        now = time.monotonic()
+        sessions = store['sessions']
+        state = sessions.get(session_key)
+        if state is None:
+            state = {
+                'current_library': {},
+                'search_store': new_search_store(*store['search_limits']),
+                'created': now,
+                'last_used': now
+            }
+            sessions[session_key] = state
+        else:
+            state['last_used'] = now
+            sessions.move_to_end(session_key)
+        _prune_sessions(store)
+        return state
+
+#--------------------------------------------------
+
+def get_session_summary(store: dict) ->dict:
+    """
+    Summarise the session store for diagnostics.
+
+    Args:
+        store (dict): The session store from new_session_store().
+
+    Returns:
+        dict: A dictionary with keys:
+        sessions (int): The number of sessions that have state
+        searches (int): The number of searches held by those sessions
+        evicted (int): The number of sessions dropped so far for being idle or least recently used
+        idle_seconds (float): How long a session's state is kept after it was last used
+        max_sessions (int): The maximum number of sessions to keep state for
+    """
+
+    with store['lock']:
+        _prune_sessions(store)
+        return {
+            'sessions': len(store['sessions']),
+            'searches': sum(len(state['search_store']['cursors']) for state in store['sessions'].values()),
+            'evicted': store['evicted'],
+            'idle_seconds': store['idle_seconds'],
+            'max_sessions': store['max_sessions']
+        }
+
+#--------------------------------------------------
+
+def _prune_sessions(store: dict) ->None:
+    """
+    Drop the state of idle sessions, then of the least recently used sessions until the rest fit.
+    The most recently used session is always kept. Call with the store lock held.
+    """
+
+    sessions = store['sessions']
+    idle_before = time.monotonic() - store['idle_seconds']
+    for session_key in [session_key for session_key, state in sessions.items() if state['last_used'] < idle_before]:
+        del sessions[session_key]
+        store['evicted'] += 1
+    while len(sessions) > 1 and len(sessions) > store['max_sessions']:
+        sessions.popitem(last=False)
+        store['evicted'] += 1
+
+#--------------------------------------------------
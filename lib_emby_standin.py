@@ -0,0 +1,593 @@
+# -*- coding: utf-8 -*-
+"""
+Model Context Protocol (MCP) server that connects an Emby media server to an AI client such as Claude Desktop.
+See emby_mcp_server.py for details.
+
+Copyright (C) 2025 Dominic Search <code@angeltek.co.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+#==================================================
+# Local Stand-in for the Emby REST API
+#==================================================
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from datetime import datetime, timedelta, timezone
+import gzip
+import json
+import random
+import threading
+import time
+import uuid
+
+# Word lists used to generate synthetic metadata
+STANDIN_GENRES = ['Jazz', 'Rock', 'Pop', 'Classical', 'Blues', 'Folk', 'Soul', 'Reggae', 'Country', 'Electronic', 'Hip Hop', 'Drama']
+STANDIN_WORDS = ['love', 'night', 'river', 'city', 'dream', 'heart', 'rain', 'fire', 'blue', 'road', 'moon', 'sun', 'dance',
+                 'home', 'light', 'time', 'world', 'song', 'wild', 'gold', 'café', 'señor', 'über', 'naïve', 'soul', 'sky']
+STANDIN_USERS = [('standin-user-0', 'alice'), ('standin-user-1', 'bob'), ('standin-user-2', 'carol')]
+
+#--------------------------------------------------
+# Synthetic Library
+#-------------------------
+
+def new_standin_library(item_count: int = 1000, playlist_count: int = 20, session_count: int = 4, seed: int = 42) ->dict:
+    """
+    Create a synthetic Emby library. Items are stored as columns of small integers and only expanded into
+    Emby-shaped JSON when served, so that libraries of a million items stay cheap to hold in memory.
+
+    Args:
+        item_count (int): The number of audio items in the music library.
+        playlist_count (int): The number of playlists in the playlists library.
+        session_count (int): The number of player sessions.
+        seed (int): Random seed, so that the same arguments always produce the same library.
+
+    Returns:
+        dict: The library state, shared with the request handler.
+    """
+
+    rng = random.Random(seed)
+    artist_count = max(1, item_count // 10)
+    epoch = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    library = {
+        'lock': threading.RLock(),
+        'item_count': item_count,
+        'artist_count': artist_count,
+        'genre': [rng.randrange(len(STANDIN_GENRES)) for i in range(item_count)],
+        'artist': [rng.randrange(artist_count) for i in range(item_count)],
+        'year': [1950 + rng.randrange(75) for i in range(item_count)],
+        'seconds': [60 + rng.randrange(540) for i in range(item_count)],
+        'has_lyrics': [rng.random() < 0.3 for i in range(item_count)],
+        'saved': [epoch] * item_count,
+        'overrides': {},
+        'epoch': epoch,
+        'music_id': 'lib-music',
+        'playlists_id': 'lib-playlists',
+        'playlists': {},
+        'sessions': [],
+        'tokens': {},
+        'bytes_sent': 0,
+        'request_count': 0,
+        'latency': 0.0
+    }
+    for counter in range(playlist_count):
+        playlist_id = f'playlist-{counter}'
+        library['playlists'][playlist_id] = {
+            'name': f'Playlist {counter}',
+            'overview': f'Synthetic playlist number {counter}',
+            'media_type': 'Audio',
+            'owner': STANDIN_USERS[0][0],
+            'public': counter % 3 == 0,
+            'entries': [[f'entry-{counter}-{n}', str(rng.randrange(item_count))] for n in range(rng.randrange(5, 30))] if item_count > 0 else [],
+            'next_entry': 1000,
+            'saved': epoch
+        }
+    for counter in range(session_count):
+        library['sessions'].append({
+            'id': f'session-{counter}',
+            'device_id': f'device-{counter}',
+            'device_name': f'Speaker {counter}' if counter % 2 == 0 else f'Television {counter}',
+            'client': 'Emby Theater' if counter % 2 else 'Emby Web',
+            'media_types': ['Audio'] if counter % 2 == 0 else ['Audio', 'Video'],
+            'queue': [str(rng.randrange(item_count)) for n in range(5)] if item_count > 0 else [],
+            'position_ticks': 0,
+            'is_paused': False,
+            'commands': []
+        })
+    return library
+
+#--------------------------------------------------
+
+def _standin_item(library: dict, index: int, fields: set) ->dict:
+    """
+    Expand one synthetic item into the JSON shape of an Emby BaseItemDto.
+    """
+
+    artist_index = library['artist'][index]
+    album_number = index // 12
+    words = STANDIN_WORDS
+    name = _standin_name(index)
+    item = {
+        'Name': name,
+        'Id': str(index),
+        'Type': 'Audio',
+        'MediaType': 'Audio',
+        'Artists': [f'Artist {artist_index}'],
+        'AlbumArtist': f'Artist {artist_index}',
+        'Album': f'Album {album_number}',
+        'AlbumId': f'album-{album_number}',
+        'IndexNumber': index % 12 + 1,
+        'ParentIndexNumber': 1,
+        'RunTimeTicks': library['seconds'][index] * 10000000,
+        'Bitrate': 320000
+    }
+    item.update(library['overrides'].get(index, {}))
+    if 'Genres' in fields:
+        item['Genres'] = [STANDIN_GENRES[library['genre'][index]]]
+    if 'ProductionYear' in fields:
+        item['ProductionYear'] = library['year'][index]
+    if 'PremiereDate' in fields:
+        item['PremiereDate'] = f"{library['year'][index]}-01-01T00:00:00.0000000Z"
+    if 'DateCreated' in fields:
+        item['DateCreated'] = (library['epoch'] - timedelta(days=index % 1000)).isoformat().replace('+00:00', 'Z')
+    if 'Overview' in fields:
+        item['Overview'] = f'Track {index % 12 + 1} from album {album_number} by artist {artist_index}'
+    if 'Path' in fields:
+        item['Path'] = f'/music/Artist {artist_index}/Album {album_number}/{name}.mp3'
+    if 'SortName' in fields:
+        item['SortName'] = f'{index:09d}' # items are served in index order, so this is the order Emby would sort them in
+    if 'MediaSources' in fields or 'MediaStreams' in fields:
+        streams = [{'Type': 'Audio', 'Codec': 'mp3', 'Index': 0, 'IsTextSubtitleStream': False}]
+        if library['has_lyrics'][index]:
+            rng = random.Random(index)
+            lines = [' '.join(rng.choice(words) for n in range(6)) for line in range(8)]
+            streams.append({'Type': 'Subtitle', 'Codec': 'text', 'Index': 1, 'Title': 'lyrics', 'IsTextSubtitleStream': True, 'Extradata': '\n'.join(lines)})
+        if 'MediaSources' in fields:
+            item['MediaSources'] = [{'Id': f'source-{index}', 'Path': f'/music/{index}.mp3', 'MediaStreams': streams}]
+        if 'MediaStreams' in fields:
+            item['MediaStreams'] = streams
+    return item
+
+#--------------------------------------------------
+
+def _standin_match(library: dict, index: int, query: dict) ->bool:
+    """
+    Apply the subset of Emby item query filters used by Emby.MCP to one synthetic item.
+    """
+
+    if 'genres' in query and STANDIN_GENRES[library['genre'][index]].lower() not in query['genres']:
+        return False
+    if 'artists' in query and f"artist {library['artist'][index]}" not in query['artists']:
+        return False
+    if 'years' in query and library['year'][index] not in query['years']:
+        return False
+    if 'ids' in query and str(index) not in query['ids']:
+        return False
+    if 'min_saved' in query and library['saved'][index] < query['min_saved']:
+        return False
+    if 'search' in query:
+        name = library['overrides'].get(index, {}).get('Name', _standin_name(index))
+        if query['search'] not in name.lower() and query['search'] not in f'album {index // 12}':
+            return False
+    return True
+
+#--------------------------------------------------
+
+def _standin_name(index: int) ->str:
+    """
+    Return the generated title of a synthetic item.
+    """
+
+    return f'{STANDIN_WORDS[index % len(STANDIN_WORDS)].title()} {STANDIN_WORDS[(index // 7) % len(STANDIN_WORDS)]} {index}'
+
+#--------------------------------------------------
+# Request Handler
+#-------------------------
+
+class StandinHandler(BaseHTTPRequestHandler):
+    """
+    Serves the Emby REST endpoints used by Emby.MCP from the synthetic library held in self.server.library.
+    """
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        return # keep benchmark output clean
+
+    def _send_json(self, payload, status: int = 200, counted: bool = True):
+        library = self.server.library
+        body = json.dumps(payload, separators=(',', ':')).encode('utf-8') if payload is not None else b''
+        headers = {'Content-Type': 'application/json'}
+        if body and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body, compresslevel=5)
+            headers['Content-Encoding'] = 'gzip'
+        self.send_response(status if body or status != 200 else 204)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if counted:
+            # Count before sending, so that a client which has read the response always sees it counted
+            with library['lock']:
+                library['bytes_sent'] += len(body)
+                library['request_count'] += 1
+        self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length', 0) or 0)
+        if length > 0:
+            return json.loads(self.rfile.read(length).decode('utf-8'))
+        return None
+
+    def _authorised(self) ->bool:
+        token = self.headers.get('X-Emby-Token', '')
+        return token in self.server.library['tokens']
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def _dispatch(self, method: str):
+        library = self.server.library
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split('/') if part != '']
+        if parts and parts[0].lower() == 'emby':
+            parts = parts[1:]
+        query = {key.lower(): values[0] for key, values in parse_qs(url.query).items()}
+        body = self._read_body() if method == 'POST' else None
+        if library['latency'] > 0:
+            time.sleep(library['latency']) # simulate a busy or distant server, outside the library lock
+
+        if method == 'POST' and parts == ['Users', 'AuthenticateByName']:
+            users = {name: user_id for user_id, name in STANDIN_USERS}
+            user_name = body.get('Username', '') if body else ''
+            if user_name not in users or body.get('Pw') in (None, '', 'wrong'):
+                return self._send_json({'error': 'invalid credentials'}, 401)
+            token = uuid.uuid4().hex
+            with library['lock']:
+                library['tokens'][token] = users[user_name]
+            return self._send_json({
+                'AccessToken': token,
+                'User': {'Name': user_name, 'Id': users[user_name]},
+                'SessionInfo': {'Id': f'session-{token[:8]}', 'UserId': users[user_name]},
+                'ServerId': 'standin'
+            })
+
+        if method == 'GET' and parts == ['Standin', 'Stats']:
+            # Not part of Emby: lets a benchmark in another process read the traffic counters
+            with library['lock']:
+                stats = {'bytes_sent': library['bytes_sent'], 'request_count': library['request_count']}
+            return self._send_json(stats, counted=False)
+
+        if not self._authorised():
+            return self._send_json({'error': 'access token is invalid or expired'}, 401)
+        user_id = library['tokens'][self.headers.get('X-Emby-Token')]
+
+        with library['lock']:
+            payload, status = _standin_route(library, method, parts, query, body, user_id, self.headers.get('X-Emby-Token'))
+        return self._send_json(payload, status)
+
+#--------------------------------------------------
+
+def _standin_route(library: dict, method: str, parts: list, query: dict, body, user_id: str, token: str):
+    """
+    Route one authenticated request. Returns a tuple of (JSON payload, HTTP status).
+    """
+
+    fields = set(query.get('fields', '').split(','))
+    match (method, parts):
+        case ('POST', ['Sessions', 'Logout']):
+            library['tokens'].pop(token, None)
+            return None, 204
+        case ('GET', ['Users', 'Public']):
+            return [{'Name': name, 'Id': an_id} for an_id, name in STANDIN_USERS], 200
+        case ('GET', ['Users', 'ItemAccess']):
+            playlist = library['playlists'].get(query.get('itemid', ''))
+            if playlist is None:
+                return {'error': 'not found'}, 404
+            users = [{'Name': name, 'Id': an_id, 'UserItemShareLevel': 'ManageDelete' if an_id == playlist['owner'] else ('Read' if playlist['public'] else 'None')} for an_id, name in STANDIN_USERS]
+            return {'Items': users, 'TotalRecordCount': len(users)}, 200
+        case ('GET', ['Users', an_id]):
+            for user in STANDIN_USERS:
+                if user[0] == an_id:
+                    return {'Name': user[1], 'Id': user[0]}, 200
+            return {'error': 'not found'}, 404
+        case ('GET', ['Library', 'MediaFolders']):
+            folders = [
+                {'Name': 'Music', 'Id': library['music_id'], 'Type': 'CollectionFolder', 'CollectionType': 'music'},
+                {'Name': 'Playlists', 'Id': library['playlists_id'], 'Type': 'CollectionFolder', 'CollectionType': 'playlists'}
+            ]
+            return {'Items': folders, 'TotalRecordCount': len(folders)}, 200
+        case ('GET', ['Genres']):
+            if query.get('parentid', library['music_id']) not in (library['music_id'], ''):
+                return {'Items': [], 'TotalRecordCount': 0}, 200
+            genres = [{'Name': name, 'Id': f'genre-{n}', 'Type': 'Genre'} for n, name in enumerate(STANDIN_GENRES)]
+            return {'Items': genres, 'TotalRecordCount': len(genres)}, 200
+        case ('GET', ['Users', _, 'Items']):
+            return _standin_items_query(library, query, fields), 200
+        case ('GET', ['Users', _, 'Items', an_id]):
+            if an_id in library['playlists']:
+                return _standin_playlist_dto(library, an_id, {'Overview'}), 200
+            if an_id.isdigit() and int(an_id) < library['item_count']:
+                return _standin_item(library, int(an_id), {'Overview', 'Genres'}), 200
+            return {'error': 'not found'}, 404
+        case ('POST', ['Items', 'Access']):
+            return None, 204
+        case ('POST', ['Items', an_id]):
+            playlist = library['playlists'].get(an_id)
+            if playlist is not None and body:
+                playlist['name'] = body.get('Name', playlist['name'])
+                playlist['overview'] = body.get('Overview', playlist['overview'])
+                playlist['saved'] = datetime.now(timezone.utc)
+                return None, 204
+            return {'error': 'not found'}, 404
+        case ('POST', ['Items', an_id, 'MakePublic' | 'MakePrivate' as action]):
+            playlist = library['playlists'].get(an_id)
+            if playlist is None:
+                return {'error': 'not found'}, 404
+            playlist['public'] = action == 'MakePublic'
+            return None, 204
+        case ('POST', ['Playlists']):
+            playlist_id = f'playlist-{uuid.uuid4().hex[:8]}'
+            ids = [an_id for an_id in query.get('ids', '').split(',') if an_id != '']
+            library['playlists'][playlist_id] = {
+                'name': query.get('name', ''), 'overview': '', 'media_type': query.get('mediatype', 'Audio'),
+                'owner': user_id, 'public': False, 'entries': [], 'next_entry': 1, 'saved': datetime.now(timezone.utc)
+            }
+            _standin_add_entries(library, playlist_id, ids)
+            return {'Id': playlist_id}, 200
+        case ('GET', ['Playlists', an_id, 'Items']):
+            playlist = library['playlists'].get(an_id)
+            if playlist is None:
+                return {'error': 'not found'}, 404
+            entries = playlist['entries']
+            start = int(query.get('startindex', 0))
+            limit = int(query['limit']) if 'limit' in query else len(entries)
+            items = []
+            for entry_id, item_id in entries[start:start + limit]:
+                item = _standin_item(library, int(item_id), fields)
+                item['PlaylistItemId'] = entry_id
+                items.append(item)
+            return {'Items': items, 'TotalRecordCount': len(entries)}, 200
+        case ('POST', ['Playlists', an_id, 'Items']):
+            if an_id not in library['playlists']:
+                return {'error': 'not found'}, 404
+            ids = [item_id for item_id in query.get('ids', '').split(',') if item_id != '']
+            added = _standin_add_entries(library, an_id, ids)
+            return {'Id': an_id, 'ItemAddedCount': added}, 200
+        case ('POST', ['Playlists', an_id, 'Items', 'Delete']):
+            playlist = library['playlists'].get(an_id)
+            if playlist is None:
+                return {'error': 'not found'}, 404
+            entry_ids = set(query.get('entryids', '').split(','))
+            playlist['entries'] = [entry for entry in playlist['entries'] if entry[0] not in entry_ids]
+            playlist['saved'] = datetime.now(timezone.utc)
+            return None, 204
+        case ('POST', ['Playlists', an_id, 'Items', entry_id, 'Move', new_index]):
+            playlist = library['playlists'].get(an_id)
+            if playlist is None:
+                return {'error': 'not found'}, 404
+            for position, entry in enumerate(playlist['entries']):
+                if entry[0] == entry_id:
+                    playlist['entries'].pop(position)
+                    playlist['entries'].insert(int(new_index), entry)
+                    playlist['saved'] = datetime.now(timezone.utc)
+                    return None, 204
+            return {'error': 'not found'}, 404
+        case ('GET', ['Sessions']):
+            return [_standin_session_dto(library, session) for session in library['sessions']], 200
+        case ('GET', ['Sessions', 'PlayQueue']):
+            for session in library['sessions']:
+                if session['id'] == query.get('id', ''):
+                    items = []
+                    for position, item_id in enumerate(session['queue']):
+                        item = _standin_item(library, int(item_id), {'Genres', 'ProductionYear', 'PremiereDate', 'DateCreated', 'Overview'})
+                        item['PlaylistItemId'] = f'queue-{position}'
+                        items.append(item)
+                    return {'Items': items, 'TotalRecordCount': len(items)}, 200
+            return {'error': 'not found'}, 404
+        case ('POST', ['Sessions', an_id, 'Playing']):
+            for session in library['sessions']:
+                if session['id'] == an_id:
+                    session['queue'] = [item_id for item_id in query.get('itemids', '').split(',') if item_id != '']
+                    session['is_paused'] = False
+                    session['commands'].append('PlayNow')
+                    return None, 204
+            return {'error': 'not found'}, 404
+        case ('POST', ['Sessions', an_id, 'Playing', command]):
+            for session in library['sessions']:
+                if session['id'] == an_id:
+                    session['commands'].append(command)
+                    if command in ('Pause', 'PlayPause'):
+                        session['is_paused'] = command == 'Pause' or not session['is_paused']
+                    elif command == 'Unpause':
+                        session['is_paused'] = False
+                    elif command == 'Stop':
+                        session['queue'] = []
+                    return None, 204
+            return {'error': 'not found'}, 404
+    return {'error': f'not implemented: {method} /{"/".join(parts)}'}, 404
+
+#--------------------------------------------------
+
+def _standin_items_query(library: dict, query: dict, fields: set) ->dict:
+    """
+    Serve /Users/{UserId}/Items for either the music or the playlists library.
+    """
+
+    if query.get('parentid', '') == library['playlists_id']:
+        playlist_ids = list(library['playlists'].keys())
+        if 'ids' in query:
+            playlist_ids = [an_id for an_id in playlist_ids if an_id in query['ids'].split(',')]
+        if 'mindatelastsaved' in query:
+            min_saved = datetime.fromisoformat(query['mindatelastsaved'].replace('Z', '+00:00'))
+            playlist_ids = [an_id for an_id in playlist_ids if library['playlists'][an_id]['saved'] >= min_saved]
+        items = [_standin_playlist_dto(library, an_id, fields) for an_id in playlist_ids]
+        return {'Items': items, 'TotalRecordCount': len(items)}
+
+    cooked = {}
+    if 'genres' in query:
+        cooked['genres'] = set(genre.lower() for genre in query['genres'].split('|'))
+    if 'artists' in query:
+        cooked['artists'] = set(artist.lower() for artist in query['artists'].split('|'))
+    if 'years' in query:
+        cooked['years'] = set(int(year) for year in query['years'].split(',') if year.strip().isdigit())
+    if 'ids' in query:
+        cooked['ids'] = set(query['ids'].split(','))
+    if 'searchterm' in query:
+        cooked['search'] = query['searchterm'].lower()
+    if 'mindatelastsaved' in query:
+        cooked['min_saved'] = datetime.fromisoformat(query['mindatelastsaved'].replace('Z', '+00:00'))
+
+    if 'ids' in cooked and len(cooked) == 1:
+        candidates = sorted(int(an_id) for an_id in cooked['ids'] if an_id.isdigit() and int(an_id) < library['item_count'])
+    else:
+        candidates = range(library['item_count'])
+    if cooked:
+        matches = [index for index in candidates if _standin_match(library, index, cooked)]
+    else:
+        matches = candidates
+    start = int(query.get('startindex', 0))
+    limit = int(query['limit']) if 'limit' in query else len(matches)
+    items = [_standin_item(library, index, fields) for index in matches[start:start + limit]]
+    return {'Items': items, 'TotalRecordCount': len(matches)}
+
+#--------------------------------------------------
+
+def _standin_playlist_dto(library: dict, playlist_id: str, fields: set) ->dict:
+    """
+    Expand one synthetic playlist into the JSON shape of an Emby BaseItemDto.
+    """
+
+    playlist = library['playlists'][playlist_id]
+    item = {
+        'Name': playlist['name'],
+        'Id': playlist_id,
+        'Type': 'Playlist',
+        'MediaType': playlist['media_type'],
+        'RunTimeTicks': sum(library['seconds'][int(item_id)] for entry_id, item_id in playlist['entries']) * 10000000
+    }
+    if 'Overview' in fields:
+        item['Overview'] = playlist['overview']
+    if 'Genres' in fields:
+        item['Genres'] = sorted(set(STANDIN_GENRES[library['genre'][int(item_id)]] for entry_id, item_id in playlist['entries']))
+    if 'DateCreated' in fields:
+        item['DateCreated'] = library['epoch'].isoformat().replace('+00:00', 'Z')
+    return item
+
+#--------------------------------------------------
+
+def _standin_session_dto(library: dict, session: dict) ->dict:
+    """
+    Expand one synthetic player session into the JSON shape of an Emby SessionInfo.
+    """
+
+    dto = {
+        'Id': session['id'],
+        'DeviceId': session['device_id'],
+        'DeviceName': session['device_name'],
+        'Client': session['client'],
+        'RemoteEndPoint': '127.0.0.1',
+        'PlayableMediaTypes': session['media_types'],
+        'SupportsRemoteControl': True
+    }
+    if session['queue']:
+        dto['NowPlayingItem'] = _standin_item(library, int(session['queue'][0]), set())
+        dto['PlayState'] = {'PositionTicks': session['position_ticks'], 'IsPaused': session['is_paused']}
+    return dto
+
+#--------------------------------------------------
+
+def _standin_add_entries(library: dict, playlist_id: str, item_ids: list) ->int:
+    """
+    Append the items that exist to a playlist, returning how many were added.
+    """
+
+    playlist = library['playlists'][playlist_id]
+    added = 0
+    for item_id in item_ids:
+        if item_id.isdigit() and int(item_id) < library['item_count']:
+            playlist['entries'].append([f"entry-{playlist_id}-{playlist['next_entry']}", item_id])
+            playlist['next_entry'] += 1
+            added += 1
+    playlist['saved'] = datetime.now(timezone.utc)
+    return added
+
+#--------------------------------------------------
+# Server Control
+#-------------------------
+
+def start_standin_server(library: dict, host: str = '127.0.0.1', port: int = 0) ->dict:
+    """
+    Start the stand-in server on a background thread.
+
+    Args:
+        library (dict): The library returned by new_standin_library().
+        host (str, optional): The interface to listen on.
+        port (int, optional): The port to listen on, or 0 to pick a free port.
+
+    Returns:
+        dict: A dictionary with keys:
+        server (obj): The running HTTP server.
+        server_url (str): The URL to use as EMBY_SERVER_URL.
+        thread (obj): The thread serving requests.
+    """
+
+    server = ThreadingHTTPServer((host, port), StandinHandler)
+    server.daemon_threads = True
+    server.library = library
+    thread = threading.Thread(target=server.serve_forever, name='emby-standin', daemon=True)
+    thread.start()
+    return {
+        'server': server,
+        'server_url': f'http://{host}:{server.server_address[1]}',
+        'thread': thread
+    }
+
+#--------------------------------------------------
+
+def stop_standin_server(standin: dict) ->None:
+    """
+    Stop a server started by start_standin_server().
+    """
+
+    standin['server'].shutdown()
+    standin['server'].server_close()
+
+#--------------------------------------------------
+
+#==================================================
+# Run the Stand-in on its own
+#==================================================
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Serve a synthetic library through a stand-in for the Emby REST API.")
+    parser.add_argument('--items', type=int, default=1000, help="number of items in the music library")
+    parser.add_argument('--playlists', type=int, default=20, help="number of playlists")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds to delay every response")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8096)
+    args = parser.parse_args()
+
+    library = new_standin_library(args.items, playlist_count=args.playlists)
+    library['latency'] = args.latency
+    standin = start_standin_server(library, args.host, args.port)
+    print(standin['server_url'], flush=True) # the first line of output is read by emby_mcp_benchmark.py
+    try:
+        standin['thread'].join()
+    except KeyboardInterrupt:
+        stop_standin_server(standin)
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Model Context Protocol (MCP) server that connects an Emby media server to an AI client such as Claude Desktop.
+See emby_mcp_server.py for details.
+
+Copyright (C) 2025 Dominic Search <code@angeltek.co.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+#==================================================
+# Functions for Tuning the HTTP Transport of the Emby SDK
+#==================================================
+
+from typing import Optional
+import socket
+import ssl
+import certifi
+import urllib3
+from urllib3.connection import HTTPConnection
+from emby_client.rest import ApiException
+
+#--------------------------------------------------
+# Tuned Connection Pool Managers
+#-------------------------
+
+# The SDK passes timeout=None on every request unless the caller gives _request_timeout, which urllib3 takes
+# to mean "wait for ever", so a default timeout given to the pool manager would never be used. These pool
+# managers use their default timeout whenever the request does not set one, and their default retries (see
+# lib_emby_resilience.py, which replaces urllib3's own retries). They also report timeouts and failed
+# connections as an ApiException with status 0, as the SDK already does for SSL errors, so that the functions
+# in lib_emby_functions.py return them as a failed request rather than raising. The exception's not_sent
+# attribute is True if the request cannot have reached Emby, because no connection was made.
+
+class _DefaultTimeoutMixin:
+    default_timeout = None
+    default_retries = None
+
+    def urlopen(self, method, url, redirect=True, **kw):
+        if kw.get('timeout') is None:
+            kw['timeout'] = self.default_timeout
+        if kw.get('retries') is None and self.default_retries is not None:
+            kw['retries'] = self.default_retries
+        try:
+            return super().urlopen(method, url, redirect=redirect, **kw)
+        except urllib3.exceptions.HTTPError as e:
+            cause = e.reason if isinstance(e, urllib3.exceptions.MaxRetryError) and e.reason is not None else e
+            error = ApiException(status=0, reason=f"{type(cause).__name__}: {cause}")
+            error.not_sent = isinstance(cause, urllib3.exceptions.ConnectTimeoutError) # includes failed and refused connections
+            raise error
+
+class TunedPoolManager(_DefaultTimeoutMixin, urllib3.PoolManager):
+    pass
+
+class TunedProxyManager(_DefaultTimeoutMixin, urllib3.ProxyManager):
+    pass
+
+#--------------------------------------------------
+# Transport Functions
+#-------------------------
+
+def new_transport_settings(pool_size: int = 16, connect_timeout: float = 10, read_timeout: float = 300, gzip: bool = True, keepalive: bool = True) ->dict:
+    """
+    Collect the settings of the HTTP transport used to talk to Emby, for configure_emby_transport().
+
+    Args:
+        pool_size (int, optional): The most connections to keep open to the Emby server. Requests beyond this many at once
+            still go ahead, but their connections are closed afterwards rather than kept for reuse.
+        connect_timeout (float, optional): Seconds to wait for a connection to the Emby server, or 0 to wait for ever.
+        read_timeout (float, optional): Seconds to wait for each read of a response from the Emby server, or 0 to wait for ever.
+        gzip (bool, optional): True to ask Emby to compress its responses. JSON item lists compress about tenfold.
+        keepalive (bool, optional): True to enable TCP keep-alive on the connections, so that idle pooled connections are
+            not silently dropped by firewalls and NAT routers between Emby.MCP and Emby.
+
+    Returns:
+        dict: The settings, with the keys above.
+    """
+
+    return {
+        'pool_size': pool_size,
+        'connect_timeout': connect_timeout,
+        'read_timeout': read_timeout,
+        'gzip': gzip,
+        'keepalive': keepalive
+    }
+
+#--------------------------------------------------
+
+def configure_emby_transport(e_api_client: object, settings: dict) ->None:
+    """
+    Replace the connection pool of an API client with one tuned by settings, and set its compression header.
+    Clients that share the API client's connection pool (see PooledApiClient) are tuned too.
+
+    Args:
+        e_api_client (obj): The API client to tune.
+        settings (dict): The settings from new_transport_settings().
+
+    Returns:
+        None
+    """
+
+    config = e_api_client.configuration
+    pool_args = {
+        'num_pools': 4,
+        'maxsize': settings['pool_size'],
+        'cert_reqs': ssl.CERT_REQUIRED if config.verify_ssl else ssl.CERT_NONE,
+        'ca_certs': config.ssl_ca_cert if config.ssl_ca_cert else certifi.where(),
+        'cert_file': config.cert_file,
+        'key_file': config.key_file
+    }
+    if config.assert_hostname is not None:
+        pool_args['assert_hostname'] = config.assert_hostname
+    if settings['keepalive']:
+        pool_args['socket_options'] = HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    if config.proxy:
+        pool_manager = TunedProxyManager(proxy_url=config.proxy, **pool_args)
+    else:
+        pool_manager = TunedPoolManager(**pool_args)
+    pool_manager.default_timeout = urllib3.Timeout(connect=settings['connect_timeout'] or None, read=settings['read_timeout'] or None)
+
+    old_pool_manager = e_api_client.rest_client.pool_manager
+    e_api_client.rest_client.pool_manager = pool_manager
+    old_pool_manager.clear() # close the connections of the old pool
+    if settings['gzip']:
+        e_api_client.set_default_header('Accept-Encoding', 'gzip')
+    else:
+        e_api_client.default_headers.pop('Accept-Encoding', None)
+
+#--------------------------------------------------
+
+def get_transport_summary(e_api_client: object, settings: Optional[dict] = None) ->dict:
+    """
+    Summarise the HTTP transport of an API client for diagnostics.
+
+    Args:
+        e_api_client (obj): The API client.
+        settings (dict, optional): The settings from new_transport_settings() that the client was tuned with, if any.
+
+    Returns:
+        dict: A dictionary with keys:
+        settings (dict): as supplied, or None if the client has the SDK's default transport
+        hosts (list of dict): one entry per Emby server connected to, with keys:
+            host (str): the server's scheme, host and port
+            connections_opened (int): the number of connections opened so far
+            requests (int): the number of requests sent so far
+            requests_per_connection (float): how many requests each connection has carried on average
+            idle_connections (int): the number of open connections waiting in the pool for the next request
+    """
+
+    hosts = []
+    pools = e_api_client.rest_client.pool_manager.pools
+    for pool_key in pools.keys():
+        connection_pool = pools.get(pool_key)
+        if connection_pool is None:
+            continue # dropped since keys() was called
+        idle_connections = 0
+        if connection_pool.pool is not None:
+            idle_connections = sum(1 for connection in list(connection_pool.pool.queue) if connection is not None)
+        hosts.append({
+            'host': f"{connection_pool.scheme}://{connection_pool.host}:{connection_pool.port}",
+            'connections_opened': connection_pool.num_connections,
+            'requests': connection_pool.num_requests,
+            'requests_per_connection': round(connection_pool.num_requests / connection_pool.num_connections, 1) if connection_pool.num_connections > 0 else 0.0,
+            'idle_connections': idle_connections
+        })
+    return {
+        'settings': settings,
+        'hosts': hosts
+    }
+
+#--------------------------------------------------
@@ -0,0 +1,392 @@
+# -*- coding: utf-8 -*-
+"""
+Model Context Protocol (MCP) server that connects an Emby media server to an AI client such as Claude Desktop.
+See emby_mcp_server.py for details.
+
+Copyright (C) 2025 Dominic Search <code@angeltek.co.uk>
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program. If not, see <https://www.gnu.org/licenses/>.
+"""
+#==================================================
+# Functions for a Pool of Per-User Emby Clients
+#==================================================
+
+from collections import OrderedDict
+from typing import Optional
+import copy
+import json
+import threading
+import time
+import emby_client
+from emby_client.rest import ApiException
+from lib_emby_functions import authenticate_with_emby, logout_from_emby, stable_device_id
+
+#--------------------------------------------------
+# Pooled API Client
+#-------------------------
+
+class PooledApiClient(emby_client.ApiClient):
+    """
+    An Emby API client for one user of a user pool. It has its own access token, but sends its requests
+    through the connection pool of a shared client rather than opening connections of its own, and if
+    Emby rejects its access token it logs in again (once per request) using the user pool's credentials.
+    """
+
+    def __init__(self, shared_client: object, user_pool: Optional[dict] = None, username: Optional[str] = None):
+        # ApiClient.__init__() is not called, as it would start a thread pool and a connection pool of its own
+        config = copy.copy(shared_client.configuration)
+        config.api_key = {} # the copy would otherwise share the shared client's token
+        self.configuration = config
+        self.rest_client = shared_client.rest_client
+        self.default_headers = dict(shared_client.default_headers)
+        self.cookie = None
+        self.pool = None # only used for async_req, which Emby.MCP does not use
+        self.user_pool = user_pool
+        self.username = username
+
+    def __del__(self):
+        pass # there is no thread pool to close
+
+    def call_api(self, *args, **kwargs):
+        access_token = self.configuration.api_key.get('access_token')
+        try:
+            return super().call_api(*args, **kwargs)
+        except ApiException as e:
+            if e.status != 401 or self.user_pool is None or access_token is None: # no token means the login itself failed
+                raise
+            result = reauthenticate_pooled_user(self.user_pool, self.username, access_token, self)
+            if not result['success']:
+                raise
+            return super().call_api(*args, **kwargs)
+
+#--------------------------------------------------
+# User Pool Functions
+#-------------------------
+
+# When Emby.MCP serves several MCP clients, each client can act as its own Emby user by sending a client key
+# (as "Authorization: Bearer <client key>") that the credentials file maps to an Emby username and password.
+# The user pool keeps a logged in API client for each user in use, so that only the first request of a user
+# has to log in. Like the other stores it is a plain dictionary. Clients are dropped once idle for idle_seconds,
+# and the least recently used are dropped while there are more than max_clients, but their access tokens are
+# kept so that the user's next request can reuse the token rather than log in again. If Emby rejects a token,
+# the client logs in again the next time it is used. All of the clients share the connection pool of the
+# shared client, which is the client logged in as the user in the .env file.
+
+def load_user_credentials(credentials_path: str) ->dict:
+    """
+    Read the client keys and Emby credentials of the users that MCP clients may act as.
+    The file is JSON, mapping each client key to a username and password, e.g.
+    {"a-long-random-key": {"username": "alice", "password": "secret"}}
+
+    Args:
+        credentials_path (str): The path of the credentials file.
+
+    Returns:
+        dict: A dictionary with keys:
+        credentials (dict): client key -> dict with keys username (str) and password (str)
+        success (bool): True if the file was read, False otherwise.
+        error (str):  An error message if the file could not be read, otherwise None.
+    """
+
+    try:
+        with open(credentials_path, 'r', encoding='utf-8') as credentials_file:
+            saved = json.load(credentials_file)
+    except (OSError, ValueError) as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+    credentials = {}
+    if isinstance(saved, dict):
+        for client_key, credential in saved.items():
+            if not client_key or not isinstance(credential, dict) or not credential.get('username') or credential.get('password') is None:
+                return {
+                    'success': False,
+                    'error': "every client key must map to a username and password"
+                }
+            credentials[client_key] = {'username': credential['username'], 'password': credential['password']}
+    if len(credentials) == 0:
+        return {
+            'success': False,
+            'error': "no client keys were found"
+        }
+    return {
+        'success': True,
+        'credentials': credentials
+    }
+
+#--------------------------------------------------
+
+def new_user_pool(server_url: str, credentials: dict, shared_client: object, client_name: str, client_version: str, device_name: str, max_clients: int = 32, idle_seconds: float = 1800) ->dict:
+    """
+    Create an empty user pool.
+
+    Args:
+        server_url (str): The Emby server URL
+        credentials (dict): The client keys and credentials from load_user_credentials()
+        shared_client (obj): The authenticated API client whose connection pool the users' clients share
+        client_name (str): Name of your client application (shown in Emby server logs & devices page)
+        client_version (str): Version of your client application (shown in Emby server logs)
+        device_name (str): Name of the device we are running on (shown in Emby server logs & devices page)
+        max_clients (int, optional): The maximum number of users to keep a logged in client for.
+        idle_seconds (float, optional): How long a user's client is kept after it was last used.
+
+    Returns:
+        dict: The pool, with keys:
+        server_url, credentials, shared_client, client_name, client_version, device_name, max_clients, idle_seconds: as supplied
+        passwords (dict): username -> password
+        clients (OrderedDict): username -> user from get_pooled_user(), least recently used first
+        tokens (dict): username -> dict with keys access_token and user_id, kept after the user's client is dropped
+        login_locks (dict): username -> lock serialising the logins of that user
+        logins (int): The number of password logins made so far
+        evicted (int): The number of clients dropped so far for being idle or least recently used
+        lock (obj): serialises access to clients, tokens and login_locks
+    """
+
+    return {
+        'server_url': server_url,
+        'credentials': credentials,
+        'passwords': {credential['username']: credential['password'] for credential in credentials.values()},
+        'shared_client': shared_client,
+        'client_name': client_name,
+        'client_version': client_version,
+        'device_name': device_name,
+        'max_clients': max_clients,
+        'idle_seconds': idle_seconds,
+        'clients': OrderedDict(),
+        'tokens': {},
+        'login_locks': {},
+        'logins': 0,
+        'evicted': 0,
+        'lock': threading.Lock()
+    }
+
+#--------------------------------------------------
+
+def get_pooled_user(user_pool: dict, client_key: Optional[str]) ->dict:
+    """
+    Get the logged in API client of the Emby user that a client key maps to, logging in if the user has no client yet.
+
+    Args:
+        user_pool (dict): The pool from new_user_pool().
+        client_key (str): The client key sent by the MCP client.
+
+    Returns:
+        dict: A dictionary with keys:
+        user (dict): The user, with keys:
+            username (str): The Emby username
+            user_id (str): The unique identifier of the user
+            api_client (obj): The user's authenticated API client, a PooledApiClient
+            available_libraries (list of dict): The libraries that the user can see, as saved by the MCP tools
+            library_mirror (None): The library mirror is only used for the user in the .env file
+            emby_events (None): The WebSocket feed's session table is only used for the user in the .env file
+            last_used (float): when the user was last used
+        success (bool): True if the request was successful, False otherwise.
+        error (str):  An error message if the request failed, otherwise None.
+    """
+
+    credential = user_pool['credentials'].get(client_key) if client_key else None
+    if credential is None:
+        return {
+            'success': False,
+            'error': "the client key is missing or unknown. Send a key from the credentials file as 'Authorization: Bearer <client key>'"
+        }
+    username = credential['username']
+
+    with user_pool['lock']:
+        user = _touch_pooled_user(user_pool, username)
+        if user is not None:
+            return {'success': True, 'user': user}
+        login_lock = user_pool['login_locks'].setdefault(username, threading.Lock())
+
+    with login_lock:
+        with user_pool['lock']:
+            user = _touch_pooled_user(user_pool, username) # another request may have logged in while we waited
+            if user is not None:
+                return {'success': True, 'user': user}
+            token = user_pool['tokens'].get(username)
+
+        e_api_client = PooledApiClient(user_pool['shared_client'], user_pool, username)
+        if token is not None:
+            # Reuse the token of the user's earlier client; if Emby has since expired it, the client logs in again when first used
+            e_api_client.configuration.api_key['access_token'] = token['access_token']
+            user_id = token['user_id']
+        else:
+            result = _login_pooled_user(user_pool, username, e_api_client)
+            if not result['success']:
+                return {
+                    'success': False,
+                    'error': f"login to media server as {username} failed: {result['error']}"
+                }
+            user_id = result['user_id']
+
+        user = {
+            'username': username,
+            'user_id': user_id,
+            'api_client': e_api_client,
+            'available_libraries': [],
+            'library_mirror': None,
+            'emby_events': None,
+            'last_used': time.monotonic()
+        }
+        with user_pool['lock']:
+            user_pool['clients'][username] = user
+            _prune_pooled_users(user_pool)
+        return {'success': True, 'user': user}
+
+#--------------------------------------------------
+
+def reauthenticate_pooled_user(user_pool: dict, username: str, failed_token: Optional[str], e_api_client: object) ->dict:
+    """
+    Give a pooled client a working access token after Emby has rejected failed_token, logging in again unless
+    another client of the same user has already done so.
+
+    Args:
+        user_pool (dict): The pool from new_user_pool().
+        username (str): The Emby username of the client.
+        failed_token (str): The access token that Emby rejected.
+        e_api_client (obj): The client to give the new token to.
+
+    Returns:
+        dict: A dictionary with keys:
+        success (bool): True if the client has a new token, False otherwise.
+        error (str):  An error message if the login failed, otherwise None.
+    """
+
+    with user_pool['lock']:
+        login_lock = user_pool['login_locks'].setdefault(username, threading.Lock())
+    with login_lock:
+        with user_pool['lock']:
+            token = user_pool['tokens'].get(username)
+        if token is not None and token['access_token'] != failed_token:
+            e_api_client.configuration.api_key['access_token'] = token['access_token']
+            return {'success': True}
+        return _login_pooled_user(user_pool, username, e_api_client)
+
+#--------------------------------------------------
+
+def logout_pooled_users(user_pool: dict) ->dict:
+    """
+    Log out every user that has logged in through the pool, revoking their access tokens.
+
+    Args:
+        user_pool (dict): The pool from new_user_pool().
+
+    Returns:
+        dict: A dictionary with keys:
+        success (bool): True if every logout was successful, False otherwise.
+        error (str):  The error messages of the failed logouts, otherwise None.
+    """
+
+    with user_pool['lock']:
+        tokens = list(user_pool['tokens'].items())
+        user_pool['tokens'].clear()
+        user_pool['clients'].clear()
+
+    errors = []
+    for username, token in tokens:
+        e_api_client = PooledApiClient(user_pool['shared_client']) # not in the pool, so a rejected token is not renewed
+        e_api_client.configuration.api_key['access_token'] = token['access_token']
+        result = logout_from_emby(e_api_client)
+        if not result['success']:
+            errors.append(f"{username}: {result['error']}")
+    if len(errors) > 0:
+        return {
+            'success': False,
+            'error': "; ".join(errors)
+        }
+    return {
+        'success': True
+    }
+
+#--------------------------------------------------
+
+def get_user_pool_summary(user_pool: dict) ->dict:
+    """
+    Summarise the user pool for diagnostics.
+
+    Args:
+        user_pool (dict): The pool from new_user_pool().
+
+    Returns:
+        dict: A dictionary with keys:
+        clients (int): The number of users with a logged in client
+        tokens (int): The number of users with an access token, including those whose client has been dropped
+        logins (int): The number of password logins made so far
+        evicted (int): The number of clients dropped so far for being idle or least recently used
+        max_clients (int): The maximum number of users to keep a logged in client for
+        idle_seconds (float): How long a user's client is kept after it was last used
+    """
+
+    with user_pool['lock']:
+        _prune_pooled_users(user_pool)
+        return {
+            'clients': len(user_pool['clients']),
+            'tokens': len(user_pool['tokens']),
+            'logins': user_pool['logins'],
+            'evicted': user_pool['evicted'],
+            'max_clients': user_pool['max_clients'],
+            'idle_seconds': user_pool['idle_seconds']
+        }
+
+#--------------------------------------------------
+
+def _login_pooled_user(user_pool: dict, username: str, e_api_client: object) ->dict:
+    """
+    Log in a pooled client with the user's password and save its token for reuse. Call with the user's login lock held.
+    Returns the result of authenticate_with_emby().
+    """
+
+    device_id = stable_device_id(user_pool['client_name'], user_pool['device_name'], username) # so that Emby sees one device per user
+    e_api_client.configuration.api_key.pop('access_token', None) # log in without the rejected token
+    result = authenticate_with_emby(user_pool['server_url'], username, user_pool['passwords'][username], user_pool['client_name'],
+                                    user_pool['client_version'], user_pool['device_name'], device_id, e_api_client=e_api_client)
+    if result['success']:
+        with user_pool['lock']:
+            user_pool['tokens'][username] = {'access_token': result['access_token'], 'user_id': result['user_id']}
+            user_pool['logins'] += 1
+    return result
+
+#--------------------------------------------------
+
+def _touch_pooled_user(user_pool: dict, username: str) ->Optional[dict]:
+    """
+    Return the user's pooled client marked as just used, or None if the user has no client. Call with the pool lock held.
+    """
+
+    _prune_pooled_users(user_pool)
+    user = user_pool['clients'].get(username)
+    if user is not None:
+        user['last_used'] = time.monotonic()
+        user_pool['clients'].move_to_end(username)
+    return user
+
+#--------------------------------------------------
+
+def _prune_pooled_users(user_pool: dict) ->None:
+    """
+    Drop the clients of idle users, then of the least recently used users until the rest fit. Their tokens are kept.
+    The most recently used client is always kept. Call with the pool lock held.
+    """
+
+    clients = user_pool['clients']
+    idle_before = time.monotonic() - user_pool['idle_seconds']
+    for username in [username for username, user in clients.items() if user['last_used'] < idle_before]:
+        del clients[username]
+        user_pool['evicted'] += 1
+    while len(clients) > 1 and len(clients) > user_pool['max_clients']:
+        clients.popitem(last=False)
+        user_pool['evicted'] += 1
+
+#--------------------------------------------------
@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""
+Make the Emby.MCP modules, which live in the repository root, importable from the tests.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for lib_emby_events.py: the handling of each message type of Emby's WebSocket feed, the player list answered
+from the session table, and the listener against a local WebSocket stand-in.
+"""
+
+import asyncio
+import json
+import pytest
+
+pytest.importorskip("emby_client") # lib_emby_events uses the session converter in lib_emby_functions
+import lib_emby_events as events
+
+#--------------------------------------------------
+
+def session(session_id: str, user_id: str = "user-1", media_types: tuple = ('Audio',), **extra) ->dict:
+    return dict({'Id': session_id, 'UserId': user_id, 'DeviceName': f"Device {session_id}", 'Client': 'Emby Web',
+                 'RemoteEndPoint': '10.0.0.2', 'PlayableMediaTypes': list(media_types), 'SupportsRemoteControl': True}, **extra)
+
+def message(message_type: str, data) ->str:
+    return json.dumps({'MessageType': message_type, 'Data': data})
+
+@pytest.fixture
+def state() ->dict:
+    return events.new_event_state('http://emby.local:8096/', 'token', 'device')
+
+#--------------------------------------------------
+
+def test_websocket_url():
+    assert events.new_event_state('https://emby.local/emby/', 't', 'd')['url'] == 'wss://emby.local/emby/embywebsocket?api_key=t&deviceId=d'
+    assert events.new_event_state('http://emby.local:8096', 't', 'd')['url'] == 'ws://emby.local:8096/embywebsocket?api_key=t&deviceId=d'
+
+def test_not_ready_until_sessions_arrive(state):
+    assert not events.get_event_player_sessions(state)['success']
+    assert not events.get_event_player_sessions(None)['success']
+    assert events.handle_emby_event(state, message('Sessions', [session('a'), session('b')])) == 'sessions'
+    result = events.get_event_player_sessions(state)
+    assert result['success']
+    assert [player['session_id'] for player in result['sessions']] == ['a', 'b']
+
+def test_playback_progress_updates_one_session(state):
+    events.handle_emby_event(state, message('Sessions', [session('a'), session('b')]))
+    progress = session('a', NowPlayingItem={'Name': 'Song', 'Id': '7', 'RunTimeTicks': 1800000000}, PlayState={'PositionTicks': 600000000, 'IsPaused': True})
+    assert events.handle_emby_event(state, message('PlaybackProgress', progress)) == 'sessions'
+    players = {player['session_id']: player for player in events.get_event_player_sessions(state)['sessions']}
+    assert players['a']['now_playing_title'] == 'Song'
+    assert players['a']['now_playing_total_time'] == '00:03:00'
+    assert players['a']['now_playing_position_time'] == '00:01:00'
+    assert players['a']['now_playing_is_paused'] is True
+    assert 'now_playing_title' not in players['b']
+
+def test_playback_events_ignored_before_sessions(state):
+    assert events.handle_emby_event(state, message('PlaybackStart', session('a'))) is None
+    assert state['sessions'] == {}
+
+def test_session_ended_removes_session(state):
+    events.handle_emby_event(state, message('Sessions', [session('a'), session('b')]))
+    assert events.handle_emby_event(state, message('SessionEnded', {'Id': 'a'})) == 'sessions'
+    assert list(state['sessions']) == ['b']
+    assert events.handle_emby_event(state, message('SessionEnded', {'Id': 'unknown'})) is None
+
+def test_library_changed(state):
+    assert events.handle_emby_event(state, message('LibraryChanged', {'ItemsAdded': ['1']})) == 'library'
+    assert state['last_library_change'] == {'ItemsAdded': ['1']}
+    assert state['counts']['library_changes'] == 1
+
+def test_force_keepalive(state):
+    assert events.handle_emby_event(state, message('ForceKeepAlive', 60)) == 'keepalive'
+    assert state['keepalive_seconds'] == 30
+    assert events.handle_emby_event(state, message('ForceKeepAlive', 'soon')) == 'keepalive'
+    assert state['keepalive_seconds'] == 30
+    assert events.handle_emby_event(state, message('ForceKeepAlive', 1)) == 'keepalive'
+    assert state['keepalive_seconds'] == 1
+
+def test_bad_messages_ignored(state):
+    assert events.handle_emby_event(state, 'not json') is None
+    assert events.handle_emby_event(state, '[1, 2]') is None
+    assert events.handle_emby_event(state, message('Sessions', 'not a list')) is None
+    assert not state['ready']
+
+def test_controllable_by_user(state):
+    sessions = [
+        session('mine', 'user-1'),
+        session('other', 'user-2'),
+        session('shared', 'user-2', AdditionalUsers=[{'UserId': 'user-1'}]),
+        session('nobody', ''),
+        session('no-control', 'user-1', SupportsRemoteControl=False),
+        session('video', 'user-1', media_types=('Video',))
+    ]
+    events.handle_emby_event(state, message('Sessions', sessions))
+    ids = [player['session_id'] for player in events.get_event_player_sessions(state, 'user-1')['sessions']]
+    assert ids == ['mine', 'shared', 'nobody', 'video']
+    ids = [player['session_id'] for player in events.get_event_player_sessions(state, 'user-1', 'Audio')['sessions']]
+    assert ids == ['mine', 'shared', 'nobody']
+    ids = [player['session_id'] for player in events.get_event_player_sessions(state)['sessions']]
+    assert ids == ['mine', 'other', 'shared', 'nobody', 'video']
+
+#--------------------------------------------------
+
+def test_listener_against_standin():
+    websockets = pytest.importorskip("websockets")
+    received = []
+    library_changes = []
+
+    async def standin(connection):
+        received.append(json.loads(await connection.recv()))
+        await connection.send(message('ForceKeepAlive', 2))
+        await connection.send(message('Sessions', [session('a')]))
+        await connection.send(message('LibraryChanged', {'ItemsUpdated': ['9']}))
+        received.append(json.loads(await asyncio.wait_for(connection.recv(), 5)))
+        await connection.wait_closed()
+
+    async def run():
+        async with websockets.serve(standin, '127.0.0.1', 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            state = events.new_event_state(f"http://127.0.0.1:{port}", 'token', 'device')
+            listener = asyncio.create_task(events.listen_for_emby_events(state, library_changes.append))
+            for attempt in range(100):
+                if len(received) == 2 and library_changes:
+                    break
+                await asyncio.sleep(0.05)
+            summary = events.get_event_summary(state)
+            listener.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await listener
+            return state, summary
+
+    state, summary = asyncio.run(run())
+    assert received == [{'MessageType': 'SessionsStart', 'Data': f"0,{events.SESSIONS_INTERVAL_MS}"}, {'MessageType': 'KeepAlive'}]
+    assert library_changes == [{'ItemsUpdated': ['9']}]
+    assert summary['connected'] and summary['ready'] and summary['sessions'] == 1
+    assert [player['session_id'] for player in events.get_event_player_sessions(state)['sessions']] == ['a']
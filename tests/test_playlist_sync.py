@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for _plan_playlist_sync() in lib_emby_functions.py: applying its plan to a simulated playlist, as
+sync_playlist_items() applies it to Emby's, must always leave the playlist holding exactly the wanted items.
+Also checks that delete_playlist_items() reports the entries it removed before a batch failed.
+"""
+
+import random
+import pytest
+
+pytest.importorskip("emby_client")
+import lib_emby_functions
+from emby_client.rest import ApiException
+from lib_emby_functions import _plan_playlist_sync, delete_playlist_items, PLAYLIST_BATCH_ITEMS
+
+#--------------------------------------------------
+
+def apply_plan(current_ids: list, target_ids: list, plan: dict) ->list:
+    """
+    Apply a plan as Emby would: remove entries, append items to the end, then move each inserted item to its index.
+    Returns the playlist as (entry number, item ID) pairs, where entries already on the playlist keep their number.
+    """
+
+    playlist = [(number, item_id) for number, item_id in enumerate(current_ids)]
+    removed = set(plan['remove'])
+    playlist = [entry for entry in playlist if entry[0] not in removed]
+    next_number = len(current_ids)
+    added = []
+    for item_id in [target_ids[index] for index in plan['insert']] + target_ids[plan['append_from']:]:
+        added.append((next_number, item_id))
+        next_number += 1
+    playlist.extend(added)
+    for index, entry in zip(plan['insert'], added):
+        playlist.remove(entry)
+        playlist.insert(index, entry)
+    return playlist
+
+def check_plan(current_ids: list, target_ids: list) ->dict:
+    plan = _plan_playlist_sync(current_ids, target_ids)
+    assert sorted(plan['keep'] + plan['remove']) == list(range(len(current_ids)))
+    assert plan['insert'] == sorted(plan['insert'])
+    assert all(index < plan['append_from'] for index in plan['insert'])
+    playlist = apply_plan(current_ids, target_ids, plan)
+    assert [item_id for number, item_id in playlist] == target_ids
+    kept = [number for number, item_id in playlist if number < len(current_ids)]
+    assert kept == plan['keep'] # kept entries are left in their order
+    return plan
+
+#--------------------------------------------------
+
+def test_unchanged_playlist_needs_nothing():
+    plan = check_plan(['a', 'b', 'c'], ['a', 'b', 'c'])
+    assert plan == {'keep': [0, 1, 2], 'remove': [], 'insert': [], 'append_from': 3}
+
+def test_empty_playlists():
+    check_plan([], [])
+    check_plan([], ['a', 'b'])
+    assert check_plan(['a', 'b'], [])['remove'] == [0, 1]
+
+def test_one_item_inserted_is_moved_not_reappended():
+    current = [str(n) for n in range(500)]
+    target = current[:100] + ['new'] + current[100:]
+    plan = check_plan(current, target)
+    assert plan['insert'] == [100]
+    assert plan['remove'] == []
+    assert plan['append_from'] == len(target)
+
+def test_shuffled_playlist_is_mostly_reappended():
+    rng = random.Random(1)
+    current = [str(n) for n in range(500)]
+    target = current[:]
+    rng.shuffle(target)
+    plan = check_plan(current, target)
+    assert len(plan['insert']) < 10
+
+def test_random_playlists():
+    rng = random.Random(42)
+    for case in range(5000):
+        pool = [str(n) for n in range(rng.randrange(1, 30))]
+        current = [rng.choice(pool) for n in range(rng.randrange(0, 40))] # items may appear more than once
+        target = current[:]
+        for edit in range(rng.randrange(0, 8)):
+            match rng.randrange(4):
+                case 0 if target:
+                    target.pop(rng.randrange(len(target)))
+                case 1:
+                    target.insert(rng.randrange(len(target) + 1), rng.choice(pool))
+                case 2 if len(target) > 1:
+                    target.insert(rng.randrange(len(target)), target.pop(rng.randrange(len(target))))
+                case _:
+                    rng.shuffle(target)
+        check_plan(current, target)
+
+#--------------------------------------------------
+
+def test_delete_reports_entries_removed_before_a_failed_batch(monkeypatch):
+    sent = []
+    class FailingPlaylistApi:
+        def __init__(self, api_client):
+            pass
+        def post_playlists_by_id_items_delete(self, playlist_id, entry_ids):
+            if len(sent) == 1:
+                raise ApiException(status=500, reason="Internal Server Error")
+            sent.append(entry_ids)
+    monkeypatch.setattr(lib_emby_functions.emby_client, 'PlaylistServiceApi', FailingPlaylistApi)
+    entry_ids = ",".join(str(n) for n in range(PLAYLIST_BATCH_ITEMS * 3))
+    result = delete_playlist_items(None, 'playlist', entry_ids)
+    assert not result['success']
+    assert result['item_count'] == PLAYLIST_BATCH_ITEMS
+    assert result['batch_count'] == 2